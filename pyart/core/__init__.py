@@ -15,5 +15,8 @@ from .transforms import cartesian_vectors_to_geographic
 from .transforms import cartesian_to_geographic_aeqd
 from .transforms import geographic_to_cartesian
 from .transforms import geographic_to_cartesian_aeqd
+from .transforms import gate_geometry_cache_info
+from .transforms import set_gate_geometry_cache
+from .transforms import clear_gate_geometry_cache
 
 __all__ = [s for s in dir() if not s.startswith('_')]
@@ -10,7 +10,9 @@ import numpy as np
 
 from ..config import get_metadata
 from ..lazydict import LazyLoadDict
-from .transforms import antenna_vectors_to_cartesian, cartesian_to_geographic
+from .transforms import antenna_vectors_to_cartesian
+from .transforms import _cached_antenna_vectors_to_cartesian
+from .transforms import _cached_cartesian_to_geographic
 
 
 class Radar(object):
@@ -833,6 +835,85 @@ class Radar(object):
         return self.add_field(field_name, dic,
                               replace_existing=replace_existing)
 
+    def pack_field(self, field_name, dtype='int16', scale_factor=None,
+                   add_offset=None, filename=None):
+        """
+        Store the data of a field as packed integer codes.
+
+        The field data is replaced by integer codes from which the data is
+        computed as codes * scale_factor + add_offset when it is next
+        accessed. Masked gates are stored using the smallest value of dtype.
+        Once accessed the unpacked data is kept in the field dictionary, call
+        this method again to release it.
+
+        The 'scale_factor', 'add_offset', '_FillValue' and '_Write_as_dtype'
+        keys of the field dictionary are set so that the field will be
+        written using the same packing by
+        :py:func:`pyart.io.write_cfradial`.
+
+        Parameters
+        ----------
+        field_name : str
+            Name of the field to pack.
+        dtype : str or dtype, optional
+            Integer type of the codes.
+        scale_factor, add_offset : float, optional
+            Scale and offset used to pack the data. None, the default for
+            both, will calculate the values so that the range of the field
+            data maps to the range of dtype.
+        filename : str, optional
+            File in which to store the codes as a memory-mapped array, the
+            file is created or overwritten. None, the default, keeps the
+            codes in memory.
+
+        """
+        # import here as pyart.io imports the core modules
+        from ..io.cfradial import _calculate_scale_and_offset
+
+        self.check_field_exists(field_name)
+        dic = self.fields[field_name]
+        dtype = np.dtype(dtype)
+        if not np.issubdtype(dtype, np.integer):
+            raise ValueError('dtype must be an integer type')
+        data = np.ma.masked_invalid(dic['data'])
+        fill_value = np.iinfo(dtype).min
+        if scale_factor is None or add_offset is None:
+            # the field fill value is not a valid value for the scaling
+            scale_dic = {'data': data}
+            if '_FillValue' in dic and '_Write_as_dtype' not in dic:
+                scale_dic['_FillValue'] = dic['_FillValue']
+            scale, offset, _ = _calculate_scale_and_offset(scale_dic, dtype)
+            if scale_factor is None:
+                scale_factor = scale
+            if add_offset is None:
+                add_offset = offset
+
+        # round and clip the data to the codes of dtype
+        codes = np.round((data.filled(add_offset) - add_offset) / scale_factor)
+        np.clip(codes, fill_value + 1, np.iinfo(dtype).max, out=codes)
+        codes = codes.astype(dtype)
+        codes[np.ma.getmaskarray(data)] = fill_value
+        if filename is not None:
+            mmap = np.memmap(filename, dtype=dtype, mode='w+',
+                             shape=codes.shape)
+            mmap[:] = codes
+            mmap.flush()
+            del mmap
+            codes = np.memmap(filename, dtype=dtype, mode='r',
+                              shape=codes.shape)
+
+        packed_dic = LazyLoadDict(
+            dict((k, v) for k, v in dic.items() if k != 'data'))
+        packed_dic['scale_factor'] = scale_factor
+        packed_dic['add_offset'] = add_offset
+        packed_dic['_FillValue'] = fill_value
+        packed_dic['_Write_as_dtype'] = dtype.str
+        packed_dic.set_lazy('data', _PackedFieldData(
+            codes, scale_factor, add_offset, fill_value,
+            np.result_type(data.dtype, np.float32)))
+        self.fields[field_name] = packed_dic
+        return
+
     def extract_sweeps(self, sweeps):
         """
         Create a new radar contains only the data from select sweeps.
@@ -974,8 +1055,8 @@ def _gate_data_factory(radar, coordinate):
         ranges = radar.range['data']
         azimuths = radar.azimuth['data']
         elevations = radar.elevation['data']
-        cartesian_coords = antenna_vectors_to_cartesian(
-            ranges, azimuths, elevations, edges=False)
+        cartesian_coords = _cached_antenna_vectors_to_cartesian(
+            ranges, azimuths, elevations)
         # load x, y, and z data except for the coordinate in question
         if coordinate != 0:
             radar.gate_x['data'] = cartesian_coords[0]
@@ -997,7 +1078,9 @@ def _gate_lon_lat_data_factory(radar, coordinate):
         if projparams.pop('_include_lon_0_lat_0', False):
             projparams['lon_0'] = radar.longitude['data'][0]
             projparams['lat_0'] = radar.latitude['data'][0]
-        geographic_coords = cartesian_to_geographic(x, y, projparams)
+        geographic_coords = _cached_cartesian_to_geographic(
+            radar.range['data'], radar.azimuth['data'],
+            radar.elevation['data'], x, y, projparams)
         # set the other geographic coordinate
         if coordinate == 0:
             radar.gate_latitude['data'] = geographic_coords[1]
@@ -1016,3 +1099,26 @@ def _gate_altitude_data_factory(radar):
         except ValueError:
             return np.mean(radar.altitude['data']) + radar.gate_z['data']
     return _gate_altitude_data
+
+
+class _PackedFieldData(object):
+    """
+    A class to facilitate on demand unpacking of field data stored as
+    integer codes.
+    """
+
+    def __init__(self, codes, scale_factor, add_offset, fill_value, dtype):
+        """ initialize. """
+        self.codes = codes
+        self.scale_factor = scale_factor
+        self.add_offset = add_offset
+        self.fill_value = fill_value
+        self.dtype = dtype
+
+    def __call__(self):
+        """ Return the array containing the unpacked field data. """
+        codes = np.asarray(self.codes)
+        data = codes.astype(self.dtype)
+        data *= self.scale_factor
+        data += self.add_offset
+        return np.ma.array(data, mask=(codes == self.fill_value))
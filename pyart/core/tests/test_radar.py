@@ -61,6 +61,46 @@ def test_gate_altitude():
     assert_almost_equal(radar.gate_altitude['data'][0, 0], 150.0, 1)
 
 
+def test_gate_geometry_shared():
+    pyart.core.set_gate_geometry_cache()
+    radar = pyart.testing.make_target_radar()
+    radar2 = pyart.testing.make_target_radar()
+    assert radar2.gate_x['data'] is radar.gate_x['data']
+    assert radar2.gate_longitude['data'] is radar.gate_longitude['data']
+    assert not radar.gate_z['data'].flags.writeable
+    info = pyart.core.gate_geometry_cache_info()
+    assert info['hits'] == 2
+    assert info['misses'] == 2
+
+    # a different site does not share geographic coordinates
+    radar2.init_gate_longitude_latitude()
+    radar2.latitude['data'][0] += 1.
+    assert radar2.gate_latitude['data'] is not radar.gate_latitude['data']
+    assert radar2.gate_x['data'] is radar.gate_x['data']
+
+    # angles which differ by less than the resolution share one entry
+    radar3 = pyart.testing.make_empty_ppi_radar(50, 360, 1)
+    radar3.elevation['data'][:] = 0.5
+    radar3.init_gate_x_y_z()
+    gate_x = radar3.gate_x['data']
+    misses = pyart.core.gate_geometry_cache_info()['misses']
+    radar4 = pyart.testing.make_empty_ppi_radar(50, 360, 1)
+    radar4.azimuth['data'] = radar4.azimuth['data'] + 0.02
+    radar4.elevation['data'][:] = 0.48
+    radar4.init_gate_x_y_z()
+    assert radar4.gate_x['data'] is gate_x
+    assert pyart.core.gate_geometry_cache_info()['misses'] == misses
+    pyart.core.set_gate_geometry_cache(maxbytes=0)
+
+
+def test_gate_geometry_not_cached_by_default():
+    radar = pyart.testing.make_target_radar()
+    radar2 = pyart.testing.make_target_radar()
+    assert radar2.gate_x['data'] is not radar.gate_x['data']
+    assert radar.gate_z['data'].flags.writeable
+    assert pyart.core.gate_geometry_cache_info()['currsize'] == 0
+
+
 def test_gate_x_y_z():
     radar = pyart.testing.make_empty_ppi_radar(5, 4, 2)
     radar.azimuth['data'][:] = [0, 90, 180, 270, 0, 90, 180, 270]
@@ -470,6 +510,63 @@ def test_add_field_errors():
     pytest.raises(ValueError, radar.add_field, 'test', dic)
 
 
+def test_pack_field():
+    radar = pyart.testing.make_target_radar()
+    data = radar.fields['reflectivity']['data'].copy()
+    data = np.ma.masked_greater(data, 30.)
+    radar.fields['reflectivity']['data'] = data
+    radar.pack_field('reflectivity', 'int16')
+
+    dic = radar.fields['reflectivity']
+    assert isinstance(dic, LazyLoadDict)
+    assert dic['_Write_as_dtype'] == np.dtype('int16').str
+    assert dic['_FillValue'] == -32768
+    packed = dic._lazyload['data']
+    assert packed.codes.dtype == np.int16
+    assert packed.codes.min() == -32768
+    assert packed.codes[~data.mask].min() == -32767
+
+    unpacked = dic['data']
+    assert np.ma.isMaskedArray(unpacked)
+    assert unpacked.dtype == data.dtype
+    assert np.all(unpacked.mask == data.mask)
+    assert_allclose(unpacked, data, atol=dic['scale_factor'])
+    assert radar.fields['reflectivity']['units'] == 'dBZ'
+
+
+def test_pack_field_scale_and_offset():
+    radar = pyart.testing.make_target_radar()
+    data = radar.fields['reflectivity']['data'].copy()
+    radar.pack_field('reflectivity', 'uint8', scale_factor=0.5,
+                     add_offset=-32.)
+    dic = radar.fields['reflectivity']
+    assert dic['scale_factor'] == 0.5
+    assert dic['add_offset'] == -32.
+    assert dic._lazyload['data'].codes.dtype == np.uint8
+    assert_allclose(dic['data'], data, atol=0.25)
+
+
+def test_pack_field_memmap():
+    radar = pyart.testing.make_target_radar()
+    data = radar.fields['reflectivity']['data'].copy()
+    with pyart.testing.InTemporaryDirectory():
+        radar.pack_field('reflectivity', 'int16', filename='ref.dat')
+        codes = radar.fields['reflectivity']._lazyload['data'].codes
+        assert isinstance(codes, np.memmap)
+        assert codes.shape == (360, 50)
+        unpacked = radar.fields['reflectivity']['data']
+        assert not isinstance(unpacked.data, np.memmap)
+        del codes
+        del radar
+    assert_allclose(unpacked, data, atol=1e-3)
+
+
+def test_pack_field_errors():
+    radar = pyart.testing.make_target_radar()
+    pytest.raises(KeyError, radar.pack_field, 'foobar')
+    pytest.raises(ValueError, radar.pack_field, 'reflectivity', 'float32')
+
+
 def test_add_field_like():
     radar = pyart.testing.make_target_radar()
     data = np.zeros((360, 50))
@@ -198,3 +198,112 @@ def test_cartesian_to_geographic_aeqd():
             x, y, lon_0, lat_0, R)
     assert_almost_equal(lon, -100.0, 3)
     assert_almost_equal(lat, 40.0, 3)
+
+
+def test_gate_geometry_cache():
+    transforms.set_gate_geometry_cache()
+    ranges = np.array([5., 15., 25.])
+    azimuths = np.array([0., 90.])
+    elevations = np.array([0.5, 0.5])
+    x, y, z = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, azimuths, elevations)
+    x2, y2, z2 = transforms._cached_antenna_vectors_to_cartesian(
+        ranges.copy(), azimuths.copy(), elevations.copy())
+    assert x2 is x
+    assert not x.flags.writeable
+    info = transforms.gate_geometry_cache_info()
+    assert info['hits'] == 1
+    assert info['misses'] == 1
+    assert info['currsize'] == 1
+    assert info['currbytes'] == 3 * x.nbytes
+
+    expected = transforms.antenna_vectors_to_cartesian(
+        ranges, azimuths, elevations)
+    assert_almost_equal(x, expected[0])
+    assert_almost_equal(z, expected[2])
+
+    # geographic coordinates are cached for each projection
+    proj = {'proj': 'pyart_aeqd', 'lon_0': -97., 'lat_0': 36.}
+    lon, lat = transforms._cached_cartesian_to_geographic(
+        ranges, azimuths, elevations, x, y, proj)
+    lon2, lat2 = transforms._cached_cartesian_to_geographic(
+        ranges, azimuths, elevations, x, y, dict(proj))
+    assert lon2 is lon
+    proj['lat_0'] = 37.
+    lon3, lat3 = transforms._cached_cartesian_to_geographic(
+        ranges, azimuths, elevations, x, y, proj)
+    assert lon3 is not lon
+    assert_almost_equal(lat3[0, 0], 37.0, 3)
+    # coordinates which are not cached are transformed directly
+    lon4, lat4 = transforms._cached_cartesian_to_geographic(
+        ranges, azimuths, elevations, x.copy(), y, proj)
+    assert lon4.flags.writeable
+    assert transforms.gate_geometry_cache_info()['currsize'] == 3
+    transforms.set_gate_geometry_cache(maxbytes=0)
+
+
+def test_gate_geometry_cache_maxbytes():
+    # the cache holds two entries of three 3 x 1 float64 arrays
+    ranges = np.array([5., 15., 25.])
+    transforms.set_gate_geometry_cache(maxbytes=2 * 3 * 24)
+    for azimuth in [0., 1., 0., 2., 1.]:
+        transforms._cached_antenna_vectors_to_cartesian(
+            ranges, np.array([azimuth]), np.array([0.5]))
+    info = transforms.gate_geometry_cache_info()
+    assert info['hits'] == 1
+    assert info['misses'] == 4
+    assert info['currsize'] == 2
+    assert info['currbytes'] == 2 * 3 * 24
+    assert info['maxbytes'] == 2 * 3 * 24
+
+    # entries larger than the cache are not stored
+    x, y, z = transforms._cached_antenna_vectors_to_cartesian(
+        np.arange(10.), np.array([3.]), np.array([0.5]))
+    assert x.flags.writeable
+    assert transforms.gate_geometry_cache_info()['currsize'] == 2
+    transforms.set_gate_geometry_cache(maxbytes=0)
+
+
+def test_gate_geometry_cache_angle_resolution():
+    # angles are quantized by default, radars whose angles differ by less
+    # than the resolution share one entry
+    transforms.set_gate_geometry_cache()
+    resolution = transforms.gate_geometry_cache_info()['angle_resolution']
+    assert resolution is not None
+    ranges = np.array([5., 15., 25.])
+    azimuths = np.array([90., 180.])
+    elevations = np.array([0.5, 0.5])
+    x, y, z = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, azimuths + 0.2 * resolution, elevations)
+    x2, y2, z2 = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, azimuths - 0.2 * resolution, elevations + 0.2 * resolution)
+    assert x2 is x
+    assert transforms.gate_geometry_cache_info()['currsize'] == 1
+    expected = transforms.antenna_vectors_to_cartesian(
+        ranges, azimuths, elevations)
+    assert_almost_equal(y, expected[1])
+
+    transforms.set_gate_geometry_cache(angle_resolution=None)
+    x, y, z = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, azimuths + 0.2 * resolution, elevations)
+    x2, y2, z2 = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, azimuths - 0.2 * resolution, elevations)
+    assert x2 is not x
+    assert transforms.gate_geometry_cache_info()['currsize'] == 2
+    transforms.set_gate_geometry_cache(maxbytes=0)
+
+
+def test_gate_geometry_cache_disabled():
+    # the cache is disabled by default, exact angles are used
+    transforms.set_gate_geometry_cache(maxbytes=0)
+    ranges = np.array([5., 15., 25.])
+    x, y, z = transforms._cached_antenna_vectors_to_cartesian(
+        ranges, np.array([0.01]), np.array([0.5]))
+    assert x.flags.writeable
+    expected = transforms.antenna_vectors_to_cartesian(
+        ranges, np.array([0.01]), np.array([0.5]))
+    assert_almost_equal(x, expected[0])
+    info = transforms.gate_geometry_cache_info()
+    assert info['currsize'] == 0
+    assert info['misses'] == 0
+    assert transforms._GateGeometryCache().maxbytes == 0
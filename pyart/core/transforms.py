@@ -5,6 +5,9 @@ and antenna (azimuth, elevation, range) coordinate systems.
 
 """
 
+from collections import OrderedDict
+import hashlib
+import threading
 import warnings
 
 import numpy as np
@@ -625,3 +628,215 @@ def cartesian_to_geographic_aeqd(x, y, lon_0, lat_0, R=6370997.):
     lon_deg[lon_deg < -180] += 360.
 
     return lon_deg, lat_deg
+
+
+# default resolution in degrees to which angles are rounded in the gate
+# geometry cache and its default size in bytes when enabled, one super
+# resolution NEXRAD volume uses up to 530 MB for its Cartesian and
+# geographic coordinates.
+_DEFAULT_ANGLE_RESOLUTION = 0.1
+_DEFAULT_CACHE_MAXBYTES = 2 ** 30
+
+
+class _GateGeometryCache(object):
+    """
+    A least recently used cache of gate coordinates bounded in bytes.
+
+    Gate coordinates are stored as tuples of read-only arrays which are
+    shared by all Radar objects with the same scan geometry. A maxbytes of
+    0 disables the cache.
+    """
+
+    def __init__(self, maxbytes=0,
+                 angle_resolution=_DEFAULT_ANGLE_RESOLUTION):
+        """ initialize. """
+        self.maxbytes = maxbytes
+        self.angle_resolution = angle_resolution
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """ True when entries can be stored in the cache. """
+        return self.maxbytes > 0
+
+    def peek(self, key):
+        """ Return the entry for key or None without updating the cache. """
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key, func):
+        """ Return the entry for key, calling func to create it if needed. """
+        if not self.enabled:
+            return func()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        # compute outside of the lock, another thread may compute the same
+        # entry concurrently in which case the first result is kept.
+        value = tuple(func())
+        nbytes = sum(array.nbytes for array in value)
+        with self._lock:
+            self.misses += 1
+            if nbytes > self.maxbytes:
+                # entries larger than the cache are not stored
+                return value
+            if key in self._entries:
+                value = self._entries[key]
+            else:
+                for array in value:
+                    array.flags.writeable = False
+                self._entries[key] = value
+                self.currbytes += nbytes
+            self._entries.move_to_end(key)
+            while self.currbytes > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.currbytes -= sum(array.nbytes for array in evicted)
+        return value
+
+    def clear(self):
+        """ Remove all entries and reset the hit and miss counters. """
+        with self._lock:
+            self._entries.clear()
+            self.currbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_GATE_GEOMETRY_CACHE = _GateGeometryCache()
+
+
+def gate_geometry_cache_info():
+    """
+    Return statistics on the gate geometry cache.
+
+    The cache holds the gate Cartesian and geographic coordinates of
+    :py:class:`pyart.core.Radar` objects so that radars with the same scan
+    geometry share these arrays, see :py:func:`set_gate_geometry_cache`.
+
+    Returns
+    -------
+    info : dict
+        Dictionary with the number of cache 'hits' and 'misses', the maximum
+        size of the cache in bytes, 'maxbytes', the current number of
+        entries, 'currsize', the current size in bytes, 'currbytes', and the
+        'angle_resolution' used to quantize angles.
+
+    """
+    cache = _GATE_GEOMETRY_CACHE
+    with cache._lock:
+        return {'hits': cache.hits, 'misses': cache.misses,
+                'maxbytes': cache.maxbytes, 'currsize': len(cache._entries),
+                'currbytes': cache.currbytes,
+                'angle_resolution': cache.angle_resolution}
+
+
+def set_gate_geometry_cache(maxbytes=_DEFAULT_CACHE_MAXBYTES,
+                            angle_resolution=_DEFAULT_ANGLE_RESOLUTION):
+    """
+    Configure the gate geometry cache.
+
+    The cache is disabled until this function is called. When enabled, gate
+    coordinates are cached using the ranges, quantized azimuth and
+    elevation angles, radar location and projection as a key, and are
+    calculated from the quantized angles. Cached arrays are read only.
+    Configuring the cache removes all entries and resets the hit and miss
+    counters.
+
+    Parameters
+    ----------
+    maxbytes : int, optional
+        Maximum size of the cached coordinates in bytes, the least recently
+        used entries are removed when it is exceeded. The Cartesian
+        coordinates of a radar are three arrays and the geographic
+        coordinates two arrays for each projection, with one element per
+        gate, 40 bytes per gate in total in double precision. The default of
+        1 GiB holds the coordinates of one super resolution NEXRAD volume.
+        0 disables the cache.
+    angle_resolution : float or None, optional
+        Resolution in degrees to which azimuth and elevation angles are
+        rounded, allowing volumes with nearly identical angles to share
+        coordinates. Rounding moves an angle by at most half the
+        resolution, with the default of 0.1 degrees a gate moves by at most
+        87 m at a range of 100 km and 400 m at 460 km, small compared to
+        the beam width of most radars. None uses the exact angles.
+
+    """
+    _GATE_GEOMETRY_CACHE.clear()
+    with _GATE_GEOMETRY_CACHE._lock:
+        _GATE_GEOMETRY_CACHE.maxbytes = maxbytes
+        _GATE_GEOMETRY_CACHE.angle_resolution = angle_resolution
+
+
+def clear_gate_geometry_cache():
+    """
+    Remove all entries from the gate geometry cache and reset the counters.
+    """
+    _GATE_GEOMETRY_CACHE.clear()
+
+
+def _quantize_angles(angles, angle_resolution):
+    """ Round angles to a given resolution preserving the dtype. """
+    angles = np.asarray(angles)
+    if angle_resolution is None:
+        return angles
+    quantized = np.round(angles / angle_resolution) * angle_resolution
+    return quantized.astype(angles.dtype)
+
+
+def _gate_geometry_key(ranges, azimuths, elevations):
+    """ Return a key identifying a gate geometry and the quantized angles. """
+    resolution = _GATE_GEOMETRY_CACHE.angle_resolution
+    azimuths = _quantize_angles(azimuths, resolution)
+    elevations = _quantize_angles(elevations, resolution)
+    digest = hashlib.sha1()
+    for array in (ranges, azimuths, elevations):
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest(), azimuths, elevations
+
+
+def _cached_antenna_vectors_to_cartesian(ranges, azimuths, elevations):
+    """
+    Return the gate Cartesian coordinates from the gate geometry cache.
+
+    See :py:func:`antenna_vectors_to_cartesian`, the returned arrays are
+    read only when the cache is enabled.
+    """
+    if not _GATE_GEOMETRY_CACHE.enabled:
+        return antenna_vectors_to_cartesian(ranges, azimuths, elevations)
+    key, azimuths, elevations = _gate_geometry_key(
+        ranges, azimuths, elevations)
+    return _GATE_GEOMETRY_CACHE.get(
+        ('cartesian', key),
+        lambda: antenna_vectors_to_cartesian(ranges, azimuths, elevations))
+
+
+def _cached_cartesian_to_geographic(ranges, azimuths, elevations, x, y,
+                                    projparams):
+    """
+    Return the gate geographic coordinates from the gate geometry cache.
+
+    The cache is only used when x and y are the cached Cartesian coordinates
+    of the gates described by ranges, azimuths and elevations, other
+    coordinates are transformed using :py:func:`cartesian_to_geographic`.
+    """
+    if not _GATE_GEOMETRY_CACHE.enabled:
+        return cartesian_to_geographic(x, y, projparams)
+    key = _gate_geometry_key(ranges, azimuths, elevations)[0]
+    cartesian = _GATE_GEOMETRY_CACHE.peek(('cartesian', key))
+    if cartesian is None or cartesian[0] is not x or cartesian[1] is not y:
+        return cartesian_to_geographic(x, y, projparams)
+    if isinstance(projparams, dict):
+        proj_key = repr(sorted(projparams.items()))
+    else:
+        proj_key = repr(projparams)
+    return _GATE_GEOMETRY_CACHE.get(
+        ('geographic', key, proj_key),
+        lambda: cartesian_to_geographic(x, y, projparams))
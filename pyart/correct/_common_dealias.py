@@ -3,6 +3,8 @@ Routines used by multiple dealiasing functions.
 
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from ..config import get_field_name
@@ -53,6 +55,24 @@ def _parse_rays_wrap_around(rays_wrap_around, radar):
     return rays_wrap_around
 
 
+def _map_sweeps(func, radar, n_workers):
+    """
+    Call func(nsweep, sweep_slice) for each sweep in the radar.
+
+    When n_workers is larger than 1 the sweeps are dispatched to a pool of
+    threads, func should store its results in place.
+    """
+    sweep_slices = list(radar.iter_slice())
+    n_workers = min(max(int(n_workers), 1), len(sweep_slices))
+    if n_workers <= 1:
+        for nsweep, sweep_slice in enumerate(sweep_slices):
+            func(nsweep, sweep_slice)
+        return
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # consume the results so exceptions raised by func propagate
+        list(executor.map(func, range(len(sweep_slices)), sweep_slices))
+
+
 def _set_limits(data, nyquist_vel, dic):
     """ Set the valid_min and valid_max keys in dic from dealiased data. """
     max_abs_vel = np.ma.max(np.ma.abs(data))
@@ -17,11 +17,27 @@ def _fast_edge_finder(
     """
     Return the gate indices and velocities of all edges between regions.
     """
-    cdef int x_index, y_index, right, bottom, y_check, x_check
+    cdef _EdgeCollector collector = _EdgeCollector(total_nodes)
+
+    # the GIL is released so sweeps can be processed by multiple threads
+    with nogil:
+        _find_edges(labels, data, rays_wrap_around, max_gap_x, max_gap_y,
+                    collector)
+
+    indices, velocities = collector.get_indices_and_velocities()
+    return indices, velocities
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _find_edges(
+        int[:, ::1] labels, float[:, ::1] data, int rays_wrap_around,
+        int max_gap_x, int max_gap_y, _EdgeCollector collector) nogil:
+    """ Add all edges between regions to the collector. """
+    cdef int x_index, y_index, right, bottom, y_check, x_check, i
     cdef int label, neighbor
     cdef float vel, nvel
 
-    collector = _EdgeCollector(total_nodes)
     right = labels.shape[0] - 1
     bottom = labels.shape[1] - 1
 
@@ -128,9 +144,6 @@ def _fast_edge_finder(
                 # add the edge to the collection (if valid)
                 collector.add_edge(label, neighbor, vel, nvel)
 
-    indices, velocities = collector.get_indices_and_velocities()
-    return indices, velocities
-
 
 # Cython implementation inspired by coo_entries in scipy/spatial/ckdtree.pyx
 cdef class _EdgeCollector:
@@ -160,7 +173,7 @@ cdef class _EdgeCollector:
         self.idx = 0
 
     cdef int add_edge(_EdgeCollector self, int label, int neighbor,
-                      float vel, float nvel):
+                      float vel, float nvel) nogil:
         """ Add an edge. """
         if neighbor == label or neighbor == 0:
             # Do not add edges between the same region (circular edges)
@@ -0,0 +1,315 @@
+"""
+Cython routine for reducing the region network used in region based
+dealiasing.
+
+"""
+
+from libc.math cimport rint
+
+import numpy as np
+
+cimport cython
+
+
+# weight of edges which have been removed from the network
+DEF REMOVED = -999
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def _reduce_network(
+        int[::1] node_alpha, int[::1] node_beta, float[::1] sum_diff,
+        int[::1] weight, int[::1] node_size):
+    """
+    Reduce a network of regions, return the unwrap number of each region.
+
+    Edges are merged in order of decreasing weight, ties are broken by the
+    lowest edge number, using a binary heap in which entries are invalidated
+    lazily when the weight of an edge changes.  Merged nodes are tracked in a
+    union-find forest where each node stores the unwrap number relative to
+    its parent.  The unwrap numbers are identical to those found by the
+    _RegionTracker and _EdgeTracker classes in region_dealias.
+
+    Parameters
+    ----------
+    node_alpha, node_beta : array, 1D
+        Node numbers of each edge, modified in place.
+    sum_diff : array, 1D
+        Sum of the velocity differences between the nodes of each edge in
+        units of the Nyquist interval, modified in place.
+    weight : array, 1D
+        Number of connections between the nodes of each edge, modified in
+        place.
+    node_size : array, 1D
+        Number of gates in each node, modified in place.
+
+    Returns
+    -------
+    unwrap_number : array, 1D
+        Number of unwrappings to apply to each region.
+
+    """
+    cdef int nedges = weight.shape[0]
+    cdef int nnodes = node_size.shape[0]
+    cdef int i, h, nh, edge, top, node1, node2, base, merge, neighbor
+    cdef int base_edge, rdiff, nmerged, stamp, last_base
+
+    # binary heap of (weight, edge) entries, each combination of two edges
+    # pushes at most one additional entry
+    heap_weight_arr = np.empty(2 * nedges + 1, dtype=np.int32)
+    heap_edge_arr = np.empty(2 * nedges + 1, dtype=np.int32)
+    cdef int[::1] heap_weight = heap_weight_arr
+    cdef int[::1] heap_edge = heap_edge_arr
+    cdef int heap_len = 0
+
+    # doubly linked lists of the half edges in each node, half edge 2 * e
+    # and 2 * e + 1 are the two ends of edge e.
+    head_arr = np.full(nnodes, -1, dtype=np.int32)
+    tail_arr = np.full(nnodes, -1, dtype=np.int32)
+    next_arr = np.full(2 * nedges, -1, dtype=np.int32)
+    prev_arr = np.full(2 * nedges, -1, dtype=np.int32)
+    owner_arr = np.empty(2 * nedges, dtype=np.int32)
+    cdef int[::1] head = head_arr
+    cdef int[::1] tail = tail_arr
+    cdef int[::1] next_half = next_arr
+    cdef int[::1] prev_half = prev_arr
+    cdef int[::1] owner = owner_arr
+
+    # neighbors of the current base node, valid when marked with stamp
+    mark_arr = np.full(nnodes, -1, dtype=np.int32)
+    common_arr = np.zeros(nnodes, dtype=np.int32)
+    cdef int[::1] mark = mark_arr
+    cdef int[::1] common = common_arr
+
+    # union-find forest with unwrap numbers relative to the parent node
+    parent_arr = np.arange(nnodes, dtype=np.int32)
+    offset_arr = np.zeros(nnodes, dtype=np.int32)
+    merged_arr = np.empty(nnodes, dtype=np.int32)
+    cdef int[::1] parent = parent_arr
+    cdef int[::1] offset = offset_arr
+    cdef int[::1] merged = merged_arr
+
+    with nogil:
+        for edge in range(nedges):
+            _link_half(2 * edge, node_alpha[edge], head, tail, next_half,
+                       prev_half, owner)
+            _link_half(2 * edge + 1, node_beta[edge], head, tail, next_half,
+                       prev_half, owner)
+            heap_len = _heap_push(heap_weight, heap_edge, heap_len,
+                                  weight[edge], edge)
+
+        nmerged = 0
+        stamp = 0
+        last_base = -1
+        while heap_len > 0:
+
+            # pop the edge with the largest weight, skipping stale entries
+            edge = heap_edge[0]
+            top = heap_weight[0]
+            heap_len = _heap_pop(heap_weight, heap_edge, heap_len)
+            if weight[edge] != top:
+                continue
+
+            # determine which nodes should be merged
+            node1 = node_alpha[edge]
+            node2 = node_beta[edge]
+            rdiff = <int>rint(<double>sum_diff[edge] / <double>top)
+            if node_size[node1] > node_size[node2]:
+                base = node1
+                merge = node2
+            else:
+                base = node2
+                merge = node1
+                rdiff = -rdiff
+
+            # unwrap merge node
+            if rdiff != 0:
+                offset[merge] += rdiff
+                h = head[merge]
+                while h != -1:
+                    i = h >> 1
+                    if node_alpha[i] == merge:
+                        sum_diff[i] = <float>(
+                            <double>sum_diff[i] + <double>weight[i] * rdiff)
+                    else:
+                        sum_diff[i] = <float>(
+                            <double>sum_diff[i] - <double>weight[i] * rdiff)
+                    h = next_half[h]
+
+            # remove edge between base and merge nodes
+            weight[edge] = REMOVED
+            _unlink_half(2 * edge, head, tail, next_half, prev_half, owner)
+            _unlink_half(2 * edge + 1, head, tail, next_half, prev_half,
+                         owner)
+            mark[merge] = -1
+
+            # find all neighbors of the base node if it changed
+            if base != last_base:
+                stamp += 1
+                h = head[base]
+                while h != -1:
+                    i = h >> 1
+                    if node_beta[i] == base:
+                        _reverse_edge(i, node_alpha, node_beta, sum_diff)
+                    neighbor = node_beta[i]
+                    mark[neighbor] = stamp
+                    common[neighbor] = i
+                    h = next_half[h]
+
+            # point merge node edges to the base node, combining edges with
+            # neighbors common to both nodes
+            h = head[merge]
+            while h != -1:
+                nh = next_half[h]
+                i = h >> 1
+                if node_beta[i] == merge:
+                    _reverse_edge(i, node_alpha, node_beta, sum_diff)
+                node_alpha[i] = base
+                neighbor = node_beta[i]
+                if mark[neighbor] == stamp:
+                    base_edge = common[neighbor]
+                    weight[base_edge] += weight[i]
+                    weight[i] = REMOVED
+                    sum_diff[base_edge] = sum_diff[base_edge] + sum_diff[i]
+                    _unlink_half(2 * i, head, tail, next_half, prev_half,
+                                 owner)
+                    _unlink_half(2 * i + 1, head, tail, next_half, prev_half,
+                                 owner)
+                    heap_len = _heap_push(heap_weight, heap_edge, heap_len,
+                                          weight[base_edge], base_edge)
+                else:
+                    mark[neighbor] = stamp
+                    common[neighbor] = i
+                    owner[h] = base
+                h = nh
+
+            # move the remaining merge node edges to the base node
+            if head[merge] != -1:
+                if head[base] == -1:
+                    head[base] = head[merge]
+                else:
+                    next_half[tail[base]] = head[merge]
+                    prev_half[head[merge]] = tail[base]
+                tail[base] = tail[merge]
+                head[merge] = -1
+                tail[merge] = -1
+
+            # merge the nodes
+            node_size[base] += node_size[merge]
+            node_size[merge] = 0
+            parent[merge] = base
+            offset[merge] -= offset[base]
+            merged[nmerged] = merge
+            nmerged += 1
+            last_base = base
+
+        # resolve the unwrap numbers, a merged node is always attached to a
+        # parent which is merged later, if at all.
+        for i in range(nmerged - 1, -1, -1):
+            merge = merged[i]
+            offset[merge] += offset[parent[merge]]
+
+    return offset_arr
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _reverse_edge(
+        int edge, int[::1] node_alpha, int[::1] node_beta,
+        float[::1] sum_diff) nogil:
+    """ Reverse an edges direction, swap alpha and beta. """
+    cdef int old_alpha = node_alpha[edge]
+    node_alpha[edge] = node_beta[edge]
+    node_beta[edge] = old_alpha
+    sum_diff[edge] = -sum_diff[edge]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _link_half(
+        int h, int node, int[::1] head, int[::1] tail, int[::1] next_half,
+        int[::1] prev_half, int[::1] owner) nogil:
+    """ Append a half edge to the list of a node. """
+    owner[h] = node
+    next_half[h] = -1
+    prev_half[h] = tail[node]
+    if tail[node] == -1:
+        head[node] = h
+    else:
+        next_half[tail[node]] = h
+    tail[node] = h
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _unlink_half(
+        int h, int[::1] head, int[::1] tail, int[::1] next_half,
+        int[::1] prev_half, int[::1] owner) nogil:
+    """ Remove a half edge from the list of its node. """
+    cdef int node = owner[h]
+    if prev_half[h] == -1:
+        head[node] = next_half[h]
+    else:
+        next_half[prev_half[h]] = next_half[h]
+    if next_half[h] == -1:
+        tail[node] = prev_half[h]
+    else:
+        prev_half[next_half[h]] = prev_half[h]
+    next_half[h] = -1
+    prev_half[h] = -1
+
+
+cdef inline bint _heap_before(int weight_a, int edge_a,
+                              int weight_b, int edge_b) nogil:
+    """ True when heap entry a should be popped before entry b. """
+    return weight_a > weight_b or (weight_a == weight_b and edge_a < edge_b)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _heap_push(int[::1] heap_weight, int[::1] heap_edge, int heap_len,
+                    int weight, int edge) nogil:
+    """ Push an entry on the heap, return the new heap length. """
+    cdef int child = heap_len
+    cdef int up
+    while child > 0:
+        up = (child - 1) >> 1
+        if not _heap_before(weight, edge, heap_weight[up], heap_edge[up]):
+            break
+        heap_weight[child] = heap_weight[up]
+        heap_edge[child] = heap_edge[up]
+        child = up
+    heap_weight[child] = weight
+    heap_edge[child] = edge
+    return heap_len + 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _heap_pop(int[::1] heap_weight, int[::1] heap_edge,
+                   int heap_len) nogil:
+    """ Remove the top entry of the heap, return the new heap length. """
+    cdef int pos = 0
+    cdef int child, weight, edge
+    heap_len -= 1
+    if heap_len == 0:
+        return 0
+    weight = heap_weight[heap_len]
+    edge = heap_edge[heap_len]
+    child = 1
+    while child < heap_len:
+        if (child + 1 < heap_len and
+                _heap_before(heap_weight[child + 1], heap_edge[child + 1],
+                             heap_weight[child], heap_edge[child])):
+            child += 1
+        if not _heap_before(heap_weight[child], heap_edge[child],
+                            weight, edge):
+            break
+        heap_weight[pos] = heap_weight[child]
+        heap_edge[pos] = heap_edge[child]
+        pos = child
+        child = 2 * pos + 1
+    heap_weight[pos] = weight
+    heap_edge[pos] = edge
+    return heap_len
@@ -25,7 +25,8 @@ def calculate_attenuation_zphi(radar, doc=None, fzl=None, smooth_window_len=5,
                                iso0_field=None, spec_at_field=None,
                                pia_field=None, corr_refl_field=None,
                                spec_diff_at_field=None, pida_field=None,
-                               corr_zdr_field=None, temp_ref='temperature'):
+                               corr_zdr_field=None, temp_ref='temperature',
+                               engine='vectorized'):
     """
     Calculate the attenuation and the differential attenuation from a
     polarimetric radar using Z-PHI method..
@@ -115,6 +116,10 @@ def calculate_attenuation_zphi(radar, doc=None, fzl=None, smooth_window_len=5,
     temp_ref : str, optional
         the field use as reference for temperature. Can be either temperature,
         height_over_iso0 or fixed_fzl
+    engine : 'vectorized' or 'profile', optional
+        The implementation of the attenuation calculation. 'vectorized'
+        processes all rays at once with 2D cumulative sums, 'profile' loops
+        over the rays one at a time. Both give identical results.
 
     Returns
     -------
@@ -196,15 +201,9 @@ def calculate_attenuation_zphi(radar, doc=None, fzl=None, smooth_window_len=5,
     radar.check_field_exists(phidp_field)
     phidp = deepcopy(radar.fields[phidp_field]['data'])
 
-    ah = np.ma.zeros(refl.shape, dtype='float64')
-    pia = np.ma.zeros(refl.shape, dtype='float64')
-
     try:
         radar.check_field_exists(zdr_field)
         zdr = radar.fields[zdr_field]['data']
-
-        adiff = np.ma.zeros(zdr.shape, dtype='float64')
-        pida = np.ma.zeros(zdr.shape, dtype='float64')
     except KeyError:
         zdr = None
 
@@ -235,45 +234,16 @@ def calculate_attenuation_zphi(radar, doc=None, fzl=None, smooth_window_len=5,
         sm_refl = init_refl_correct
     refl_linear = np.ma.power(10.0, 0.1 * beta * sm_refl).filled(fill_value=0)
 
-    for ray in range(radar.nrays):
-        # perform attenuation calculation on a single ray
-        # if number of valid range bins larger than smoothing window
-        if end_gate_arr[ray] < 0:
-            continue
-
-        if end_gate_arr[ray] > smooth_window_len:
-            # extract the ray's phase shift,
-            # init. refl. correction and mask
-            ray_phase_shift = corr_phidp[ray, 0:end_gate_arr[ray]]
-            ray_mask = mask[ray, 0:end_gate_arr[ray]]
-            ray_refl_linear = refl_linear[ray, 0:end_gate_arr[ray]]
-
-            # perform calculation if there is valid data
-            last_six_good = np.where(
-                np.ndarray.flatten(ray_mask) == 0)[0][-6:]
-            if(len(last_six_good)) == 6:
-                phidp_max = np.median(ray_phase_shift[last_six_good])
-                self_cons_number = (
-                    10.0 ** (0.1 * beta * a_coef * phidp_max) - 1.0)
-                I_indef = cumtrapz(0.46 * beta * dr * ray_refl_linear[::-1])
-                I_indef = np.append(I_indef, I_indef[-1])[::-1]
-
-                # set the specific attenutation and attenuation
-                ah[ray, 0:end_gate_arr[ray]] = (
-                    ray_refl_linear * self_cons_number /
-                    (I_indef[0] + self_cons_number * I_indef))
-
-                pia[ray, :-1] = cumtrapz(ah[ray, :]) * dr * 2.0
-                pia[ray, -1] = pia[ray, -2]
-
-                # if ZDR exists, set the specific differential attenuation
-                # and differential attenuation
-                if zdr is not None:
-                    adiff[ray, 0:end_gate_arr[ray]] = (
-                        c * np.ma.power(ah[ray, 0:end_gate_arr[ray]], d))
-
-                    pida[ray, :-1] = cumtrapz(adiff[ray, :]) * dr * 2.0
-                    pida[ray, -1] = pida[ray, -2]
+    if engine == 'vectorized':
+        ah, pia, adiff, pida = _attenuation_zphi_vectorized(
+            corr_phidp, mask, refl_linear, end_gate_arr, dr,
+            smooth_window_len, a_coef, beta, c, d)
+    elif engine == 'profile':
+        ah, pia, adiff, pida = _attenuation_zphi_profile(
+            corr_phidp, mask, refl_linear, end_gate_arr, dr,
+            smooth_window_len, a_coef, beta, c, d)
+    else:
+        raise ValueError('Unknown engine: ' + str(engine))
 
     # prepare output field dictionaries
     # for specific attenuation and corrected reflectivity
@@ -317,6 +287,118 @@ def calculate_attenuation_zphi(radar, doc=None, fzl=None, smooth_window_len=5,
     return spec_at, pia_dict, cor_z, spec_diff_at, pida_dict, cor_zdr
 
 
+def _attenuation_zphi_profile(corr_phidp, mask, refl_linear, end_gate_arr, dr,
+                              smooth_window_len, a_coef, beta, c, d):
+    """
+    Compute the specific attenuation, path integrated attenuation, specific
+    differential attenuation and path integrated differential attenuation of
+    the Z-PHI method one ray at a time.
+    """
+    nrays = corr_phidp.shape[0]
+    ah = np.ma.zeros(corr_phidp.shape, dtype='float64')
+    pia = np.ma.zeros(corr_phidp.shape, dtype='float64')
+    adiff = np.ma.zeros(corr_phidp.shape, dtype='float64')
+    pida = np.ma.zeros(corr_phidp.shape, dtype='float64')
+
+    for ray in range(nrays):
+        # perform attenuation calculation on a single ray
+        # if number of valid range bins larger than smoothing window
+        if end_gate_arr[ray] < 0:
+            continue
+
+        if end_gate_arr[ray] > smooth_window_len:
+            # extract the ray's phase shift,
+            # init. refl. correction and mask
+            ray_phase_shift = corr_phidp[ray, 0:end_gate_arr[ray]]
+            ray_mask = mask[ray, 0:end_gate_arr[ray]]
+            ray_refl_linear = refl_linear[ray, 0:end_gate_arr[ray]]
+
+            # perform calculation if there is valid data
+            last_six_good = np.where(
+                np.ndarray.flatten(ray_mask) == 0)[0][-6:]
+            if(len(last_six_good)) == 6:
+                phidp_max = np.median(ray_phase_shift[last_six_good])
+                self_cons_number = (
+                    10.0 ** (0.1 * beta * a_coef * phidp_max) - 1.0)
+                I_indef = cumtrapz(0.46 * beta * dr * ray_refl_linear[::-1])
+                I_indef = np.append(I_indef, I_indef[-1])[::-1]
+
+                # set the specific attenutation and attenuation
+                ah[ray, 0:end_gate_arr[ray]] = (
+                    ray_refl_linear * self_cons_number /
+                    (I_indef[0] + self_cons_number * I_indef))
+
+                pia[ray, :-1] = cumtrapz(ah[ray, :]) * dr * 2.0
+                pia[ray, -1] = pia[ray, -2]
+
+                # set the specific differential attenuation and differential
+                # attenuation
+                adiff[ray, 0:end_gate_arr[ray]] = (
+                    c * np.ma.power(ah[ray, 0:end_gate_arr[ray]], d))
+
+                pida[ray, :-1] = cumtrapz(adiff[ray, :]) * dr * 2.0
+                pida[ray, -1] = pida[ray, -2]
+
+    return ah, pia, adiff, pida
+
+
+def _attenuation_zphi_vectorized(corr_phidp, mask, refl_linear, end_gate_arr,
+                                 dr, smooth_window_len, a_coef, beta, c, d):
+    """
+    Compute the specific attenuation, path integrated attenuation, specific
+    differential attenuation and path integrated differential attenuation of
+    the Z-PHI method for all rays at once. The sums are accumulated in the
+    same order as in the per ray calculation so the results are identical.
+    """
+    nrays, ngates = corr_phidp.shape
+    end_gate_arr = np.asarray(end_gate_arr)
+    in_ray = np.arange(ngates) < end_gate_arr[:, np.newaxis]
+
+    # the last six valid gates of each ray before the end gate
+    is_valid = np.logical_and(in_ray, np.logical_not(mask))
+    nvalid_after = np.cumsum(is_valid[:, ::-1], axis=1)[:, ::-1]
+    is_last_six = np.logical_and(is_valid, nvalid_after <= 6)
+
+    # rays with enough gates and valid data
+    is_processed = np.logical_and(end_gate_arr > smooth_window_len,
+                                  nvalid_after[:, 0] >= 6)
+    ah = np.zeros(corr_phidp.shape, dtype='float64')
+    if np.any(is_processed):
+        in_ray = in_ray[is_processed]
+        phidp_max = np.median(
+            corr_phidp[is_processed][is_last_six[is_processed]].reshape(-1, 6),
+            axis=1)
+        self_cons_number = 10.0 ** (0.1 * beta * a_coef * phidp_max) - 1.0
+
+        # integral of the linear reflectivity from each gate to the end gate,
+        # accumulated backwards from the end gate
+        ray_refl_linear = np.where(in_ray, refl_linear[is_processed], 0.)
+        integrand = 0.46 * beta * dr * ray_refl_linear
+        trapz = (integrand[:, 1:] + integrand[:, :-1]) / 2.0
+        trapz[np.logical_not(in_ray[:, 1:])] = 0.
+        I_indef = np.zeros(integrand.shape)
+        I_indef[:, 1:] = np.cumsum(trapz[:, ::-1], axis=1)[:, ::-1]
+        I_indef[:, 0] = I_indef[:, 1]
+
+        # set the specific attenutation
+        self_cons_number = self_cons_number[:, np.newaxis]
+        ah[is_processed] = np.where(
+            in_ray, ray_refl_linear * self_cons_number /
+            (I_indef[:, :1] + self_cons_number * I_indef), 0.)
+
+    # attenuation, specific differential attenuation and differential
+    # attenuation
+    pia = np.zeros(ah.shape)
+    pia[:, :-1] = cumtrapz(ah, axis=1) * dr * 2.0
+    pia[:, -1] = pia[:, -2]
+    adiff = c * np.power(ah, d)
+    pida = np.zeros(adiff.shape)
+    pida[:, :-1] = cumtrapz(adiff, axis=1) * dr * 2.0
+    pida[:, -1] = pida[:, -2]
+
+    return ah, pia, adiff, pida
+
+
 def calculate_attenuation_philinear(
         radar, doc=None, fzl=None, pia_coef=None, gatefilter=None,
         pida_coef=None, refl_field=None, phidp_field=None, zdr_field=None,
@@ -603,20 +685,8 @@ def get_mask_fzl(radar, fzl=None, doc=None, min_temp=0., max_h_iso0=0.,
             gatefilter = temp_based_gate_filter(
                 radar, temp_field=temp_field, min_temp=min_temp,
                 thickness=thickness, beamwidth=beamwidth)
-            end_gate_arr = np.zeros(radar.nrays, dtype='int32')
-            for ray in range(radar.nrays):
-                ind_rng = np.where(gatefilter.gate_excluded[ray, :] == 1)[0]
-                if len(ind_rng) > 0:
-                    # there are filtered gates: The last valid gate is one
-                    # before the first filter gate
-                    if ind_rng[0] > 0:
-                        end_gate_arr[ray] = ind_rng[0]-1
-                    else:
-                        end_gate_arr[ray] = 0
-                else:
-                    # there are no filter gates: all gates are valid
-                    end_gate_arr[ray] = radar.ngates-1
             mask_fzl = gatefilter.gate_excluded == 1
+            end_gate_arr = _get_end_gate(mask_fzl)
         else:
             fzl = 4000.
             doc = 15
@@ -628,20 +698,8 @@ def get_mask_fzl(radar, fzl=None, doc=None, min_temp=0., max_h_iso0=0.,
             gatefilter = iso0_based_gate_filter(
                 radar, iso0_field=iso0_field, max_h_iso0=max_h_iso0,
                 thickness=thickness, beamwidth=beamwidth)
-            end_gate_arr = np.zeros(radar.nrays, dtype='int32')
-            for ray in range(radar.nrays):
-                ind_rng = np.where(gatefilter.gate_excluded[ray, :] == 1)[0]
-                if len(ind_rng) > 0:
-                    # there are filtered gates: The last valid gate is one
-                    # before the first filter gate
-                    if ind_rng[0] > 0:
-                        end_gate_arr[ray] = ind_rng[0]-1
-                    else:
-                        end_gate_arr[ray] = 0
-                else:
-                    # there are no filter gates: all gates are valid
-                    end_gate_arr[ray] = radar.ngates-1
             mask_fzl = gatefilter.gate_excluded == 1
+            end_gate_arr = _get_end_gate(mask_fzl)
         else:
             fzl = 4000.
             doc = 15
@@ -652,6 +710,20 @@ def get_mask_fzl(radar, fzl=None, doc=None, min_temp=0., max_h_iso0=0.,
     return mask_fzl, end_gate_arr
 
 
+def _get_end_gate(mask_fzl):
+    """
+    Get the index of the last valid gate of each ray, the gate before the
+    first filtered gate, 0 if the first gate is filtered or the last gate if
+    no gate is filtered.
+    """
+    has_filtered = np.any(mask_fzl, axis=1)
+    first_filtered = np.argmax(mask_fzl, axis=1)
+    end_gate_arr = np.where(
+        has_filtered, np.maximum(first_filtered - 1, 0),
+        mask_fzl.shape[1] - 1)
+    return end_gate_arr.astype('int32')
+
+
 def _prepare_phidp(phidp, mask_fzl):
     """
     Prepares phidp to be used in attenuation correction by masking values
@@ -9,11 +9,14 @@ Adapted by Scott Collis and Scott Giangrande, refactored by Jonathan Helmus.
 """
 
 import copy
+import warnings
 from time import time
 
 import numpy as np
 from numpy import ma
 import scipy.ndimage
+import scipy.optimize
+import scipy.sparse
 
 from ..config import get_fillvalue, get_field_name, get_metadata
 from ..filters import GateFilter
@@ -815,7 +818,7 @@ def solve_cylp(model, B_vectors, weights, ray, chunksize):
 
 
 def LP_solver_cylp_mp(A_Matrix, B_vectors, weights, really_verbose=False,
-                      proc=1):
+                      proc=1, pool=None):
     """
     Solve the Linear Programming problem given in Giangrande et al, 2012 using
     the CyLP module using multiple processes.
@@ -831,7 +834,13 @@ def LP_solver_cylp_mp(A_Matrix, B_vectors, weights, really_verbose=False,
     really_verbose : bool, optional
         True to print CLP messaging. False to suppress.
     proc : int, optional
-        Number of worker processes.
+        Number of worker processes, the rays are split into one chunk of
+        consecutive rays per process. When pool is given it should be set to
+        the number of processes in the pool.
+    pool : multiprocessing.Pool, optional
+        Pool of worker processes to solve the rays with. The workers keep
+        their LP models between calls, reusing a pool for several sweeps or
+        volumes avoids rebuilding the models.
 
     Returns
     -------
@@ -844,70 +853,12 @@ def LP_solver_cylp_mp(A_Matrix, B_vectors, weights, really_verbose=False,
     LP_solver_pyglpk : Solve LP problem using the PyGLPK module.
     LP_solver_cylp : Solve LP problem using the CyLP module using single
                      process.
+    LP_solver_scipy : Solve LP problem using the HiGHS solvers in SciPy.
 
     """
-    from cylp.cy.CyClpSimplex import CyClpSimplex
-    from cylp.py.modeling.CyLPModel import CyLPModel, CyLPArray
-    import multiprocessing as mp
-
-    n_gates = weights.shape[1] // 2
-    n_rays = B_vectors.shape[0]
-    soln = np.zeros([n_rays, n_gates])
-
-    # Create CyLPModel and initialize it
-    model = CyLPModel()
-    G = np.matrix(A_Matrix)
-    h = CyLPArray(np.empty(B_vectors.shape[1]))
-    x = model.addVariable('x', G.shape[1])
-    model.addConstraint(G * x >= h)
-    c = CyLPArray(np.empty(weights.shape[1]))
-    model.objective = c * x
-
-    chunksize = int(n_rays/proc)
-    # check if equal sized chunks can be distributed to worker processes
-    if n_rays % chunksize != 0:
-        print("Problem of %d rays cannot be split to %d worker processes!\n\r"
-              "Fallback to 1 process!" % (n_rays, proc))
-        chunksize = n_rays  # fall back to one process
-        proc = 1
-
-    print("Calculating with %d processes, %d rays per chunk" %
-          (proc, chunksize))
-
-    def worker(model, B_vectors, weights, ray, chunksize, out_q):
-        """
-        The worker function, invoked in a process.
-        The results are placed in a dictionary that's pushed to a queue.
-        """
-        outdict = {}
-        iray = int(ray/chunksize)
-        outdict[iray] = solve_cylp(model, B_vectors, weights, ray, chunksize)
-        out_q.put(outdict)
-
-    # Queue for LP solutions
-    out_q = mp.Queue()
-    procs = []
-
-    # fire off worker processes
-    for raynum in range(0, n_rays, chunksize):
-        p = mp.Process(target=worker, args=(
-            model, B_vectors, weights, raynum, chunksize, out_q))
-        procs.append(p)
-        p.start()
-
-    # collecting results
-    resultdict = {}
-    for raynum in range(0, n_rays, chunksize):
-        resultdict.update(out_q.get())
-
-    # Wait for all worker processes to finish
-    for p in procs:
-        p.join()
-
-    # copy results in output array
-    for raynum in range(0, int(n_rays / chunksize)):
-        soln[raynum * chunksize:raynum * chunksize + chunksize, :] = (
-            resultdict[raynum])
+    soln = _solve_lp_rays_mp('cylp', A_Matrix, B_vectors, weights,
+                             really_verbose=really_verbose, proc=proc,
+                             pool=pool)
 
     # apply smoothing filter to output array
     soln = smooth_and_trim_scan(soln, window_len=5, window='sg_smooth')
@@ -979,13 +930,221 @@ def LP_solver_cylp(A_Matrix, B_vectors, weights, really_verbose=False):
     return soln
 
 
+def LP_solver_scipy(A_Matrix, B_vectors, weights, really_verbose=False,
+                    proc=1, pool=None):
+    """
+    Solve the Linear Programming problem given in Giangrande et al, 2012 using
+    the HiGHS solvers in SciPy.
+
+    Parameters
+    ----------
+    A_Matrix : matrix
+        Row augmented A matrix, see :py:func:`construct_A_matrix`
+    B_vectors : matrix
+        Matrix containing B vectors, see :py:func:`construct_B_vectors`
+    weights : array
+        Weights.
+    really_verbose : bool, optional
+        True to print HiGHS messaging. False to suppress.
+    proc : int, optional
+        Number of worker processes, the rays are split into one chunk of
+        consecutive rays per process. When pool is given it should be set to
+        the number of processes in the pool.
+    pool : multiprocessing.Pool, optional
+        Pool of worker processes to solve the rays with.
+
+    Returns
+    -------
+    soln : array
+        Solution to LP problem.
+
+    See Also
+    --------
+    LP_solver_cylp : Solve LP problem using the CyLP module.
+    LP_solver_cylp_mp : Solve LP problem using the CyLP module
+                        using multi processes.
+
+    """
+    soln = _solve_lp_rays_mp('scipy', A_Matrix, B_vectors, weights,
+                             really_verbose=really_verbose, proc=proc,
+                             pool=pool)
+
+    # apply smoothing filter on a per scan basis
+    soln = smooth_and_trim_scan(soln, window_len=5, window='sg_smooth')
+    return soln
+
+
+# LP ray solvers of this process, kept between calls so that worker
+# processes of a pool only build the model of each A matrix once.
+_LP_RAY_SOLVERS = {}
+
+
+def _make_lp_ray_solver(backend, A_Matrix, really_verbose=False):
+    """
+    Return a function solving the LP problem of a single ray given its B
+    vector and weights. The CyLP solver warm starts each solve from the
+    optimal basis of the previous ray.
+    """
+    A_Matrix = scipy.sparse.csr_matrix(A_Matrix)
+    if backend == 'cylp':
+        from cylp.cy.CyClpSimplex import CyClpSimplex
+        from cylp.py.modeling.CyLPModel import CyLPModel, CyLPArray
+
+        # Create CyLPModel and initialize it
+        model = CyLPModel()
+        G = np.matrix(A_Matrix.toarray())
+        h = CyLPArray(np.empty(G.shape[0]))
+        x = model.addVariable('x', G.shape[1])
+        model.addConstraint(G * x >= h)
+        c = CyLPArray(np.empty(G.shape[1]))
+        model.objective = c * x
+
+        # import model in solver
+        s = CyClpSimplex(model)
+        # disable logging
+        if not really_verbose:
+            s.logLevel = 0
+
+        def solve(b_vector, weights):
+            # set new B_vector values and weights (objectives) for the ray
+            s.setRowLowerArray(b_vector)
+            s.setObjectiveArray(weights)
+            # solve with dual method, it is faster
+            s.dual()
+            return s.primalVariableSolution['x']
+
+    elif backend == 'scipy':
+        # A x >= b is passed to linprog as -A x <= -b
+        A_ub = -A_Matrix
+
+        def solve(b_vector, weights):
+            result = scipy.optimize.linprog(
+                weights, A_ub=A_ub, b_ub=-b_vector, bounds=(0, None),
+                method='highs', options={'disp': really_verbose})
+            if not result.success:
+                # leave the ray unprocessed, e.g., when the edges of the ray
+                # make the self consistency constraints infeasible
+                warnings.warn('LP solver failed: ' + result.message)
+                n_gates = len(weights) // 2
+                return np.concatenate([np.zeros(n_gates),
+                                       b_vector[n_gates: 2 * n_gates]])
+            return result.x
+
+    else:
+        raise ValueError('unknown LP backend: ' + backend)
+    return solve
+
+
+def _solve_lp_rays(backend, A_Matrix, B_vectors, weights,
+                   really_verbose=False):
+    """
+    Solve the LP problem of consecutive rays with a solver for A_Matrix
+    which is cached in the calling process.
+    """
+    A_Matrix = scipy.sparse.csr_matrix(A_Matrix)
+    key = (backend, A_Matrix.shape, A_Matrix.indices.tobytes(),
+           A_Matrix.data.tobytes(), really_verbose)
+    if key not in _LP_RAY_SOLVERS:
+        if len(_LP_RAY_SOLVERS) >= 16:
+            _LP_RAY_SOLVERS.clear()
+        _LP_RAY_SOLVERS[key] = _make_lp_ray_solver(
+            backend, A_Matrix, really_verbose)
+    solve = _LP_RAY_SOLVERS[key]
+
+    B_vectors = np.asarray(B_vectors, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_gates = weights.shape[1] // 2
+    soln = np.zeros([B_vectors.shape[0], n_gates])
+    for raynum in range(B_vectors.shape[0]):
+        x = solve(B_vectors[raynum], weights[raynum])
+        soln[raynum] = x[n_gates: 2 * n_gates]
+    return soln
+
+
+def _solve_lp_chunk(args):
+    """ Worker function solving a chunk of rays, see _solve_lp_rays. """
+    return _solve_lp_rays(*args)
+
+
+def _solve_lp_rays_mp(backend, A_Matrix, B_vectors, weights,
+                      really_verbose=False, proc=1, pool=None):
+    """
+    Solve the LP problem of all rays, splitting them into one chunk of
+    consecutive rays per worker process. Chunks may differ in size by one
+    ray.
+    """
+    import multiprocessing as mp
+
+    if proc <= 1:
+        return _solve_lp_rays(backend, A_Matrix, B_vectors, weights,
+                              really_verbose)
+
+    # the sparse A matrix is much cheaper to send to the workers
+    A_Matrix = scipy.sparse.csr_matrix(A_Matrix)
+    B_vectors = np.asarray(B_vectors, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_rays = B_vectors.shape[0]
+    bounds = np.linspace(0, n_rays, min(proc, n_rays) + 1).astype(int)
+    chunks = [(backend, A_Matrix, B_vectors[start:end], weights[start:end],
+               really_verbose)
+              for start, end in zip(bounds[:-1], bounds[1:])]
+
+    if really_verbose:
+        print("Calculating with %d processes, %d chunks of rays" %
+              (proc, len(chunks)))
+
+    if pool is None:
+        with mp.Pool(proc) as pool:
+            solns = pool.map(_solve_lp_chunk, chunks)
+    else:
+        solns = pool.map(_solve_lp_chunk, chunks)
+    return np.concatenate(solns)
+
+
+def _open_lp_pool(LP_solver, proc, pool):
+    """
+    Return a new pool of proc worker processes if the LP solver uses one and
+    no pool was given, otherwise None.
+    """
+    import multiprocessing as mp
+
+    if pool is None and proc > 1 and LP_solver in ['cylp_mp', 'scipy']:
+        return mp.Pool(proc)
+    return None
+
+
+def _solve_lp_sweep(LP_solver, A_Matrix, B_vectors, weights, really_verbose,
+                    proc, pool):
+    """ Solve the LP problem of a sweep with the requested LP solver. """
+    if LP_solver == 'pyglpk':
+        mysoln = LP_solver_pyglpk(A_Matrix, B_vectors, weights,
+                                  really_verbose=really_verbose)
+    elif LP_solver == 'cvxopt':
+        mysoln = LP_solver_cvxopt(A_Matrix, B_vectors, weights)
+    elif LP_solver == 'cylp':
+        mysoln = LP_solver_cylp(A_Matrix, B_vectors, weights,
+                                really_verbose=really_verbose)
+    elif LP_solver == 'cylp_mp':
+        mysoln = LP_solver_cylp_mp(A_Matrix, B_vectors, weights,
+                                   really_verbose=really_verbose,
+                                   proc=proc, pool=pool)
+    elif LP_solver == 'scipy':
+        mysoln = LP_solver_scipy(A_Matrix, B_vectors, weights,
+                                 really_verbose=really_verbose,
+                                 proc=proc, pool=pool)
+    else:
+        raise ValueError('unknown LP_solver:' + LP_solver)
+    return mysoln
+
+
 def phase_proc_lp(radar, offset, debug=False, self_const=60000.0,
                   low_z=10.0, high_z=53.0, min_phidp=0.01, min_ncp=0.5,
                   min_rhv=0.8, fzl=4000.0, sys_phase=0.0,
                   overide_sys_phase=False, nowrap=None, really_verbose=False,
                   LP_solver='cylp', refl_field=None, ncp_field=None,
                   rhv_field=None, phidp_field=None, kdp_field=None,
-                  unf_field=None, window_len=35, proc=1, coef=0.914):
+                  unf_field=None, window_len=35, proc=1, coef=0.914,
+                  pool=None):
     """
     Phase process using a LP method [1].
 
@@ -1022,8 +1181,9 @@ def phase_proc_lp(radar, offset, debug=False, self_const=60000.0,
         Gate number to begin phase unwrapping. None will unwrap all phases.
     really_verbose : bool, optional
         True to print LPX messaging. False to suppress.
-    LP_solver : 'pyglpk' or 'cvxopt', 'cylp', or 'cylp_mp', optional
-        Module to use to solve LP problem. Default is 'cylp'.
+    LP_solver : 'pyglpk' or 'cvxopt', 'cylp', 'cylp_mp' or 'scipy', optional
+        Module to use to solve LP problem. Default is 'cylp'. 'scipy' uses
+        the HiGHS solvers in SciPy and requires no additional packages.
     refl_field, ncp_field, rhv_field, phidp_field, kdp_field : str, optional
         Name of field in radar which contains the horizonal reflectivity,
         normal coherent power, copolar coefficient, differential phase shift,
@@ -1039,9 +1199,16 @@ def phase_proc_lp(radar, offset, debug=False, self_const=60000.0,
         Length of Sobel window applied to PhiDP field when prior to
         calculating KDP.
     proc : int, optional
-        Number of worker processes, only used when `LP_solver` is 'cylp_mp'.
+        Number of worker processes, only used when `LP_solver` is 'cylp_mp'
+        or 'scipy'. The rays of each sweep are split into one chunk of
+        consecutive rays per process. When pool is given it should be set to
+        the number of processes in the pool.
     coef : float, optional
         Exponent linking Z to KDP in self consistency. kdp=(10**(0.1z))*coef
+    pool : multiprocessing.Pool, optional
+        Pool of worker processes used in place of starting new processes
+        when `LP_solver` is 'cylp_mp' or 'scipy'. The workers keep their LP
+        models, reusing a pool for several volumes avoids rebuilding them.
 
     Returns
     -------
@@ -1101,44 +1268,43 @@ def phase_proc_lp(radar, offset, debug=False, self_const=60000.0,
     proc_ph = copy.deepcopy(radar.fields[phidp_field])
     proc_ph['data'] = phidp_mod
     St_Gorlv_differential_5pts = [-.2, -.1, 0, .1, .2]
-    for sweep in range(len(radar.sweep_start_ray_index['data'])):
-        if debug:
-            print("Doing ", sweep)
-        end_gate, start_ray, end_ray = det_process_range(
-            radar, sweep, fzl, doc=15)
-        start_gate = 0
-
-        A_Matrix = construct_A_matrix(
-            len(radar.range['data'][start_gate:end_gate]),
-            St_Gorlv_differential_5pts)
-
-        B_vectors = construct_B_vectors(
-            phidp_mod[start_ray:end_ray, start_gate:end_gate],
-            z_mod[start_ray:end_ray, start_gate:end_gate],
-            St_Gorlv_differential_5pts, dweight=self_const,
-            coef=coef)
-
-        weights = np.ones(
-            phidp_mod[start_ray:end_ray, start_gate:end_gate].shape)
-
-        nw = np.bmat([weights, np.zeros(weights.shape)])
-
-        if LP_solver == 'pyglpk':
-            mysoln = LP_solver_pyglpk(A_Matrix, B_vectors, nw,
-                                      really_verbose=really_verbose)
-        elif LP_solver == 'cvxopt':
-            mysoln = LP_solver_cvxopt(A_Matrix, B_vectors, nw)
-        elif LP_solver == 'cylp':
-            mysoln = LP_solver_cylp(A_Matrix, B_vectors, nw,
-                                    really_verbose=really_verbose)
-        elif LP_solver == 'cylp_mp':
-            mysoln = LP_solver_cylp_mp(A_Matrix, B_vectors, nw,
-                                       really_verbose=really_verbose,
-                                       proc=proc)
-        else:
-            raise ValueError('unknown LP_solver:' + LP_solver)
 
-        proc_ph['data'][start_ray:end_ray, start_gate:end_gate] = mysoln
+    # a single pool of worker processes is used for all sweeps
+    own_pool = _open_lp_pool(LP_solver, proc, pool)
+    if own_pool is not None:
+        pool = own_pool
+
+    try:
+        for sweep in range(len(radar.sweep_start_ray_index['data'])):
+            if debug:
+                print("Doing ", sweep)
+            end_gate, start_ray, end_ray = det_process_range(
+                radar, sweep, fzl, doc=15)
+            start_gate = 0
+
+            A_Matrix = construct_A_matrix(
+                len(radar.range['data'][start_gate:end_gate]),
+                St_Gorlv_differential_5pts)
+
+            B_vectors = construct_B_vectors(
+                phidp_mod[start_ray:end_ray, start_gate:end_gate],
+                z_mod[start_ray:end_ray, start_gate:end_gate],
+                St_Gorlv_differential_5pts, dweight=self_const,
+                coef=coef)
+
+            weights = np.ones(
+                phidp_mod[start_ray:end_ray, start_gate:end_gate].shape)
+
+            nw = np.bmat([weights, np.zeros(weights.shape)])
+
+            mysoln = _solve_lp_sweep(LP_solver, A_Matrix, B_vectors, nw,
+                                     really_verbose, proc, pool)
+
+            proc_ph['data'][start_ray:end_ray, start_gate:end_gate] = mysoln
+    finally:
+        if own_pool is not None:
+            own_pool.close()
+            own_pool.join()
 
     last_gates = proc_ph['data'][start_ray:end_ray, -16]
     proc_ph['data'][start_ray:end_ray, -16:] = \
@@ -1172,7 +1338,7 @@ def phase_proc_lp_gf(radar, gatefilter=None, debug=False, self_const=60000.0,
                      LP_solver='cylp', refl_field=None, phidp_field=None,
                      kdp_field=None, unf_field=None, window_len=35, proc=1,
                      coef=0.914, ncpts=None, first_gate_sysp=None, offset=0.0,
-                     doc=0):
+                     doc=0, pool=None):
     """
     Phase process using a LP method [1] using Py-ART's Gatefilter.
 
@@ -1201,8 +1367,9 @@ def phase_proc_lp_gf(radar, gatefilter=None, debug=False, self_const=60000.0,
         Gate number to begin phase unwrapping. None will unwrap all phases.
     really_verbose : bool, optional
         True to print LPX messaging. False to suppress.
-    LP_solver : 'pyglpk' or 'cvxopt', 'cylp', or 'cylp_mp', optional
-        Module to use to solve LP problem. Default is 'cylp'.
+    LP_solver : 'pyglpk' or 'cvxopt', 'cylp', 'cylp_mp' or 'scipy', optional
+        Module to use to solve LP problem. Default is 'cylp'. 'scipy' uses
+        the HiGHS solvers in SciPy and requires no additional packages.
     refl_field, ncp_field, rhv_field, phidp_field, kdp_field : str, optional
         Name of field in radar which contains the horizonal reflectivity,
         normal coherent power, copolar coefficient, differential phase shift,
@@ -1218,7 +1385,10 @@ def phase_proc_lp_gf(radar, gatefilter=None, debug=False, self_const=60000.0,
         Length of Sobel window applied to PhiDP field when prior to
         calculating KDP.
     proc : int, optional
-        Number of worker processes, only used when `LP_solver` is 'cylp_mp'.
+        Number of worker processes, only used when `LP_solver` is 'cylp_mp'
+        or 'scipy'. The rays of each sweep are split into one chunk of
+        consecutive rays per process. When pool is given it should be set to
+        the number of processes in the pool.
     coef : float, optional
         Exponent linking Z to KDP in self consistency. kdp=(10**(0.1z))*coef
     ncpts : int, optional
@@ -1228,6 +1398,10 @@ def phase_proc_lp_gf(radar, gatefilter=None, debug=False, self_const=60000.0,
         Reflectivity offset to add in dBz.
     doc : int, optional
         Number of gates to "doc" off the end of a ray.
+    pool : multiprocessing.Pool, optional
+        Pool of worker processes used in place of starting new processes
+        when `LP_solver` is 'cylp_mp' or 'scipy'. The workers keep their LP
+        models, reusing a pool for several volumes avoids rebuilding them.
 
     Returns
     -------
@@ -1291,46 +1465,44 @@ def phase_proc_lp_gf(radar, gatefilter=None, debug=False, self_const=60000.0,
     proc_ph['data'] = phidp_mod
     St_Gorlv_differential_5pts = [-.2, -.1, 0, .1, .2]
 
-    for sweep in range(len(radar.sweep_start_ray_index['data'])):
-        if debug:
-            print("Doing ", sweep)
-
-        end_gate, start_ray, end_ray = det_process_range(
-            radar, sweep, fzl, doc=doc)
-
-        start_gate = 0
-
-        A_Matrix = construct_A_matrix(
-            len(radar.range['data'][start_gate:end_gate]),
-            St_Gorlv_differential_5pts)
-
-        B_vectors = construct_B_vectors(
-            phidp_mod[start_ray:end_ray, start_gate:end_gate],
-            z_mod[start_ray:end_ray, start_gate:end_gate],
-            St_Gorlv_differential_5pts, dweight=self_const,
-            coef=coef)
-
-        weights = np.ones(
-            phidp_mod[start_ray:end_ray, start_gate:end_gate].shape)
-
-        nw = np.bmat([weights, np.zeros(weights.shape)])
-
-        if LP_solver == 'pyglpk':
-            mysoln = LP_solver_pyglpk(A_Matrix, B_vectors, nw,
-                                      really_verbose=really_verbose)
-        elif LP_solver == 'cvxopt':
-            mysoln = LP_solver_cvxopt(A_Matrix, B_vectors, nw)
-        elif LP_solver == 'cylp':
-            mysoln = LP_solver_cylp(A_Matrix, B_vectors, nw,
-                                    really_verbose=really_verbose)
-        elif LP_solver == 'cylp_mp':
-            mysoln = LP_solver_cylp_mp(A_Matrix, B_vectors, nw,
-                                       really_verbose=really_verbose,
-                                       proc=proc)
-        else:
-            raise ValueError('unknown LP_solver:' + LP_solver)
+    # a single pool of worker processes is used for all sweeps
+    own_pool = _open_lp_pool(LP_solver, proc, pool)
+    if own_pool is not None:
+        pool = own_pool
+
+    try:
+        for sweep in range(len(radar.sweep_start_ray_index['data'])):
+            if debug:
+                print("Doing ", sweep)
+
+            end_gate, start_ray, end_ray = det_process_range(
+                radar, sweep, fzl, doc=doc)
+
+            start_gate = 0
+
+            A_Matrix = construct_A_matrix(
+                len(radar.range['data'][start_gate:end_gate]),
+                St_Gorlv_differential_5pts)
+
+            B_vectors = construct_B_vectors(
+                phidp_mod[start_ray:end_ray, start_gate:end_gate],
+                z_mod[start_ray:end_ray, start_gate:end_gate],
+                St_Gorlv_differential_5pts, dweight=self_const,
+                coef=coef)
+
+            weights = np.ones(
+                phidp_mod[start_ray:end_ray, start_gate:end_gate].shape)
+
+            nw = np.bmat([weights, np.zeros(weights.shape)])
+
+            mysoln = _solve_lp_sweep(LP_solver, A_Matrix, B_vectors, nw,
+                                     really_verbose, proc, pool)
 
-        proc_ph['data'][start_ray:end_ray, start_gate:end_gate] = mysoln
+            proc_ph['data'][start_ray:end_ray, start_gate:end_gate] = mysoln
+    finally:
+        if own_pool is not None:
+            own_pool.close()
+            own_pool.join()
 
     last_gates = proc_ph['data'][start_ray:end_ray, -16]
     proc_ph['data'][start_ray:end_ray, -16:] = \
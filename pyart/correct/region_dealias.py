@@ -13,7 +13,9 @@ from scipy.optimize import fmin_l_bfgs_b
 from ..config import get_metadata, get_fillvalue
 from ._common_dealias import _parse_fields, _parse_gatefilter, _set_limits
 from ._common_dealias import _parse_rays_wrap_around, _parse_nyquist_vel
+from ._common_dealias import _map_sweeps
 from ._fast_edge_finder import _fast_edge_finder
+from ._fast_network_reduction import _reduce_network
 
 
 # Possible future improvements to the region based dealiasing algorithm:
@@ -29,8 +31,6 @@ from ._fast_edge_finder import _fast_edge_finder
 #   excluded by the filter are unfolded using a more elemenary approach.  In
 #   this manner the filter could define only "good" gates which establish the
 #   folding pattern which is then applied to all gates.
-# * Improve perfornace by implementing a priority queue in the _EdgeTracker
-#   object. See comments in the class for details.
 
 
 def dealias_region_based(
@@ -38,7 +38,8 @@ def dealias_region_based(
         skip_between_rays=100, skip_along_ray=100, centered=True,
         nyquist_vel=None, check_nyquist_uniform=True, gatefilter=False,
         rays_wrap_around=None, keep_original=False, set_limits=True,
-        vel_field=None, corr_vel_field=None, **kwargs):
+        vel_field=None, corr_vel_field=None, engine='cython', n_workers=1,
+        **kwargs):
     """
     Dealias Doppler velocities using a region based algorithm.
 
@@ -115,6 +116,17 @@ def dealias_region_based(
     corr_vel_field : str, optional
         Name to use for the dealiased Doppler velocity field metadata. None
         will use the default field name from the Py-ART configuration file.
+    engine : 'cython' or 'python', optional
+        Implementation used to reduce the network of regions. 'cython', the
+        default, uses a compiled network reduction with a priority queue of
+        edges. 'python' uses the reference _RegionTracker and _EdgeTracker
+        classes, which are much slower on sweeps with many regions. Both
+        engines find identical unfolding numbers.
+    n_workers : int, optional
+        Number of threads used to dealias the sweeps of the volume. Each
+        sweep is dealiased independently and the compiled parts of the
+        algorithm release the GIL, so sweeps can be dealiased concurrently.
+        The results do not depend on this parameter.
 
     Returns
     -------
@@ -123,6 +135,9 @@ def dealias_region_based(
         array is stored under the 'data' key.
 
     """
+    if engine not in ['cython', 'python']:
+        raise ValueError('Unknown engine: %s' % (engine, ))
+
     # parse function parameters
     vel_field, corr_vel_field = _parse_fields(vel_field, corr_vel_field)
     gatefilter = _parse_gatefilter(gatefilter, radar, **kwargs)
@@ -144,9 +159,8 @@ def dealias_region_based(
     vdata = radar.fields[vel_field]['data'].view(np.ndarray)
     data = vdata.copy()     # dealiased velocities
 
-    # loop over sweeps
-    for nsweep, sweep_slice in enumerate(radar.iter_slice()):
-
+    def dealias_sweep(nsweep, sweep_slice):
+        """ Dealias a single sweep, storing the results in data. """
         # extract sweep data
         sdata = vdata[sweep_slice].copy()   # is a copy needed here?
         scorr = data[sweep_slice]
@@ -166,7 +180,7 @@ def dealias_region_based(
         labels, nfeatures = _find_regions(sdata, sfilter, s_interval_limits)
         # skip sweep if all gates are masked or only a single region
         if nfeatures < 2:
-            continue
+            return
         bincount = np.bincount(labels.ravel())
         num_masked_gates = bincount[0]
         region_sizes = bincount[1:]
@@ -178,28 +192,24 @@ def dealias_region_based(
 
         # no unfolding required if no edges exist between regions
         if len(edge_count) == 0:
-            continue
+            return
 
         # find the number of folds in the regions
-        region_tracker = _RegionTracker(region_sizes)
-        edge_tracker = _EdgeTracker(indices, edge_count, velos,
-                                    nyquist_interval, nfeatures+1)
-        while True:
-            if _combine_regions(region_tracker, edge_tracker):
-                break
+        unwrap_number = _find_unwrap_numbers(
+            region_sizes, indices, edge_count, velos, nyquist_interval,
+            engine)
 
         # center sweep if requested, determine a global sweep unfold number
         # so that the average number of gate folds is zero.
         if centered:
             gates_dealiased = region_sizes.sum()
-            total_folds = np.sum(
-                region_sizes * region_tracker.unwrap_number[1:])
+            total_folds = np.sum(region_sizes * unwrap_number[1:])
             sweep_offset = int(round(float(total_folds) / gates_dealiased))
             if sweep_offset != 0:
-                region_tracker.unwrap_number -= sweep_offset
+                unwrap_number -= sweep_offset
 
         # dealias the data using the fold numbers
-        nwrap = np.take(region_tracker.unwrap_number, labels)
+        nwrap = np.take(unwrap_number, labels)
         scorr += nwrap * nyquist_interval
 
         # anchor unfolded velocities against reference velocity
@@ -247,6 +257,9 @@ def dealias_region_based(
                                              np.round(nyq_adjustments[0][i]))
                     i = i + 1
 
+    # dealias the sweeps, possibly in parallel
+    _map_sweeps(dealias_sweep, radar, n_workers)
+
     # fill_value from the velocity dictionary if present
     fill_value = radar.fields[vel_field].get('_FillValue', get_fillvalue())
 
@@ -389,6 +402,39 @@ def _edge_sum_and_count(labels, num_masked_gates, data,
     return (index1, index2), count, (vel1, vel2)
 
 
+def _find_unwrap_numbers(region_sizes, indices, edge_count, velocities,
+                         nyquist_interval, engine='cython'):
+    """
+    Reduce the network of regions, return the unwrap number of each region.
+
+    The first element of the returned array is the unwrap number of the
+    masked gates, always 0.
+    """
+    nnodes = len(region_sizes) + 1
+    if engine == 'python':
+        region_tracker = _RegionTracker(region_sizes)
+        edge_tracker = _EdgeTracker(indices, edge_count, velocities,
+                                    nyquist_interval, nnodes)
+        while True:
+            if _combine_regions(region_tracker, edge_tracker):
+                break
+        return region_tracker.unwrap_number
+
+    # edges are listed in both directions, keep the same edges, in the same
+    # order, as the _EdgeTracker class so ties are broken identically.
+    idx1, idx2 = indices
+    vel1, vel2 = velocities
+    keep = idx1 >= idx2
+    node_alpha = np.ascontiguousarray(idx1[keep], dtype=np.int32)
+    node_beta = np.ascontiguousarray(idx2[keep], dtype=np.int32)
+    sum_diff = ((vel1[keep] - vel2[keep]) / nyquist_interval).astype(
+        np.float32)
+    weight = np.ascontiguousarray(edge_count[keep], dtype=np.int32)
+    node_size = np.zeros(nnodes, dtype=np.int32)
+    node_size[1:] = region_sizes
+    return _reduce_network(node_alpha, node_beta, sum_diff, weight, node_size)
+
+
 def _combine_regions(region_tracker, edge_tracker):
     """ Returns True when done. """
     # Edge parameters from edge with largest weight
@@ -540,7 +586,12 @@ class _RegionTracker(object):
 
 
 class _EdgeTracker(object):
-    """ A class for tracking edges in a dynamic network. """
+    """
+    A class for tracking edges in a dynamic network.
+
+    Reference implementation of the network reduction performed by the
+    _fast_network_reduction extension.
+    """
 
     def __init__(self, indices, edge_count, velocities, nyquist_interval,
                  nnodes):
@@ -582,10 +633,6 @@ class _EdgeTracker(object):
 
             edge += 1
 
-        # list which orders edges according to their weight, highest first
-        # TODO
-        self.priority_queue = []
-
     def merge_nodes(self, base_node, merge_node, foo_edge):
         """ Merge nodes. """
 
@@ -659,13 +706,6 @@ class _EdgeTracker(object):
         self.edges_in_node[merge_node].remove(merge_edge)
         self.edges_in_node[neighbor_node].remove(merge_edge)
 
-        # TODO priority queue
-        # remove merge_edge from edge priority queue
-        # self.priority_queue.remove(merge_edge)
-
-        # relocate base_edge in priority queue
-        # self.priority_queue.sort()
-
     def _reverse_edge_direction(self, edge):
         """ Reverse an edges direction, change alpha and beta. """
         # swap nodes
@@ -693,11 +733,6 @@ class _EdgeTracker(object):
 
     def pop_edge(self):
         """ Pop edge with largest weight. Return node numbers and diff. """
-
-        # if len(priority_queue) == 0:
-        #     return True, None
-
-        # edge_num = self.priority_queue[0]
         edge_num = np.argmax(self.weight)
         node1 = self.node_alpha[edge_num]
         node2 = self.node_beta[edge_num]
@@ -0,0 +1,37 @@
+"""
+A script for benchmarking the profile and vectorized engines of the Z-PHI
+attenuation correction with a synthetic 360 x 1000 gate C-band volume.
+"""
+
+import time
+
+import numpy as np
+
+from pyart.correct.attenuation import calculate_attenuation_zphi
+from pyart.testing import sample_objects
+
+
+def benchmark_attenuation_zphi(repeat=3):
+    """
+    Time both engines of calculate_attenuation_zphi and check that they
+    agree.
+    """
+    radar = sample_objects.make_synthetic_polarimetric_radar()
+    results = {}
+    for engine in ['profile', 'vectorized']:
+        times = []
+        for _ in range(repeat):
+            start = time.time()
+            fields = calculate_attenuation_zphi(
+                radar, temp_field='temperature', engine=engine)
+            times.append(time.time() - start)
+        results[engine] = fields
+        print('%-10s: %.3f s' % (engine, min(times)))
+    diff = max(np.ma.max(np.abs(field_p['data'] - field_v['data']))
+               for field_p, field_v in zip(results['profile'],
+                                           results['vectorized']))
+    print('max difference: %g' % diff)
+
+
+if __name__ == "__main__":
+    benchmark_attenuation_zphi()
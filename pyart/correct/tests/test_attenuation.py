@@ -8,6 +8,7 @@ import os
 import pyart
 import numpy as np
 from numpy.testing import assert_allclose
+import pytest
 
 PATH = os.path.dirname(__file__)
 REFERENCE_RAYS_FILE = os.path.join(PATH, 'attenuation_rays.npz')
@@ -119,3 +120,49 @@ def test_specific_diff_attenuation():
                     rtol=1e-2, atol=1e-3)
     assert_allclose(ref['pida_dict'], pida_dict['data'], rtol=1e-2, atol=1e-3)
     assert_allclose(ref['cor_zdr'], cor_zdr['data'], rtol=1e-2, atol=1e-3)
+
+
+def test_attenuation_zphi_engines():
+    radar = _make_attenuation_radar()
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_masked('reflectivity')
+    for kwargs in [{'temp_field': 'temperature'},
+                   {'temp_field': 'temperature', 'gatefilter': gatefilter},
+                   {'temp_ref': 'fixed_fzl', 'fzl': 4000.0, 'doc': 15,
+                    'smooth_window_len': 0}]:
+        profile = pyart.correct.calculate_attenuation_zphi(
+            radar, engine='profile', **kwargs)
+        vectorized = pyart.correct.calculate_attenuation_zphi(
+            radar, engine='vectorized', **kwargs)
+        for field_p, field_v in zip(profile, vectorized):
+            assert np.array_equal(np.ma.getmaskarray(field_p['data']),
+                                  np.ma.getmaskarray(field_v['data']))
+            assert np.ma.allequal(field_p['data'], field_v['data'])
+        assert np.ma.count(profile[0]['data'] > 0) > 0
+
+    with pytest.raises(ValueError):
+        pyart.correct.calculate_attenuation_zphi(
+            radar, temp_field='temperature', engine='unknown')
+
+
+def _make_attenuation_radar(nrays=20, ngates=200):
+    """ Make a C-band radar with random fields and empty rays. """
+    rng = np.random.RandomState(0)
+    radar = pyart.testing.make_empty_ppi_radar(ngates, nrays, 1)
+    radar.range['data'] = np.arange(ngates) * 250.
+    radar.instrument_parameters = {'frequency': {'data': np.array([5.6e9])}}
+    refl = np.ma.masked_array(10. + 40. * rng.rand(nrays, ngates))
+    refl[rng.rand(nrays, ngates) < 0.3] = np.ma.masked
+    refl[5] = np.ma.masked
+    refl[6, :-3] = np.ma.masked
+    kdp = np.clip(rng.randn(nrays, ngates) * 0.5 + 0.3, 0., None)
+    phidp = np.ma.masked_array(np.cumsum(kdp, axis=1) * 0.5 - 3.)
+    phidp[rng.rand(nrays, ngates) < 0.1] = np.ma.masked
+    temp = (np.tile(np.linspace(20., -20., ngates), (nrays, 1)) +
+            rng.randn(nrays, 1) * 15.)
+    radar.add_field('reflectivity', {'data': refl})
+    radar.add_field('differential_phase', {'data': phidp})
+    radar.add_field('differential_reflectivity',
+                    {'data': np.ma.masked_array(rng.randn(nrays, ngates))})
+    radar.add_field('temperature', {'data': np.ma.masked_array(temp)})
+    return radar
@@ -8,6 +8,7 @@
 # python test_phase_proc.py -r
 # to recreate the reference_rays.npz and reference_ray_plot.png files
 
+import multiprocessing
 import os
 import warnings
 
@@ -105,6 +106,72 @@ def test_phase_proc_lp_cylp_mp():
                   radar.fields['unfolded_differential_phase']['data']) <= 0.01
 
 
+def test_phase_proc_lp_scipy():
+    radar, phidp, kdp = perform_phase_processing('scipy')
+    ref = np.load(REFERENCE_RAYS_FILE)
+    assert _ratio(ref['reference_phidp'], phidp['data']) <= 0.01
+    assert _ratio(ref['reference_kdp'], kdp['data']) <= 0.01
+    assert _ratio(ref['reference_unfolded_phidp'],
+                  radar.fields['unfolded_differential_phase']['data']) <= 0.01
+
+
+def test_phase_proc_lp_scipy_mp():
+    # three rays do not split evenly between two processes
+    radar = _make_three_ray_radar()
+    phidp, kdp = pyart.correct.phase_proc_lp(radar, 0.0, LP_solver='scipy')
+
+    radar = _make_three_ray_radar()
+    phidp_mp, kdp_mp = pyart.correct.phase_proc_lp(
+        radar, 0.0, LP_solver='scipy', proc=2)
+    assert np.allclose(phidp_mp['data'], phidp['data'])
+    assert np.allclose(kdp_mp['data'], kdp['data'])
+
+    # a pool is reused between volumes
+    kwargs = {'LP_solver': 'scipy', 'doc': 15, 'ncpts': 20,
+              'system_phase': -140.1}
+    with multiprocessing.Pool(2) as pool:
+        for _ in range(2):
+            radar = _make_three_ray_radar()
+            phidp_pool, kdp_pool = pyart.correct.phase_proc_lp_gf(
+                radar, gatefilter=_make_gatefilter(radar), pool=pool,
+                proc=2, **kwargs)
+    radar = _make_three_ray_radar()
+    phidp_gf, kdp_gf = pyart.correct.phase_proc_lp_gf(
+        radar, gatefilter=_make_gatefilter(radar), **kwargs)
+    assert np.allclose(phidp_pool['data'], phidp_gf['data'])
+
+
+def test_phase_proc_lp_pool_closed_on_error(monkeypatch):
+    # the pool started by phase_proc_lp is closed when a sweep fails
+    pools = []
+
+    def open_pool(LP_solver, proc, pool):
+        pools.append(multiprocessing.Pool(proc))
+        return pools[-1]
+
+    def fail(*args):
+        raise RuntimeError('LP failure')
+
+    monkeypatch.setattr(pyart.correct.phase_proc, '_open_lp_pool', open_pool)
+    monkeypatch.setattr(pyart.correct.phase_proc, '_solve_lp_sweep', fail)
+    radar = _make_three_ray_radar()
+    with pytest.raises(RuntimeError):
+        pyart.correct.phase_proc_lp(radar, 0.0, LP_solver='scipy', proc=2)
+    # a closed pool does not accept new tasks
+    with pytest.raises(ValueError):
+        pools[0].apply(abs, (1, ))
+
+
+def _make_three_ray_radar():
+    """ Return a radar with three copies of the single ray radar ray. """
+    single = pyart.testing.make_single_ray_radar()
+    radar = pyart.testing.make_empty_ppi_radar(983, 3, 1)
+    radar.range['data'] = single.range['data']
+    for field_name, field in single.fields.items():
+        radar.fields[field_name] = {'data': np.tile(field['data'], (3, 1))}
+    return radar
+
+
 def _ratio(a1, a2):
     """ Ratio the sum of the abs difference vs sum abs of two vectors. """
     abs_residues = np.abs(a1 - a2).sum()
@@ -118,12 +185,18 @@ def perform_phase_processing(LP_solver='pyglpk'):
     phidp, kdp = pyart.correct.phase_proc_lp(radar, 0.0, LP_solver=LP_solver)
     return radar, phidp, kdp
 
-def perform_phase_processing_gf(LP_solver='pyglpk'):
-    """ Perform LP phase processing on a single ray radar. """
-    radar = pyart.testing.make_single_ray_radar()
+def _make_gatefilter(radar):
+    """ Return a gatefilter excluding gates with low NCP or RHOHV. """
     my_gatefilter = pyart.filters.GateFilter(radar)
     my_gatefilter.exclude_below('normalized_coherent_power', 0.5)
     my_gatefilter.exclude_below('cross_correlation_ratio', 0.8)
+    return my_gatefilter
+
+
+def perform_phase_processing_gf(LP_solver='pyglpk'):
+    """ Perform LP phase processing on a single ray radar. """
+    radar = pyart.testing.make_single_ray_radar()
+    my_gatefilter = _make_gatefilter(radar)
     phidp, kdp = pyart.correct.phase_proc_lp_gf(radar, gatefilter=my_gatefilter,
                                                 LP_solver=LP_solver, doc=15,
                                                 ncpts=20, system_phase=-140.1)
@@ -6,6 +6,8 @@
 
 import warnings
 
+import pytest
+
 import pyart
 import numpy as np
 from numpy.testing import assert_allclose, assert_almost_equal
@@ -131,6 +133,42 @@ def test_dealias_region_based_no_wrap_around():
     assert not np.ma.is_masked(dealias_vel['data'][-1, 29])
 
 
+def test_dealias_region_based_engines():
+    # the compiled and python network reductions find identical unfoldings
+    # on a noisy sweep with many small regions
+    radar = pyart.testing.make_empty_ppi_radar(60, 40, 1)
+    rng = np.random.RandomState(0)
+    vel = np.cumsum(rng.randn(40, 60) * 4., axis=1)
+    vel = (vel + 10.) % 20. - 10.
+    mask = rng.rand(40, 60) < 0.1
+    radar.add_field('velocity', {'data': np.ma.masked_array(vel, mask=mask)})
+    for interval_splits in [3, 6]:
+        cython_vel = pyart.correct.dealias_region_based(
+            radar, nyquist_vel=10., interval_splits=interval_splits,
+            skip_between_rays=1, skip_along_ray=1, engine='cython')
+        python_vel = pyart.correct.dealias_region_based(
+            radar, nyquist_vel=10., interval_splits=interval_splits,
+            skip_between_rays=1, skip_along_ray=1, engine='python')
+        assert np.ma.allequal(cython_vel['data'], python_vel['data'])
+
+    with pytest.raises(ValueError):
+        pyart.correct.dealias_region_based(radar, engine='foo')
+
+
+def test_dealias_region_based_n_workers():
+    radar = pyart.testing.make_empty_ppi_radar(50, 36, 4)
+    rng = np.random.RandomState(0)
+    vel = np.cumsum(rng.randn(144, 50) * 2., axis=1)
+    vel = (vel + 10.) % 20. - 10.
+    mask = rng.rand(144, 50) < 0.2
+    radar.add_field('velocity', {'data': np.ma.masked_array(vel, mask=mask)})
+    dealias_vel = pyart.correct.dealias_region_based(
+        radar, nyquist_vel=10.)
+    dealias_vel_threads = pyart.correct.dealias_region_based(
+        radar, nyquist_vel=10., n_workers=3)
+    assert np.ma.allequal(dealias_vel_threads['data'], dealias_vel['data'])
+
+
 def perform_dealias(**kwargs):
     """ Perform velocity dealiasing on reference data. """
     radar = pyart.testing.make_velocity_aliased_radar()
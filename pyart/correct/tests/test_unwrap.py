@@ -34,6 +34,24 @@ def test_dealias_unwrap_phase_volume():
     assert np.ma.is_masked(dealias_vel['data'][13]) is False
 
 
+def test_dealias_unwrap_phase_sweep_n_workers():
+    # masked gates are given pseudo random reliabilities which must not
+    # depend on the other sweeps being unwrapped at the same time
+    radar = pyart.testing.make_empty_ppi_radar(50, 36, 4)
+    rng = np.random.RandomState(0)
+    vel = np.cumsum(rng.randn(144, 50), axis=1)
+    vel = (vel + 10.) % 20. - 10.
+    mask = rng.rand(144, 50) < 0.2
+    radar.add_field('velocity', {'data': np.ma.masked_array(vel, mask=mask)})
+    dealias_vel = pyart.correct.dealias_unwrap_phase(
+        radar, nyquist_vel=10.)
+    for _ in range(3):
+        dealias_vel_threads = pyart.correct.dealias_unwrap_phase(
+            radar, nyquist_vel=10., n_workers=4)
+        assert np.ma.allequal(dealias_vel_threads['data'],
+                              dealias_vel['data'])
+
+
 def test_set_limits():
 
     radar, dealias_vel = perform_dealias('ray', set_limits=True)
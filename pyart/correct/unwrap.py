@@ -8,6 +8,7 @@ import numpy as np
 from ..config import get_metadata, get_fillvalue
 from ._common_dealias import _parse_fields, _parse_gatefilter, _set_limits
 from ._common_dealias import _parse_rays_wrap_around, _parse_nyquist_vel
+from ._common_dealias import _map_sweeps
 
 from ._unwrap_1d import unwrap_1d
 from ._unwrap_2d import unwrap_2d
@@ -18,7 +19,8 @@ def dealias_unwrap_phase(
         radar, unwrap_unit='sweep', nyquist_vel=None,
         check_nyquist_uniform=True, gatefilter=False,
         rays_wrap_around=None, keep_original=False, set_limits=True,
-        vel_field=None, corr_vel_field=None, skip_checks=False, **kwargs):
+        vel_field=None, corr_vel_field=None, skip_checks=False, n_workers=1,
+        **kwargs):
     """
     Dealias Doppler velocities using multi-dimensional phase unwrapping
     [1]_ and [2]_.
@@ -76,6 +78,11 @@ def dealias_unwrap_phase(
         True to skip checks verifing that an appropiate unwrap_unit is
         selected, False retains these checked. Setting this parameter to True
         is not recommended and is only offered as an option for extreme cases.
+    n_workers : int, optional
+        Number of threads used to unwrap the sweeps of the volume when
+        unwrap_unit is 'sweep'. The phase unwrapping releases the GIL so
+        sweeps can be unwrapped concurrently. The results do not depend on
+        this parameter.
 
     Returns
     -------
@@ -120,7 +127,7 @@ def dealias_unwrap_phase(
         data = _dealias_unwrap_1d(vdata, nyquist_vel)
     elif unwrap_unit == 'sweep':
         data = _dealias_unwrap_2d(
-            radar, vdata, nyquist_vel, gfilter, rays_wrap_around)
+            radar, vdata, nyquist_vel, gfilter, rays_wrap_around, n_workers)
     elif unwrap_unit == 'volume':
         data = _dealias_unwrap_3d(
             radar, vdata, nyquist_vel, gfilter, rays_wrap_around)
@@ -194,10 +201,13 @@ def _dealias_unwrap_1d(vdata, nyquist_vel):
     return data
 
 
-def _dealias_unwrap_2d(radar, vdata, nyquist_vel, gfilter, rays_wrap_around):
+def _dealias_unwrap_2d(radar, vdata, nyquist_vel, gfilter, rays_wrap_around,
+                       n_workers=1):
     """ Dealias using 2D phase unwrapping (sweep-by-sweep). """
     data = np.zeros_like(vdata)
-    for nsweep, sweep_slice in enumerate(radar.iter_slice()):
+
+    def unwrap_sweep(nsweep, sweep_slice):
+        """ Unwrap a single sweep, storing the results in data. """
         # extract sweep and scale to phase units
         sweep_nyquist_vel = nyquist_vel[nsweep]
         scaled_sweep = vdata[sweep_slice] * np.pi / sweep_nyquist_vel
@@ -211,6 +221,8 @@ def _dealias_unwrap_2d(radar, vdata, nyquist_vel, gfilter, rays_wrap_around):
 
         # scale back into velocity units and store
         data[sweep_slice, :] = unwrapped * sweep_nyquist_vel / np.pi
+
+    _map_sweeps(unwrap_sweep, radar, n_workers)
     return data
 
 
@@ -143,6 +143,15 @@ void quicker_sort(EDGE *left, EDGE *right)
 }
 //--------------end quicker_sort algorithm -----------------------------------
 
+//pseudo random numbers in [0, 2^31) from a linear congruential generator
+//whose state is local to the caller, unlike rand() the sequence does not
+//depend on other threads or earlier calls.
+static unsigned int lcg_rand(unsigned int *state)
+{
+  *state = *state * 1103515245u + 12345u;
+  return *state >> 1;
+}
+
 //--------------------start initialize pixels ----------------------------------
 //initialize pixels. See the explination of the pixel class above.
 //initially every pixel is assumed to belong to a group consisting of only itself
@@ -152,6 +161,7 @@ void  initialisePIXELs(double *wrapped_image, unsigned char *input_mask, unsigne
   double *wrapped_image_pointer = wrapped_image;
   unsigned char *input_mask_pointer = input_mask;
   unsigned char *extended_mask_pointer = extended_mask;
+  unsigned int rand_state = 1;
   int i, j;
 
   for (i=0; i < image_height; i++)
@@ -161,7 +171,7 @@ void  initialisePIXELs(double *wrapped_image, unsigned char *input_mask, unsigne
 	  pixel_pointer->increment = 0;
 	  pixel_pointer->number_of_pixels_in_group = 1;
 	  pixel_pointer->value = *wrapped_image_pointer;
-	  pixel_pointer->reliability = 9999999. + rand();
+	  pixel_pointer->reliability = 9999999. + lcg_rand(&rand_state);
 	  pixel_pointer->input_mask = *input_mask_pointer;
 	  pixel_pointer->extended_mask = *extended_mask_pointer;
 	  pixel_pointer->head = pixel_pointer;
@@ -81,6 +81,7 @@ signal_to_noise_ratio = 'signal_to_noise_ratio'
 rain_rate = 'rain_rate'
 radar_estimated_rain_rate = 'radar_estimated_rain_rate'
 radar_echo_classification = 'radar_echo_classification'
+hydroclass_confidence = 'hydroclass_confidence'
 specific_attenuation = 'specific_attenuation'
 specific_differential_attenuation = 'specific_differential_attenuation'
 clutter_filter_power_removed = 'clutter_filter_power_removed'
@@ -172,6 +173,7 @@ DEFAULT_FIELD_NAMES = {
     'rain_rate': rain_rate,
     'radar_estimated_rain_rate': radar_estimated_rain_rate,
     'radar_echo_classification': radar_echo_classification,
+    'hydroclass_confidence': hydroclass_confidence,
     'specific_attenuation': specific_attenuation,
     'differential_phase_texture': differential_phase_texture,
     'eastward_wind_component': eastward_wind_component,
@@ -610,6 +612,14 @@ DEFAULT_METADATA = {
         'long_name': 'Radar Echo classification',
         'coordinates': 'elevation azimuth range'},
 
+    hydroclass_confidence: {
+        'units': '-',
+        'standard_name': 'hydroclass_confidence',
+        'long_name': 'Hydrometeor classification confidence',
+        'valid_min': 0.0,
+        'valid_max': 1.0,
+        'coordinates': 'elevation azimuth range'},
+
     specific_attenuation: {
         'units': 'dB/km',
         'standard_name': 'specific_attenuation',
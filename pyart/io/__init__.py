@@ -13,7 +13,7 @@ from .mdv_radar import read_mdv
 from .sigmet import read_sigmet
 from .chl import read_chl
 from .cfradial import read_cfradial, write_cfradial
-from .nexrad_archive import read_nexrad_archive
+from .nexrad_archive import read_nexrad_archive, NEXRADArchiveChunkReader
 from .nexrad_cdm import read_nexrad_cdm
 from .nexradl3_read import read_nexrad_level3
 from .uf import read_uf
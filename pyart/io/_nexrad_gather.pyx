@@ -0,0 +1,60 @@
+"""
+Fused extraction of NEXRAD moments from a decompressed Archive II buffer.
+
+"""
+
+cimport cython
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _fast_gather_scale(
+        const unsigned char[:] buf, long long[:] ptrs, int[:] ngates,
+        unsigned char[:] word_sizes, float scale, float offset,
+        float[:, :] data, unsigned char[:, :] mask):
+    """
+    _fast_gather_scale(buf, ptrs, ngates, word_sizes, scale, offset,
+                       data, mask)
+
+    Gather, mask and scale the moment data for a number of rays.
+    """
+    # Each ray is read from the buffer, decoded from big endian 8 or 16 bit
+    # codes, scaled and offset and written to data in a single pass. Codes
+    # of 0 (below threshold) and 1 (range folded) are masked, as are gates
+    # which are not present in the ray which are assigned a code of 1. Rays
+    # with a negative pointer do not contain the moment.
+    cdef Py_ssize_t nrays = data.shape[0]
+    cdef Py_ssize_t max_ngates = data.shape[1]
+    cdef Py_ssize_t buf_size = buf.shape[0]
+    cdef Py_ssize_t ray, gate, pos, ray_ngates, nbytes
+    cdef unsigned int code
+    cdef float missing_value = (1 - offset) / scale
+
+    with nogil:
+        for ray in range(nrays):
+            pos = ptrs[ray]
+            ray_ngates = 0
+            nbytes = 1
+            if pos >= 0:
+                nbytes = word_sizes[ray] // 8
+                # limit the gates to those requested and in the buffer
+                ray_ngates = min(ngates[ray], max_ngates)
+                ray_ngates = min(ray_ngates, (buf_size - pos) // nbytes)
+
+            if nbytes == 2:
+                for gate in range(ray_ngates):
+                    code = (buf[pos] << 8) | buf[pos + 1]
+                    pos += 2
+                    data[ray, gate] = (code - offset) / scale
+                    mask[ray, gate] = code <= 1
+            else:
+                for gate in range(ray_ngates):
+                    code = buf[pos]
+                    pos += 1
+                    data[ray, gate] = (code - offset) / scale
+                    mask[ray, gate] = code <= 1
+
+            for gate in range(ray_ngates, max_ngates):
+                data[ray, gate] = missing_value
+                mask[ray, gate] = 1
+    return
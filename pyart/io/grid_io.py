@@ -4,6 +4,7 @@ Reading and writing Grid objects.
 """
 
 import datetime
+import os
 import warnings
 
 import netCDF4
@@ -146,7 +147,8 @@ def read_grid(filename, exclude_fields=None, include_fields=None, **kwargs):
 def write_grid(filename, grid, format='NETCDF4',
                write_proj_coord_sys=True, proj_coord_sys=None,
                arm_time_variables=False, arm_alt_lat_lon_variables=False,
-               write_point_x_y_z=False, write_point_lon_lat_alt=False):
+               write_point_x_y_z=False, write_point_lon_lat_alt=False,
+               append=False):
     """
     Write a Grid object to a CF-1.5 and ARM standard netCDF file.
 
@@ -199,8 +201,19 @@ def write_grid(filename, grid, format='NETCDF4',
     write_point_lon_lat_alt : bool, optional
         True to include the point_longitude, point_latitude and point_altitude
         variables in the written file, False will not write these variables.
+    append : bool, optional
+        True to append the grid as a new time step to an existing file
+        written by this function, the file is created if it does not exist.
+        The time, grid origin and fields of the grid are appended, the grid
+        must have the same shape as those in the file and only fields
+        present in the file. All other parameters are only used when the
+        file is created.
 
     """
+    if append and os.path.exists(filename):
+        _append_grid(filename, grid)
+        return
+
     dset = netCDF4.Dataset(filename, mode='w', format=format)
 
     # create dimensions
@@ -352,6 +365,32 @@ def write_grid(filename, grid, format='NETCDF4',
     return
 
 
+def _append_grid(filename, grid):
+    """ Append a grid as a new time step to a file written by write_grid. """
+    dset = netCDF4.Dataset(filename, mode='a')
+    try:
+        shape = tuple([len(dset.dimensions[d]) for d in ['z', 'y', 'x']])
+        if shape != (grid.nz, grid.ny, grid.nx):
+            raise ValueError(
+                'grid shape %s does not match the shape of the grids in the '
+                'file %s' % ((grid.nz, grid.ny, grid.nx), shape))
+        missing_fields = [f for f in grid.fields if f not in dset.variables]
+        if len(missing_fields) != 0:
+            raise ValueError(
+                'fields not in the file: %s' % ', '.join(missing_fields))
+
+        itime = len(dset.dimensions['time'])
+        time = dset.variables['time']
+        dates = netCDF4.num2date(grid.time['data'][:1], grid.time['units'])
+        time[itime] = netCDF4.date2num(dates, time.units)[0]
+        for name in ['origin_latitude', 'origin_longitude', 'origin_altitude']:
+            dset.variables[name][itime] = getattr(grid, name)['data'][0]
+        for field, field_dic in grid.fields.items():
+            dset.variables[field][itime] = field_dic['data']
+    finally:
+        dset.close()
+
+
 def _make_coordinatesystem_dict(grid):
     """
     Return a dictionary containing parameters for a coordinate transform.
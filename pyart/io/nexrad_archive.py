@@ -1,5 +1,5 @@
 """
-Functions for reading NEXRAD Level II Archive files.
+Functions and classes for reading NEXRAD Level II Archive files.
 
 """
 
@@ -10,7 +10,7 @@ import numpy as np
 from ..config import FileMetadata, get_fillvalue
 from ..core.radar import Radar
 from .common import make_time_unit_str, _test_arguments, prepare_for_read
-from .nexrad_level2 import NEXRADLevel2File
+from .nexrad_level2 import NEXRADLevel2File, NEXRADLevel2ChunkedFile
 from ..lazydict import LazyLoadDict
 from .nexrad_common import get_nexrad_location
 from .nexrad_interpolate import _fast_interpolate_scan
@@ -69,7 +69,10 @@ def read_nexrad_archive(filename, field_names=None, additional_metadata=None,
         in older NEXRAD message 1 files.
     scans : list or None, optional
         Read only specified scans from the file. None (the default) will read
-        all scans.
+        all scans. Only the radials in these scans are decoded and for BZ2
+        compressed files the chunks following the last requested scan are not
+        decompressed, reading the lowest scans of a volume is therefore
+        considerably faster than reading the full volume.
     linear_interp : bool, optional
         True (the default) to perform linear interpolation between valid pairs
         of gates in low resolution rays in files mixed resolution rays.
@@ -97,8 +100,23 @@ def read_nexrad_archive(filename, field_names=None, additional_metadata=None,
                                 additional_metadata, file_field_names,
                                 exclude_fields, include_fields)
 
-    # open the file and retrieve scan information
-    nfile = NEXRADLevel2File(prepare_for_read(filename))
+    # open the file and create the radar
+    nfile = NEXRADLevel2File(prepare_for_read(filename), scans=scans)
+    radar = _radar_from_level2_file(
+        nfile, filemetadata, scans, delay_field_loading, station,
+        linear_interp)
+    nfile.close()
+    return radar
+
+
+def _radar_from_level2_file(nfile, filemetadata, scans, delay_field_loading,
+                            station, linear_interp):
+    """
+    Create a Radar object from a NEXRADLevel2File object.
+
+    See :py:func:`read_nexrad_archive` for a description of the parameters.
+    """
+    # retrieve scan information
     scan_info = nfile.scan_info(scans)
 
     # time
@@ -227,7 +245,6 @@ def read_nexrad_archive(filename, field_names=None, additional_metadata=None,
     instrument_parameters = {'unambiguous_range': unambiguous_range,
                              'nyquist_velocity': nyquist_velocity, }
 
-    nfile.close()
     return Radar(
         time, _range, fields, metadata, scan_type,
         latitude, longitude, altitude,
@@ -237,6 +254,109 @@ def read_nexrad_archive(filename, field_names=None, additional_metadata=None,
         instrument_parameters=instrument_parameters)
 
 
+class NEXRADArchiveChunkReader(object):
+    """
+    Incremental reader for NEXRAD Level 2 Archive volumes delivered as chunks.
+
+    Real-time NEXRAD Level 2 data is distributed as individual chunk files,
+    a start chunk followed by intermediate chunks and an end chunk. Chunks
+    are decoded as they are added and Radar objects containing the scans
+    which have been completed can be created at any time, allowing products
+    to be generated from the lowest scans long before the volume is
+    complete.
+
+    Parameters
+    ----------
+    field_names, additional_metadata, file_field_names, exclude_fields,
+    include_fields, delay_field_loading, station, linear_interp :
+        See :py:func:`read_nexrad_archive`.
+
+    Attributes
+    ----------
+    nfile : NEXRADLevel2ChunkedFile
+        Volume assembled from the chunks added to the reader.
+
+    Examples
+    --------
+    >>> reader = pyart.io.NEXRADArchiveChunkReader()
+    >>> for chunk_filename in chunk_filenames:
+    ...     completed_scans = reader.add_chunk(chunk_filename)
+    ...     if 0 in completed_scans:
+    ...         radar = reader.get_radar([0])
+
+    """
+
+    def __init__(self, field_names=None, additional_metadata=None,
+                 file_field_names=False, exclude_fields=None,
+                 include_fields=None, delay_field_loading=False,
+                 station=None, linear_interp=True):
+        """ initalize the object. """
+        self._filemetadata_args = (
+            field_names, additional_metadata, file_field_names,
+            exclude_fields, include_fields)
+        self._delay_field_loading = delay_field_loading
+        self._station = station
+        self._linear_interp = linear_interp
+        self.nfile = NEXRADLevel2ChunkedFile()
+
+    @property
+    def completed_scans(self):
+        """ Scans (0 based) for which all radials have been added. """
+        return self.nfile.completed_scans
+
+    @property
+    def volume_complete(self):
+        """ True when the last radial of the volume has been added. """
+        return self.nfile.volume_complete
+
+    def add_chunk(self, chunk):
+        """
+        Add a chunk to the volume.
+
+        Parameters
+        ----------
+        chunk : str, bytes or file-like
+            Filename, contents or file-like object of the chunk. Chunks must
+            be added in the order in which they were produced.
+
+        Returns
+        -------
+        scans : list
+            Scans (0 based) completed by this chunk.
+
+        """
+        return self.nfile.add_chunk(chunk)
+
+    def get_radar(self, scans=None):
+        """
+        Return a Radar object containing completed scans.
+
+        Parameters
+        ----------
+        scans : list or None
+            Scans (0 based) to include in the radar, these must have been
+            completed. None, the default, includes all completed scans.
+
+        Returns
+        -------
+        radar : Radar
+            Radar object containing the requested scans.
+
+        """
+        completed_scans = self.completed_scans
+        if scans is None:
+            scans = completed_scans
+        if len(scans) == 0:
+            raise ValueError('No completed scans in the volume')
+        incomplete = [scan for scan in scans if scan not in completed_scans]
+        if len(incomplete):
+            raise ValueError('Scans %s are not complete' % (incomplete, ))
+        filemetadata = FileMetadata('nexrad_archive', *self._filemetadata_args)
+        return _radar_from_level2_file(
+            self.nfile, filemetadata, list(scans), self._delay_field_loading,
+            self._station, self._linear_interp)
+
+
 def _find_range_params(scan_info, filemetadata):
     """ Return range parameters, first_gate, gate_spacing, last_gate. """
     min_first_gate = 999999
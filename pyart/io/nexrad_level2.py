@@ -58,12 +58,18 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
 import bz2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import islice
+import os
 import struct
 import warnings
 
 import numpy as np
 
+from ._nexrad_gather import _fast_gather_scale
+
 
 class NEXRADLevel2File(object):
     """
@@ -79,11 +85,24 @@ class NEXRADLevel2File(object):
     ----------
     filename : str
         Filename of Archive II file to read.
+    max_workers : int or None
+        Maximum number of threads used to decompress the chunks of BZ2
+        compressed files. None uses the default number of threads of
+        :py:class:`concurrent.futures.ThreadPoolExecutor`, 1 will decompress
+        the chunks sequentially.
+    scans : list or None
+        Scans (0 based) to read from the file. Radial messages from other
+        scans are not indexed and cannot be retrieved. For BZ2 compressed
+        files only the chunks containing these scans (and the metadata) are
+        kept and chunks following the last requested scan are not
+        decompressed. None, the default, reads all scans.
 
     Attributes
     ----------
     radial_records : list
-        Radial (1 or 31) messages in the file.
+        Radial (1 or 31) messages in the file. The messages are unpacked
+        into dictionaries the first time this attribute is accessed, reading
+        data from the file does not require them.
     nscans : int
         Number of scans in the file.
     scan_msgs : list of arrays
@@ -94,7 +113,14 @@ class NEXRADLevel2File(object):
     vcp : dict
         VCP information dictionary.
     _records : list
-        A list of all records (message) in the file.
+        A list of all records (message) in the file, unpacked on access.
+    _index : structured array
+        Columnar index of the radial messages with the buffer offset, type,
+        elevation number, collection time, angles and data block pointers of
+        each message, see RADIAL_INDEX_DTYPE.
+    _moment_index : structured array
+        Index of the moment data blocks with shape (nradials, nmoments), the
+        moments are ordered as in NEXRAD_MOMENTS, see MOMENT_INDEX_DTYPE.
     _fh : file-like
         File like object from which data is read.
     _msg_type : '31' or '1':
@@ -108,7 +134,7 @@ class NEXRADLevel2File(object):
 
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, max_workers=None, scans=None):
         """ initalize the object. """
         # read in the volume header and compression_record
         if hasattr(filename, 'read'):
@@ -122,8 +148,12 @@ class NEXRADLevel2File(object):
         # read the records in the file, decompressing as needed
         compression_slice = slice(CONTROL_WORD_SIZE, CONTROL_WORD_SIZE + 2)
         compression_or_ctm_info = compression_record[compression_slice]
+        if scans is None:
+            elevation_numbers = None
+        else:
+            elevation_numbers = [scan + 1 for scan in scans]
         if compression_or_ctm_info == b'BZ':
-            buf = _decompress_records(fh)
+            buf = _decompress_records(fh, max_workers, elevation_numbers)
         # The 12-byte compression record previously held the Channel Terminal
         # Manager (CTM) information. Bytes 4 through 6 contain the size of the
         # record (2432) as a big endian unsigned short, which is encoded as
@@ -134,36 +164,44 @@ class NEXRADLevel2File(object):
         else:
             raise IOError('unknown compression record')
         self._fh = fh
+        self._buf = buf
+        self._buf_arr = np.frombuffer(buf, dtype='u1')
+
+        # locate the records in the buffer, only the message headers are
+        # unpacked, radial messages are indexed in a columnar manner below.
+        self._record_pos, self._record_types = _scan_records(buf)
+        self._all_records = None
+        self._radial_records = None
 
-        # read the records from the buffer
-        self._records = []
-        buf_length = len(buf)
-        pos = 0
-        while pos < buf_length:
-            pos, dic = _get_record_from_buf(buf, pos)
-            self._records.append(dic)
-
-        # pull out radial records (1 or 31) which contain the moment data.
-        self.radial_records = [r for r in self._records
-                               if r['header']['type'] == 31]
+        # index the radial records (1 or 31) which contain the moment data.
         self._msg_type = '31'
-        if len(self.radial_records) == 0:
-            self.radial_records = [r for r in self._records
-                                   if r['header']['type'] == 1]
+        radial_pos = self._record_pos[self._record_types == 31]
+        if len(radial_pos) == 0:
             self._msg_type = '1'
-        if len(self.radial_records) == 0:
+            radial_pos = self._record_pos[self._record_types == 1]
+        if elevation_numbers is not None:
+            radial_types = np.full(len(radial_pos), int(self._msg_type))
+            in_scans = np.in1d(_elevation_numbers(
+                self._buf_arr, radial_pos, radial_types), elevation_numbers)
+            radial_pos = radial_pos[in_scans]
+        if len(radial_pos) == 0:
             raise ValueError('No MSG31 records found, cannot read file')
-        elev_nums = np.array([m['msg_header']['elevation_number']
-                              for m in self.radial_records])
+        if self._msg_type == '31':
+            self._index, self._moment_index = _index_msg31(
+                self._buf_arr, radial_pos)
+        else:
+            self._index, self._moment_index = _index_msg1(
+                self._buf_arr, radial_pos)
+        elev_nums = self._index['elevation_number']
         self.scan_msgs = [np.where(elev_nums == i + 1)[0]
                           for i in range(elev_nums.max())]
         self.nscans = len(self.scan_msgs)
 
         # pull out the vcp record
-        msg_5 = [r for r in self._records if r['header']['type'] == 5]
+        msg_5 = self._record_pos[self._record_types == 5]
 
         if len(msg_5):
-            self.vcp = msg_5[0]
+            self.vcp = _get_record_from_buf(buf, msg_5[0])[1]
         else:
             # There is no VCP Data.. This is uber dodgy
             warnings.warn("No MSG5 detected. Setting to meaningless data. "
@@ -173,6 +211,28 @@ class NEXRADLevel2File(object):
             self.vcp = None
         return
 
+    @property
+    def radial_records(self):
+        """ Radial messages unpacked into dictionaries, built on access. """
+        if self._radial_records is None:
+            buf = self._buf
+            self._radial_records = [
+                _get_record_from_buf(buf, pos)[1]
+                for pos in self._index['offset']]
+        return self._radial_records
+
+    @property
+    def _records(self):
+        """ All messages unpacked into dictionaries, built on access. """
+        if self._all_records is None:
+            buf = self._buf
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                self._all_records = [
+                    _get_record_from_buf(buf, pos)[1]
+                    for pos in self._record_pos]
+        return self._all_records
+
     def close(self):
         """ Close the file. """
         self._fh.close()
@@ -194,7 +254,8 @@ class NEXRADLevel2File(object):
 
         """
         if self._msg_type == '31':
-            dic = self.radial_records[0]['VOL']
+            dic = _unpack_from_buf(
+                self._buf_arr, self._index['vol_ptr'][0], VOLUME_DATA_BLOCK)
             height = dic['height'] + dic['feedhorn_height']
             return dic['lat'], dic['lon'], height
         else:
@@ -233,12 +294,12 @@ class NEXRADLevel2File(object):
                 self.nscans -= 1
                 continue
             msg31_number = self.scan_msgs[scan][0]
-            msg = self.radial_records[msg31_number]
-            nexrad_moments = ['REF', 'VEL', 'SW', 'ZDR', 'PHI', 'RHO', 'CFP']
-            moments = [f for f in nexrad_moments if f in msg]
-            ngates = [msg[f]['ngates'] for f in moments]
-            gate_spacing = [msg[f]['gate_spacing'] for f in moments]
-            first_gate = [msg[f]['first_gate'] for f in moments]
+            msg = self._moment_index[msg31_number]
+            present = msg['ptr'] >= 0
+            moments = [f for f, p in zip(NEXRAD_MOMENTS, present) if p]
+            ngates = msg['ngates'][present].tolist()
+            gate_spacing = msg['gate_spacing'][present].tolist()
+            first_gate = msg['first_gate'][present].tolist()
             info.append({
                 'nrays': nrays,
                 'ngates': ngates,
@@ -290,10 +351,11 @@ class NEXRADLevel2File(object):
             Range in meters from the antenna to the center of gate (bin).
 
         """
-        dic = self.radial_records[self.scan_msgs[scan_num][0]][moment]
-        ngates = dic['ngates']
-        first_gate = dic['first_gate']
-        gate_spacing = dic['gate_spacing']
+        msg_num = self.scan_msgs[scan_num][0]
+        dic = self._moment_index[msg_num, NEXRAD_MOMENTS.index(moment)]
+        ngates = int(dic['ngates'])
+        first_gate = int(dic['first_gate'])
+        gate_spacing = int(dic['gate_spacing'])
         return np.arange(ngates) * gate_spacing + first_gate
 
     # helper functions for looping over scans
@@ -306,19 +368,15 @@ class NEXRADLevel2File(object):
         Return an array of radial header elements for all rays in scans.
         """
         msg_nums = self._msg_nums(scans)
-        temp = [self.radial_records[i]['msg_header'][key] for i in msg_nums]
-        return np.array(temp)
+        return self._index[key][msg_nums]
 
     def _radial_sub_array(self, scans, key):
         """
         Return an array of RAD or msg_header elements for all rays in scans.
         """
-        msg_nums = self._msg_nums(scans)
-        if self._msg_type == '31':
-            tmp = [self.radial_records[i]['RAD'][key] for i in msg_nums]
-        else:
-            tmp = [self.radial_records[i]['msg_header'][key] for i in msg_nums]
-        return np.array(tmp)
+        # the index holds the RAD elements for message 31 and the
+        # msg_header elements for message 1 files in the same columns.
+        return self._radial_array(scans, key)
 
     def get_times(self, scans=None):
         """
@@ -428,10 +486,9 @@ class NEXRADLevel2File(object):
                              for i in scans], dtype='float32')
         else:
             scale = 180 / (4096 * 8.)
-            msgs = [self.radial_records[self.scan_msgs[i][0]] for i in scans]
-            return np.round(np.array(
-                [m['msg_header']['elevation_angle'] * scale for m in msgs],
-                dtype='float32'), 1)
+            msg_nums = [self.scan_msgs[i][0] for i in scans]
+            angles = self._index['elevation_angle'][msg_nums] * scale
+            return np.round(angles.astype('float32'), 1)
 
     def get_nyquist_vel(self, scans=None):
         """
@@ -508,90 +565,651 @@ class NEXRADLevel2File(object):
         if scans is None:
             scans = range(self.nscans)
 
-        # determine the number of rays
+        # gather the data directly from the buffer using the moment index
         msg_nums = self._msg_nums(scans)
-        nrays = len(msg_nums)
-        # extract the data
-        set_datatype = False
-        data = np.ones((nrays, max_ngates), '>B')
-        for i, msg_num in enumerate(msg_nums):
-            msg = self.radial_records[msg_num]
-            if moment not in msg.keys():
-                continue
-            if not set_datatype:
-                data = data.astype('>'+_bits_to_code(msg, moment))
-                set_datatype = True
-
-            ngates = min(msg[moment]['ngates'], max_ngates,
-                         len(msg[moment]['data']))
-            data[i, :ngates] = msg[moment]['data'][:ngates]
+        moment_index = self._moment_index[
+            msg_nums, NEXRAD_MOMENTS.index(moment)]
+        scale, offset = self._moment_scale_offset(moment, scans)
         # return raw data if requested
-        if raw_data:
-            return data
+        if raw_data or scale is None:
+            data = _gather_moment(self._buf_arr, moment_index, max_ngates)
+            if raw_data:
+                return data
+            # moment is not present in any scan, mask all values
+            return np.ma.masked_less_equal(data, 1)
+
+        # mask, scale and offset in a single pass over the buffer
+        nrays = len(moment_index)
+        data = np.empty((nrays, max_ngates), dtype='float32')
+        mask = np.empty((nrays, max_ngates), dtype='uint8')
+        _fast_gather_scale(
+            self._buf_arr, moment_index['ptr'].astype('int64'),
+            moment_index['ngates'].astype('int32'),
+            moment_index['word_size'].astype('uint8'),
+            scale, offset, data, mask)
+        return np.ma.array(data, mask=mask.view('bool'))
+
+    def get_packed_data(self, moment, max_ngates, scans=None):
+        """
+        Retrieve the raw moment data for a given set of scans along with the
+        scale and offset needed to convert the data to physical values.
 
-        # mask, scan and offset, assume that the offset and scale
-        # are the same in all scans/gates
+        Values are obtained from the raw data as (data - offset) / scale,
+        raw values of 0 and 1 indicate below threshold and range folded
+        gates or gates which were not collected.
+
+        Parameters
+        ----------
+        moment : 'REF', 'VEL', 'SW', 'ZDR', 'PHI', 'RHO', or 'CFP'
+            Moment for which to to retrieve data.
+        max_ngates : int
+            Maximum number of gates (bins) in any ray.
+        scans : list or None.
+            Scans to retrieve data from (0 based). None (the default) will
+            get the data for all scans in the volume.
+
+        Returns
+        -------
+        data : ndarray
+            Raw moment data as uint8 or uint16 codes.
+        scale, offset : float32 or None
+            Scale and offset of the moment, None when the moment is not
+            present in any of the scans.
+
+        """
+        if scans is None:
+            scans = range(self.nscans)
+        data = self.get_data(moment, max_ngates, scans, raw_data=True)
+        scale, offset = self._moment_scale_offset(moment, scans)
+        return data, scale, offset
+
+    def _moment_scale_offset(self, moment, scans):
+        """ Return the scale and offset of a moment in a set of scans. """
+        # assume that the offset and scale are the same in all scans/gates
         for scan in scans:  # find a scan which contains the moment
             msg_num = self.scan_msgs[scan][0]
-            msg = self.radial_records[msg_num]
-            if moment in msg.keys():
-                offset = np.float32(msg[moment]['offset'])
-                scale = np.float32(msg[moment]['scale'])
-                mask = data <= 1
-                scaled_data = (data - offset) / scale
-                return np.ma.array(scaled_data, mask=mask)
+            msg = self._moment_index[msg_num, NEXRAD_MOMENTS.index(moment)]
+            if msg['ptr'] >= 0:
+                return np.float32(msg['scale']), np.float32(msg['offset'])
+        return None, None
 
-        # moment is not present in any scan, mask all values
-        return np.ma.masked_less_equal(data, 1)
 
-
-def _bits_to_code(msg, moment):
+class NEXRADLevel2ChunkedFile(NEXRADLevel2File):
     """
-    Convert number of bits to the proper code for unpacking.
-    Based on the code found in MetPy:
-    https://github.com/Unidata/MetPy/blob/40d5c12ab341a449c9398508bd41
-    d010165f9eeb/src/metpy/io/_tools.py#L313-L321
+    Class for accessing a NEXRAD Level II volume assembled from chunks.
+
+    Real-time NEXRAD Level II volumes are distributed as a sequence of chunks
+    (LDM records): a start chunk holding the volume header and the metadata
+    messages followed by intermediate chunks and an end chunk holding the
+    radial messages. Each chunk is decompressed and indexed when it is added,
+    previously added chunks are not decoded again. Data from a scan can be
+    retrieved as soon as the scan is complete, see the completed_scans
+    attribute, using the methods of :py:class:`NEXRADLevel2File`.
+
+    Parameters
+    ----------
+    chunks : list or None
+        Chunks to add to the volume when the object is created, see
+        :py:func:`add_chunk`. None creates an empty volume.
+
+    Attributes
+    ----------
+    nchunks : int
+        Number of chunks added to the volume.
+    completed_scans : list
+        Scans (0 based) for which all radials have been added.
+    volume_complete : bool
+        True when the last radial of the volume has been added.
+
+    See :py:class:`NEXRADLevel2File` for additional attributes.
+
     """
-    if msg['header']['type'] == 1:
-        word_size = msg[moment]['data'].dtype
-        if word_size == 'uint16':
-            return 'H'
-        elif word_size == 'uint8':
-            return 'B'
+
+    def __init__(self, chunks=None):
+        """ initalize the object. """
+        self.volume_header = {}
+        self.vcp = None
+        self.nchunks = 0
+        self.scan_msgs = []
+        self.nscans = 0
+        self._fh = None
+        self._msg_type = None
+        self._storage = np.empty(0, dtype='u1')
+        self._buf_arr = self._storage[:0]
+        self._record_pos = np.empty(0, dtype='int64')
+        self._record_types = np.empty(0, dtype='uint8')
+        self._index = np.empty(0, dtype=RADIAL_INDEX_DTYPE)
+        self._moment_index = np.empty(
+            (0, len(NEXRAD_MOMENTS)), dtype=MOMENT_INDEX_DTYPE)
+        self._all_records = None
+        self._radial_records = None
+        if chunks is not None:
+            for chunk in chunks:
+                self.add_chunk(chunk)
+
+    @property
+    def _buf(self):
+        """ Buffer of decompressed records as bytes. """
+        return self._buf_arr.tobytes()
+
+    @property
+    def completed_scans(self):
+        """ Scans (0 based) for which all radials have been added. """
+        if len(self._index) == 0:
+            return []
+        elev_nums = self._index['elevation_number']
+        ended = self._index['radial_status'] == RADIAL_STATUS_END_ELEVATION
+        ended |= self._index['radial_status'] == RADIAL_STATUS_END_VOLUME
+        ended_elev_nums = set(elev_nums[ended])
+        max_elev_num = elev_nums.max()
+        return [i for i, msgs in enumerate(self.scan_msgs) if len(msgs) and (
+            i + 1 < max_elev_num or i + 1 in ended_elev_nums)]
+
+    @property
+    def volume_complete(self):
+        """ True when the last radial of the volume has been added. """
+        return bool(np.any(
+            self._index['radial_status'] == RADIAL_STATUS_END_VOLUME))
+
+    def close(self):
+        """ Close the file, no file is held open by this class. """
+        return
+
+    def add_chunk(self, chunk):
+        """
+        Add a chunk to the volume.
+
+        Parameters
+        ----------
+        chunk : str, bytes or file-like
+            Filename, contents or file-like object of the chunk. Chunks must
+            be added in the order in which they were produced.
+
+        Returns
+        -------
+        scans : list
+            Scans (0 based) completed by the radials in this chunk.
+
+        """
+        if hasattr(chunk, 'read'):
+            data = chunk.read()
+        elif isinstance(chunk, bytes):
+            data = chunk
         else:
-            warnings.warn(
-                ('Unsupported bit size: %s. Returning "B"', word_size))
-            return 'B'
-
-    elif msg['header']['type'] == 31:
-        word_size = msg[moment]['word_size']
-        if word_size == 16:
-            return 'H'
-        elif word_size == 8:
-            return 'B'
+            with open(chunk, 'rb') as fh:
+                data = fh.read()
+
+        # the start chunk begins with the volume header
+        start = 0
+        if data[:4] in (b'AR2V', b'ARCH'):
+            size = _structure_size(VOLUME_HEADER)
+            self.volume_header = _unpack_structure(data[:size], VOLUME_HEADER)
+            start = size
+        streams = _find_compressed_chunks(data, start)
+        if streams is None:
+            raise IOError('chunk does not contain BZ2 compressed records')
+
+        completed_scans = self.completed_scans
+        for stream in streams:
+            self._add_records(bz2.decompress(stream))
+        self.nchunks += 1
+        return [i for i in self.completed_scans if i not in completed_scans]
+
+    def _add_records(self, buf):
+        """ Append and index the records in a decompressed LDM record. """
+        # grow the storage geometrically so appending is amortized linear,
+        # positions of existing records remain valid.
+        base = len(self._buf_arr)
+        size = base + len(buf)
+        if size > len(self._storage):
+            storage = np.empty(max(size, 2 * len(self._storage)), dtype='u1')
+            storage[:base] = self._buf_arr
+            self._storage = storage
+        self._storage[base:size] = np.frombuffer(buf, dtype='u1')
+        self._buf_arr = self._storage[:size]
+        self._all_records = None
+        self._radial_records = None
+
+        # each LDM record starts with a compression (CTM) record
+        positions, types = _scan_records(buf, COMPRESSION_RECORD_SIZE)
+        positions += base
+        self._record_pos = np.concatenate([self._record_pos, positions])
+        self._record_types = np.concatenate([self._record_types, types])
+
+        if self.vcp is None and np.any(types == 5):
+            pos = positions[types == 5][0] - base
+            self.vcp = _get_record_from_buf(buf, pos)[1]
+
+        if self._msg_type is None:
+            if np.any(types == 31):
+                self._msg_type = '31'
+            elif np.any(types == 1):
+                self._msg_type = '1'
+            else:
+                return
+        radial_pos = positions[types == int(self._msg_type)]
+        if len(radial_pos) == 0:
+            return
+        if self._msg_type == '31':
+            index, moment_index = _index_msg31(self._buf_arr, radial_pos)
         else:
-            warnings.warn(
-                ('Unsupported bit size: %s. Returning "B"', word_size))
-            return 'B'
-    else:
-        raise TypeError("Unsupported msg type %s", msg['header']['type'])
+            index, moment_index = _index_msg1(self._buf_arr, radial_pos)
+        self._index = np.concatenate([self._index, index])
+        self._moment_index = np.concatenate(
+            [self._moment_index, moment_index])
+        elev_nums = self._index['elevation_number']
+        self.scan_msgs = [np.where(elev_nums == i + 1)[0]
+                          for i in range(elev_nums.max())]
+        self.nscans = len(self.scan_msgs)
 
 
-def _decompress_records(file_handler):
+def _gather_moment(buf_arr, moment_index, max_ngates):
+    """
+    Gather the raw moment data for a number of rays from a buffer.
+
+    Parameters
+    ----------
+    buf_arr : array of uint8
+        Decompressed Archive II buffer.
+    moment_index : structured array
+        Rows of the moment index, one per ray, describing the location,
+        word size and number of gates of the moment in each ray.
+    max_ngates : int
+        Maximum number of gates (bins) in any ray.
+
+    Returns
+    -------
+    data : array
+        Raw moment data with shape (nrays, max_ngates). The dtype is uint8 or
+        uint16 depending on the word size of the first ray containing the
+        moment. Gates not present in a ray are set to 1.
+
+    """
+    present = np.nonzero(moment_index['ptr'] >= 0)[0]
+    if len(present) and moment_index['word_size'][present[0]] == 16:
+        dtype = 'uint16'
+    else:
+        dtype = 'uint8'
+    data = np.ones((len(moment_index), max_ngates), dtype=dtype)
+
+    for word_size in (8, 16):
+        nbytes = word_size // 8
+        rays = present[moment_index['word_size'][present] == word_size]
+        if len(rays) == 0:
+            continue
+        ptr = moment_index['ptr'][rays]
+        # limit the gates to those requested and present in the buffer
+        ngates = np.minimum(moment_index['ngates'][rays], max_ngates)
+        ngates = np.minimum(ngates, (len(buf_arr) - ptr) // nbytes)
+        width = ngates.max()
+        if width <= 0:
+            continue
+
+        # gather the rays as rows of a strided view of the buffer in which
+        # each row starts one byte after the previous row.
+        nbytes_row = width * nbytes
+        in_buf = ptr + nbytes_row <= len(buf_arr)
+        windows = np.lib.stride_tricks.as_strided(
+            buf_arr, shape=(len(buf_arr) - nbytes_row + 1, nbytes_row),
+            strides=(buf_arr.strides[0], buf_arr.strides[0]), writeable=False)
+        values = windows[ptr[in_buf]].view('>u%i' % nbytes)
+        short = ngates[in_buf] < width
+        if np.any(short):
+            gates = np.arange(width)
+            values[gates >= ngates[in_buf][:, np.newaxis]] = 1
+        data[rays[in_buf], :width] = values
+
+        # rays ending near the end of the buffer are copied individually
+        for ray, ray_ptr, ray_ngates in zip(
+                rays[~in_buf], ptr[~in_buf], ngates[~in_buf]):
+            end = ray_ptr + ray_ngates * nbytes
+            data[ray, :ray_ngates] = buf_arr[ray_ptr:end].view(
+                '>u%i' % nbytes)
+    return data
+
+
+def _decompress_records(file_handler, max_workers=None,
+                        elevation_numbers=None):
     """
     Decompressed the records from an BZ2 compressed Archive 2 file.
+
+    The compressed chunks are decompressed concurrently, see
+    :py:func:`_decompress_chunks`. When elevation_numbers is provided only
+    the chunks selected by :py:func:`_select_chunks` are returned.
     """
     file_handler.seek(0)
     cbuf = file_handler.read()    # read all data from the file
+    chunks = _decompress_chunks(cbuf, max_workers)
+    if elevation_numbers is not None:
+        chunks = _select_chunks(chunks, elevation_numbers)
+    return b''.join(chunks)
+
+
+def _decompress_chunks(cbuf, max_workers=None):
+    """
+    Decompress the chunks of a BZ2 compressed Archive 2 file.
+
+    Each chunk (LDM record) in the file is an independent bzip2 stream
+    preceded by a control word holding the size of the stream. The chunks
+    are located using these control words and decompressed in a pool of
+    threads, the bz2 module releases the GIL while decompressing.
+
+    Parameters
+    ----------
+    cbuf : bytes
+        Contents of the compressed file including the volume header.
+    max_workers : int or None
+        Maximum number of threads used to decompress the chunks. None will
+        use the default of :py:class:`concurrent.futures.ThreadPoolExecutor`,
+        1 decompresses the chunks sequentially.
+
+    Yields
+    ------
+    buf : bytes
+        Decompressed chunks, in file order. The compression record is removed
+        from the first chunk so the first message header is at the start of
+        the first yielded chunk. Chunks are yielded as they become available
+        allowing the records in them to be decoded while later chunks are
+        being decompressed. Only a few chunks per thread are decompressed
+        ahead of the consumer and closing the generator cancels any
+        outstanding work.
+
+    """
+    chunks = _find_compressed_chunks(cbuf)
+    if chunks is None:
+        # the control words do not describe the file, fall back to
+        # decompressing the streams sequentially.
+        decompressed = _decompress_streams(cbuf)
+    elif max_workers == 1 or len(chunks) == 1:
+        decompressed = (bz2.decompress(chunk) for chunk in chunks)
+    else:
+        decompressed = _threaded_decompress(chunks, max_workers)
+
+    for i, buf in enumerate(decompressed):
+        if i == 0:
+            buf = buf[COMPRESSION_RECORD_SIZE:]
+        yield buf
+
+
+def _threaded_decompress(chunks, max_workers=None):
+    """ Decompress bzip2 streams in a thread pool, yielding them in order. """
+    if max_workers is None:
+        # default used by ThreadPoolExecutor in Python 3.8+
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    chunks = iter(chunks)
+    pending = deque(executor.submit(bz2.decompress, chunk)
+                    for chunk in islice(chunks, 2 * max_workers))
+    try:
+        while pending:
+            buf = pending.popleft().result()
+            for chunk in islice(chunks, 1):
+                pending.append(executor.submit(bz2.decompress, chunk))
+            yield buf
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _select_chunks(chunks, elevation_numbers):
+    """
+    Select the decompressed chunks which contain given elevations.
+
+    Chunks containing metadata, that is no radial messages or the volume
+    coverage pattern (message 5), are always selected. The elevation numbers
+    increase through a volume so iteration of chunks stops at the first chunk
+    in which all radials are from later elevations.
+    """
+    max_elevation_number = max(elevation_numbers)
+    nselected = 0
+    for i, buf in enumerate(chunks):
+        start = 0 if i == 0 else COMPRESSION_RECORD_SIZE
+        positions, types = _scan_records(buf, start)
+        is_radial = (types == 1) | (types == 31)
+        elevations = _elevation_numbers(
+            np.frombuffer(buf, dtype='u1'), positions[is_radial],
+            types[is_radial])
+        if len(elevations) == 0 or np.any(types == 5):
+            selected = True
+        elif elevations.min() > max_elevation_number:
+            break
+        else:
+            selected = np.any(np.in1d(elevations, elevation_numbers))
+        if selected:
+            # the first message header must be at the start of the buffer
+            if nselected == 0:
+                buf = buf[start:]
+            nselected += 1
+            yield buf
+    chunks.close()
+
+
+def _elevation_numbers(buf_arr, positions, types):
+    """ Return the elevation numbers of MSG1 or MSG31 radials in a buffer. """
+    elevations = np.empty(len(positions), dtype='int32')
+    msg_start = positions + _structure_size(MSG_HEADER)
+    for msg_type, dtype in [(1, MSG_1_DTYPE), (31, MSG_31_DTYPE)]:
+        field_dtype, offset = dtype.fields['elevation_number']
+        is_type = types == msg_type
+        elevations[is_type] = _gather_structure(
+            buf_arr, msg_start[is_type] + offset, field_dtype)
+    return elevations
+
+
+def _find_compressed_chunks(cbuf, start=None):
+    """
+    Locate the bzip2 streams in a compressed Archive 2 file.
+
+    Streams are located from the control word at position start, by default
+    the control word following the volume header. Returns a list of
+    memoryviews of the streams or None when the control words are
+    inconsistent with the file contents.
+    """
+    view = memoryview(cbuf)
+    chunks = []
+    if start is None:
+        start = _structure_size(VOLUME_HEADER)
+    pos = start
+    while pos + CONTROL_WORD_SIZE < len(cbuf):
+        # the control word of the last chunk in a volume may be negative
+        size = abs(struct.unpack_from('>i', cbuf, pos)[0])
+        start = pos + CONTROL_WORD_SIZE
+        end = start + size
+        if size == 0 or end > len(cbuf) or cbuf[start:start + 3] != b'BZh':
+            return None
+        chunks.append(view[start:end])
+        pos = end
+    if len(chunks) == 0:
+        return None
+    return chunks
+
+
+def _decompress_streams(cbuf):
+    """ Decompress consecutive BZ2 streams, yielding each stream. """
     decompressor = bz2.BZ2Decompressor()
     skip = _structure_size(VOLUME_HEADER) + CONTROL_WORD_SIZE
-    buf = decompressor.decompress(cbuf[skip:])
+    yield decompressor.decompress(cbuf[skip:])
     while len(decompressor.unused_data):
         cbuf = decompressor.unused_data
         decompressor = bz2.BZ2Decompressor()
-        buf += decompressor.decompress(cbuf[CONTROL_WORD_SIZE:])
+        yield decompressor.decompress(cbuf[CONTROL_WORD_SIZE:])
+
+
+def _scan_records(buf, start=0):
+    """
+    Locate all records (messages) in a decompressed buffer.
+
+    Only the message header of each record is unpacked. Radial records whose
+    fixed size header extends past the end of the buffer are not included.
+
+    Parameters
+    ----------
+    buf : bytes
+        Decompressed buffer.
+    start : int
+        Position of the first record in the buffer.
+
+    Returns
+    -------
+    positions : array of int64
+        Position of each record in the buffer.
+    types : array of uint8
+        Message type of each record.
+
+    """
+    header = struct.Struct('>' + ''.join([i[1] for i in MSG_HEADER]))
+    buf_length = len(buf)
+    positions = []
+    types = []
+    pos = start
+    while pos + header.size <= buf_length:
+        size, _, msg_type, _, _, _, segments, seg_num = header.unpack_from(
+            buf, pos)
+        if msg_type == 31:
+            new_pos = pos + header.size + size * 2 - 4
+            fixed_size = MSG_31_DTYPE.itemsize
+        elif msg_type == 29:
+            warnings.warn("Message 29 encountered, not parsing.",
+                          RuntimeWarning)
+            if size == 65535:
+                size = segments << 16 | seg_num
+            new_pos = pos + header.size + size
+        else:
+            new_pos = pos + RECORD_SIZE
+        if msg_type == 1:
+            fixed_size = MSG_1_DTYPE.itemsize
+        if msg_type in (1, 31) and pos + header.size + fixed_size > buf_length:
+            break
+        positions.append(pos)
+        types.append(msg_type)
+        pos = new_pos
+    return np.array(positions, dtype='int64'), np.array(types, dtype='uint8')
 
-    return buf[COMPRESSION_RECORD_SIZE:]
+
+def _index_msg31(buf_arr, positions):
+    """
+    Create the radial and moment index for MSG31 records in a buffer.
+
+    Parameters
+    ----------
+    buf_arr : array of uint8
+        Decompressed Archive II buffer.
+    positions : array of int64
+        Position of each MSG31 record in the buffer.
+
+    Returns
+    -------
+    index : structured array
+        Radial index, see RADIAL_INDEX_DTYPE.
+    moment_index : structured array
+        Moment index, see MOMENT_INDEX_DTYPE.
+
+    """
+    nradials = len(positions)
+    msg_start = positions + _structure_size(MSG_HEADER)
+    header = _gather_structure(buf_arr, msg_start, MSG_31_DTYPE)
+
+    index = np.zeros(nradials, dtype=RADIAL_INDEX_DTYPE)
+    index['offset'] = positions
+    index['type'] = 31
+    for key in ['elevation_number', 'collect_ms', 'collect_date',
+                'azimuth_angle', 'elevation_angle']:
+        index[key] = header[key]
+    # the radial status is the element named radial_spacing in MSG_31
+    index['radial_status'] = header['radial_spacing']
+    moment_index = np.zeros((nradials, len(NEXRAD_MOMENTS)),
+                            dtype=MOMENT_INDEX_DTYPE)
+    moment_index['ptr'] = -1
+
+    # data blocks are identified by name, not by block pointer number
+    generic_size = _structure_size(GENERIC_DATA_BLOCK)
+    for i in range(1, 11):
+        block_pointer = header['block_pointer_%i' % i].astype('int64')
+        radials = np.nonzero(
+            (block_pointer > 0) &
+            (msg_start + block_pointer + generic_size <= len(buf_arr)))[0]
+        if len(radials) == 0:
+            continue
+        block_pos = msg_start[radials] + block_pointer[radials]
+        names = _gather_structure(buf_arr, block_pos + 1, np.dtype('S3'))
+        for name in np.unique(names):
+            in_block = names == name
+            rows = radials[in_block]
+            pos = block_pos[in_block]
+            block_name = name.decode('ascii').strip()
+            if block_name == 'VOL':
+                index['vol_ptr'][rows] = pos
+            elif block_name == 'RAD':
+                rad = _gather_structure(buf_arr, pos, RADIAL_DATA_BLOCK_DTYPE)
+                index['nyquist_vel'][rows] = rad['nyquist_vel']
+                index['unambig_range'][rows] = rad['unambig_range']
+            elif block_name in NEXRAD_MOMENTS:
+                block = _gather_structure(
+                    buf_arr, pos, GENERIC_DATA_BLOCK_DTYPE)
+                col = NEXRAD_MOMENTS.index(block_name)
+                moments = moment_index[rows, col]
+                moments['ptr'] = pos + generic_size
+                for key in ['ngates', 'first_gate', 'gate_spacing',
+                            'word_size', 'scale', 'offset']:
+                    moments[key] = block[key]
+                moment_index[rows, col] = moments
+    return index, moment_index
+
+
+def _index_msg1(buf_arr, positions):
+    """
+    Create the radial and moment index for MSG1 records in a buffer.
+
+    See :py:func:`_index_msg31` for parameters and return values.
+
+    """
+    nradials = len(positions)
+    msg_start = positions + _structure_size(MSG_HEADER)
+    header = _gather_structure(buf_arr, msg_start, MSG_1_DTYPE)
+
+    index = np.zeros(nradials, dtype=RADIAL_INDEX_DTYPE)
+    index['offset'] = positions
+    index['type'] = 1
+    for key in ['elevation_number', 'collect_ms', 'collect_date',
+                'azimuth_angle', 'elevation_angle', 'nyquist_vel',
+                'unambig_range', 'radial_status']:
+        index[key] = header[key]
+    index['vol_ptr'] = -1
+    moment_index = np.zeros((nradials, len(NEXRAD_MOMENTS)),
+                            dtype=MOMENT_INDEX_DTYPE)
+    moment_index['ptr'] = -1
+
+    doppler_first = header['doppler_range_first'].astype('int32')
+    doppler_first[doppler_first > 2**15] -= 2**16
+    vel_scale = np.where(header['doppler_resolution'] == 4, 1., 2.)
+
+    # moment, pointer, ngates, gate spacing, first gate, scale, offset
+    moments = [
+        ('REF', 'sur_pointer', 'sur_nbins', 'sur_range_step',
+         header['sur_range_first'], 2., 66.),
+        ('VEL', 'vel_pointer', 'doppler_nbins', 'doppler_range_step',
+         doppler_first, vel_scale, 129.),
+        ('SW', 'width_pointer', 'doppler_nbins', 'doppler_range_step',
+         doppler_first, 2., 129.),
+    ]
+    for moment, pointer, ngates, step, first, scale, offset in moments:
+        col = moment_index[:, NEXRAD_MOMENTS.index(moment)]
+        present = header[pointer] != 0
+        col['ptr'] = np.where(present, msg_start + header[pointer], -1)
+        col['ngates'] = header[ngates]
+        col['gate_spacing'] = header[step]
+        col['first_gate'] = first
+        col['word_size'] = 8
+        col['scale'] = scale
+        col['offset'] = offset
+    return index, moment_index
+
+
+def _gather_structure(buf_arr, positions, dtype):
+    """ Unpack a structure located at a number of positions in a buffer. """
+    idx = positions[:, np.newaxis] + np.arange(dtype.itemsize)
+    return buf_arr[idx].view(dtype)[:, 0]
 
 
 def _get_record_from_buf(buf, pos):
@@ -753,6 +1371,17 @@ def _unpack_from_buf(buf, pos, structure):
     return _unpack_structure(buf[pos:pos + size], structure)
 
 
+def _structure_dtype(structure):
+    """ Create a NumPy dtype equivalent to a structure. """
+    fields = []
+    for name, code in structure:
+        if code.endswith('s'):
+            fields.append((name, 'S' + code[:-1]))
+        else:
+            fields.append((name, '>' + code))
+    return np.dtype(fields)
+
+
 def _unpack_structure(string, structure):
     """ Unpack a structure from a string. """
     fmt = '>' + ''.join([i[1] for i in structure])  # NEXRAD is big-endian
@@ -979,3 +1608,49 @@ RADIAL_DATA_BLOCK = (
     ('nyquist_vel', SINT2),
     ('spare', '2s')
 )
+
+# NumPy equivalents of the structures above used for vectorized unpacking
+MSG_31_DTYPE = _structure_dtype(MSG_31)
+MSG_1_DTYPE = _structure_dtype(MSG_1)
+GENERIC_DATA_BLOCK_DTYPE = _structure_dtype(GENERIC_DATA_BLOCK)
+RADIAL_DATA_BLOCK_DTYPE = _structure_dtype(RADIAL_DATA_BLOCK)
+
+# Moments which can be present in a radial message, this sets the order of
+# the columns in the moment index.
+NEXRAD_MOMENTS = ('REF', 'VEL', 'SW', 'ZDR', 'PHI', 'RHO', 'CFP')
+
+# Columnar index of radial messages, one element per radial. Angles are
+# stored as found in the message, scaled integers for message 1.
+# nyquist_vel and unambig_range are taken from the RAD block for message 31
+# and from the message header for message 1.
+RADIAL_INDEX_DTYPE = np.dtype([
+    ('offset', 'i8'),               # position of the message in the buffer
+    ('type', 'u1'),                 # message type, 1 or 31
+    ('radial_status', 'u1'),        # see RADIAL_STATUS_* below
+    ('elevation_number', 'u2'),
+    ('collect_ms', 'u4'),
+    ('collect_date', 'i4'),
+    ('azimuth_angle', 'f8'),
+    ('elevation_angle', 'f8'),
+    ('nyquist_vel', 'i2'),
+    ('unambig_range', 'i2'),
+    ('vol_ptr', 'i8'),              # position of the VOL block, message 31
+])
+
+# Radial status codes, Table III and XVII-A
+RADIAL_STATUS_START_ELEVATION = 0
+RADIAL_STATUS_INTERMEDIATE = 1
+RADIAL_STATUS_END_ELEVATION = 2
+RADIAL_STATUS_START_VOLUME = 3
+RADIAL_STATUS_END_VOLUME = 4
+
+# Index of moment data blocks, one element per radial and moment.
+MOMENT_INDEX_DTYPE = np.dtype([
+    ('ptr', 'i8'),                  # position of the data, -1 when absent
+    ('ngates', 'i4'),
+    ('first_gate', 'i4'),
+    ('gate_spacing', 'i4'),
+    ('word_size', 'u1'),
+    ('scale', 'f4'),
+    ('offset', 'f4'),
+])
@@ -0,0 +1,4 @@
+# remove and rebuild _nexrad_gather.so module
+rm  _nexrad_gather.so
+cython _nexrad_gather.pyx
+python setup.py build_ext -i
@@ -81,6 +81,10 @@ def configuration(parent_package='', top_path=None):
                          sources=['nexrad_interpolate.c'],
                          include_dirs=[get_include()])
 
+    config.add_extension('_nexrad_gather',
+                         sources=['_nexrad_gather.c'],
+                         include_dirs=[get_include()])
+
     return config
 
 if __name__ == '__main__':
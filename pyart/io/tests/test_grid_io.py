@@ -2,7 +2,7 @@
 
 import netCDF4
 import numpy as np
-from numpy.testing import assert_almost_equal, assert_warns
+from numpy.testing import assert_almost_equal, assert_warns, assert_raises
 
 import pyart
 from pyart.io.common import stringarray_to_chararray
@@ -62,6 +62,32 @@ def test_grid_write_read():
         assert grid1.nradar == grid2.nradar
 
 
+def test_grid_write_append():
+    grid = pyart.testing.make_target_grid()
+    refl = grid.fields['reflectivity']['data'].copy()
+
+    with pyart.testing.InTemporaryDirectory():
+        tmpfile = 'tmp_grid.nc'
+        pyart.io.write_grid(tmpfile, grid, append=True)
+        grid.time['data'] = grid.time['data'] + 300.
+        grid.fields['reflectivity']['data'] = refl + 1.
+        pyart.io.write_grid(tmpfile, grid, append=True)
+
+        dset = netCDF4.Dataset(tmpfile)
+        assert len(dset.dimensions['time']) == 2
+        assert_almost_equal(np.diff(dset.variables['time'][:]), [300.])
+        assert_almost_equal(dset.variables['reflectivity'][0], refl)
+        assert_almost_equal(dset.variables['reflectivity'][1], refl + 1.)
+        assert_almost_equal(dset.variables['origin_latitude'][:],
+                            np.repeat(grid.origin_latitude['data'], 2))
+        dset.close()
+
+        # grids which do not match the file cannot be appended
+        grid.fields['foo'] = grid.fields['reflectivity']
+        assert_raises(ValueError, pyart.io.write_grid, tmpfile, grid,
+                      append=True)
+
+
 def _check_attrs_similar(grid1, grid2, attr):
     print("Checking attribute:", attr)
     dic1 = getattr(grid1, attr)
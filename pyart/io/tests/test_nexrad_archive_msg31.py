@@ -1,7 +1,7 @@
 """ Unit Tests for Py-ART's io/nexrad_archive.py module using a MSG31 file. """
 
 import numpy as np
-from numpy.testing import assert_almost_equal
+from numpy.testing import assert_almost_equal, assert_array_equal
 from numpy.ma.core import MaskedArray
 import pytest
 
@@ -284,3 +284,33 @@ def test_compressed_archive():
     assert_almost_equal(rdata[2, 0], 9.5, 1)
     assert 'velocity' not in radar.fields.keys()
     assert 'spectrum_width' not in radar.fields.keys()
+
+
+def test_chunk_reader():
+    reader = pyart.io.NEXRADArchiveChunkReader()
+    chunks = pyart.testing.make_nexrad_archive_chunks()
+    for chunk in chunks[:7]:
+        assert reader.add_chunk(chunk) == []
+    pytest.raises(ValueError, reader.get_radar)
+    assert reader.add_chunk(chunks[7]) == [0]
+    assert reader.completed_scans == [0]
+    pytest.raises(ValueError, reader.get_radar, [1])
+
+    sweep = reader.get_radar()
+    assert sweep.nrays == 720
+    assert sweep.nsweeps == 1
+    assert sweep.metadata['instrument_name'] == 'KATX'
+    assert_almost_equal(sweep.fixed_angle['data'][0], 0.48, 2)
+    assert_array_equal(sweep.fields['reflectivity']['data'],
+                       radar.fields['reflectivity']['data'][:720])
+
+    for chunk in chunks[8:]:
+        reader.add_chunk(chunk)
+    assert reader.volume_complete
+    volume = reader.get_radar()
+    assert volume.nrays == 7200
+    assert volume.nsweeps == 16
+    assert_array_equal(volume.azimuth['data'], radar.azimuth['data'])
+    for field in radar.fields:
+        assert_array_equal(volume.fields[field]['data'],
+                           radar.fields[field]['data'])
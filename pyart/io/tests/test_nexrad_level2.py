@@ -3,6 +3,7 @@
 import datetime
 import bz2
 from io import BytesIO
+import struct
 
 import numpy as np
 from numpy.testing import assert_array_equal
@@ -44,6 +45,37 @@ def test_volume_header():
     assert nfile.volume_header['time'] == 71424000
 
 
+def test_radial_index():
+    assert nfile._index.shape == (7200, )
+    assert np.all(nfile._index['type'] == 31)
+    assert nfile._index['elevation_number'][0] == 1
+    assert nfile._index['elevation_number'][-1] == 16
+    assert nfile._moment_index.shape == (7200, 7)
+
+
+def test_moment_index():
+    ref = nfile._moment_index[0, nexrad_level2.NEXRAD_MOMENTS.index('REF')]
+    assert ref['ngates'] == 1832
+    assert ref['word_size'] == 8
+    phi = nfile._moment_index[0, nexrad_level2.NEXRAD_MOMENTS.index('PHI')]
+    assert phi['ngates'] == 1192
+    assert phi['word_size'] == 16
+    vel = nfile._moment_index[0, nexrad_level2.NEXRAD_MOMENTS.index('VEL')]
+    assert vel['ptr'] == -1
+
+
+def test_records_unpacked_on_access():
+    ufile = bz2.BZ2File(pyart.testing.NEXRAD_ARCHIVE_MSG31_FILE, 'rb')
+    nfile2 = nexrad_level2.NEXRADLevel2File(ufile)
+    nfile2.get_data('REF', 1832, [0])
+    nfile2.scan_info()
+    nfile2.location()
+    assert nfile2._radial_records is None
+    assert len(nfile2.radial_records) == 7200
+    assert nfile2.radial_records[0]['REF']['ngates'] == 1832
+    nfile2.close()
+
+
 # methods
 def test_get_azimuth_angles():
     angles = nfile.get_azimuth_angles([0, 1])
@@ -102,6 +134,39 @@ def test_get_data_ref_raw():
     assert data[-1, -1] == 1        # folded
 
 
+def test_get_data_dtype():
+    data = nfile.get_data('PHI', 1192, [0, 2])
+    assert data.dtype == np.float32
+    assert data.mask.dtype == bool
+    # gates beyond those collected are masked
+    data = nfile.get_data('ZDR', 1832, [0])
+    assert data.shape == (720, 1832)
+    assert not np.any(data.mask[:, :1192])
+    assert np.all(data.mask[:, 1192:])
+
+
+def test_get_data_moment_not_present():
+    data = nfile.get_data('CFP', 1832, [0])
+    assert data.shape == (720, 1832)
+    assert np.all(data.mask)
+
+
+def test_get_packed_data():
+    data, scale, offset = nfile.get_packed_data('PHI', 1192, [0, 2])
+    assert data.dtype == np.uint16
+    assert data.shape == (1440, 1192)
+    assert scale.dtype == np.float32
+    assert_almost_equal(scale, 2.8361, 4)
+    assert_almost_equal(offset, 2.0, 4)
+    scaled = nfile.get_data('PHI', 1192, [0, 2])
+    assert_array_equal(((data - offset) / scale), scaled.data)
+
+    data, scale, offset = nfile.get_packed_data('CFP', 1832, [0])
+    assert data.dtype == np.uint8
+    assert scale is None
+    assert offset is None
+
+
 def test_get_data_vel_raw():
     data = nfile.get_data('VEL', 1192, [1, 3], True)
     assert data.shape == (1440, 1192)
@@ -327,6 +392,78 @@ def test_compressed_scan_info():
     assert scan_info[0]['nrays'] == 120
 
 
+def _make_chunked_file(nradials_per_chunk=120):
+    # compress the uncompressed dummy file as chunks of radials
+    return BytesIO(b''.join(
+        pyart.testing.make_nexrad_archive_chunks(nradials_per_chunk)))
+
+
+def test_chunked_file():
+    for max_workers in [1, 4]:
+        chunked_file = _make_chunked_file()
+        nfile2 = nexrad_level2.NEXRADLevel2File(chunked_file, max_workers)
+        assert len(nfile2._index) == 7200
+        assert nfile2.nscans == 16
+        assert_array_equal(nfile2.get_data('REF', 1832, [0, 1]),
+                           nfile.get_data('REF', 1832, [0, 1]))
+
+
+def test_decompress_chunks():
+    cbuf = _make_chunked_file().read()
+    chunks = nexrad_level2._find_compressed_chunks(cbuf)
+    assert len(chunks) == 62
+    bufs = list(nexrad_level2._decompress_chunks(cbuf, max_workers=2))
+    assert len(bufs) == 62
+    # each chunk holds complete records
+    positions, types = nexrad_level2._scan_records(bufs[5][12:])
+    assert len(positions) == 120
+    assert np.all(types == 31)
+
+
+def test_chunked_file_scans():
+    chunked_file = _make_chunked_file()
+    nfile2 = nexrad_level2.NEXRADLevel2File(chunked_file, scans=[2])
+    # radials from other scans are not indexed
+    assert len(nfile2._index) == 720
+    assert np.all(nfile2._index['elevation_number'] == 3)
+    assert nfile2.get_nrays(2) == 720
+    assert_array_equal(nfile2.get_data('REF', 1832, [2]),
+                       nfile.get_data('REF', 1832, [2]))
+    assert_array_equal(nfile2.get_target_angles([2]),
+                       nfile.get_target_angles([2]))
+    # chunks after the last requested scan are not decompressed
+    assert len(nfile2._buf) < len(nfile._buf) / 4
+
+
+def test_uncompressed_file_scans():
+    ufile = bz2.BZ2File(pyart.testing.NEXRAD_ARCHIVE_MSG31_FILE, 'rb')
+    nfile2 = nexrad_level2.NEXRADLevel2File(ufile, scans=[0, 5])
+    assert len(nfile2._index) == 1080
+    assert nfile2.get_nrays(0) == 720
+    assert nfile2.get_nrays(5) == 360
+    assert_array_equal(nfile2.get_azimuth_angles([0, 5]),
+                       nfile.get_azimuth_angles([0, 5]))
+
+
+def test_select_chunks():
+    cbuf = _make_chunked_file().read()
+    chunks = nexrad_level2._decompress_chunks(cbuf)
+    selected = list(nexrad_level2._select_chunks(chunks, [1]))
+    # metadata chunk and the chunks holding the first elevation
+    assert len(selected) == 8
+    positions, types = nexrad_level2._scan_records(b''.join(selected))
+    assert np.sum(types == 31) == 826
+
+
+def test_decompress_chunks_bad_control_word():
+    cbuf = _make_chunked_file().read()
+    cbuf = cbuf[:24] + struct.pack('>i', 10) + cbuf[28:]
+    assert nexrad_level2._find_compressed_chunks(cbuf) is None
+    # streams are still decompressed sequentially
+    buf = b''.join(nexrad_level2._decompress_chunks(cbuf))
+    assert buf == nfile._buf
+
+
 def test_bad_compression_header():
 
     # read the beginning of the compressed file
@@ -389,3 +526,39 @@ def test_1ms_vel_message():
     # check the velocity scale
     new_pos, dic = nexrad_level2._get_record_from_buf(fake_buf, 0)
     assert dic['VEL']['scale'] == 1.0
+
+
+def test_chunked_file_incremental():
+    cbuf = _make_chunked_file().read()
+    streams = nexrad_level2._find_compressed_chunks(cbuf, 24)
+    chunks = [struct.pack('>i', len(s)) + bytes(s) for s in streams]
+    chunks[0] = cbuf[:24] + chunks[0]
+
+    cfile2 = nexrad_level2.NEXRADLevel2ChunkedFile()
+    assert cfile2.completed_scans == []
+    assert cfile2.add_chunk(BytesIO(chunks[0])) == []
+    assert cfile2.volume_header['icao'] == b'KATX'
+    for chunk in chunks[1:7]:
+        assert cfile2.add_chunk(chunk) == []
+    assert cfile2.add_chunk(chunks[7]) == [0]
+    assert cfile2.get_vcp_pattern() == 11
+    for chunk in chunks[8:13]:
+        cfile2.add_chunk(chunk)
+    assert cfile2.add_chunk(chunks[13]) == [1]
+    assert cfile2.completed_scans == [0, 1]
+    assert not cfile2.volume_complete
+    assert_array_equal(cfile2.get_data('REF', 1832, [0, 1]),
+                       nfile.get_data('REF', 1832, [0, 1]))
+    assert cfile2.location() == nfile.location()
+
+    cfile2 = nexrad_level2.NEXRADLevel2ChunkedFile(chunks)
+    assert cfile2.nchunks == 62
+    assert cfile2.volume_complete
+    assert cfile2.completed_scans == list(range(16))
+    assert len(cfile2.radial_records) == 7200
+    assert_array_equal(cfile2.get_times()[1], nfile.get_times()[1])
+
+
+def test_chunked_file_not_compressed():
+    cfile2 = nexrad_level2.NEXRADLevel2ChunkedFile()
+    pytest.raises(IOError, cfile2.add_chunk, b'\x00' * 100)
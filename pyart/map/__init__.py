@@ -5,9 +5,15 @@ coordinates to Cartesian coordinates.
 """
 
 from .grid_mapper import map_to_grid, grid_from_radars
+from .grid_mapper import grid_from_radar_files
+from .grid_mapper import build_nn_locator, load_nn_locator, NNLocator
 from .grid_mapper import example_roi_func_constant
 from .grid_mapper import example_roi_func_dist
 from .grid_mapper import example_roi_func_dist_beam
 from .gates_to_grid import map_gates_to_grid
+from .gates_to_grid import build_gates_to_grid_operator
+from .gates_to_grid import load_gates_to_grid_operator
+from .gates_to_grid import GatesToGridOperator
+from .gates_to_grid import GatesToGridMosaic
 
 __all__ = [s for s in dir() if not s.startswith('_')]
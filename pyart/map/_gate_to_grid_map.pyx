@@ -5,6 +5,7 @@ a uniform grid.
 """
 
 from libc.math cimport sqrt, exp, ceil, floor, sin, cos, tan, asin
+from libc.stdlib cimport malloc, free
 from cython.view cimport array as cvarray
 
 cimport cython
@@ -267,25 +268,267 @@ cdef class GateToGridMapper:
         """
 
         cdef float roi
-        cdef float[:] values
-        cdef char[:] masks
         cdef float x, y, z
+        cdef int nray, ngate
+        cdef float[:, ::1] rois = np.empty((nrays, ngates), dtype=np.float32)
 
+        # the radius of influence is found while holding the GIL as the
+        # RoIFunction may be implemented in Python.
         for nray in range(nrays):
             for ngate in range(ngates):
-
-                # continue if gate excluded
                 if excluded_gates[nray, ngate]:
                     continue
-
                 x = gate_x[nray, ngate]
                 y = gate_y[nray, ngate]
                 z = gate_z[nray, ngate]
+                rois[nray, ngate] = roi_func.get_roi(z, y, x)
+
+        # map the gates without the GIL so other threads can map gates
+        # onto other GateToGridMapper objects.
+        with nogil:
+            for nray in range(nrays):
+                for ngate in range(ngates):
+
+                    # continue if gate excluded
+                    if excluded_gates[nray, ngate]:
+                        continue
+
+                    x = gate_x[nray, ngate]
+                    y = gate_y[nray, ngate]
+                    z = gate_z[nray, ngate]
+                    roi = rois[nray, ngate]
+                    self.map_gate(x, y, z, roi, field_data[nray, ngate],
+                                  field_mask[nray, ngate], weighting_function)
+
+    @cython.cdivision(True)
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def map_fields_to_grid(
+            self,
+            int ngates, int nrays,
+            const float[:, ::1] gate_z, const float[:, ::1] gate_y,
+            const float[:, ::1] gate_x,
+            list field_data, list field_mask,
+            const unsigned char[:, ::1] excluded_gates,
+            float toa, RoIFunction roi_func, int weighting_function):
+        """
+        Map radar gates unto the regular grid from separate field arrays.
+
+        Identical to :py:func:`map_gates_to_grid` except that the data and
+        mask of each field are provided as separate arrays which are read
+        in place.
+
+        Parameters
+        ----------
+        field_data : list of 2D float32 or float64 arrays
+            C-contiguous data for each field, dimensions are ordered as
+            nrays, ngates.
+        field_mask : list of 2D uint8 arrays or None
+            C-contiguous mask for each field, None when no gates are
+            masked.
+
+        See :py:func:`map_gates_to_grid` for the remaining parameters.
+
+        """
+        cdef float roi
+        cdef float x, y, z
+        cdef int nray, ngate, i
+        cdef int nfields = len(field_data)
+        cdef Py_ssize_t offset
+        cdef float[:, ::1] rois = np.empty((nrays, ngates), dtype=np.float32)
+        cdef float[::1] values = np.empty(nfields, dtype=np.float32)
+        cdef char[::1] masks = np.zeros(nfields, dtype=np.int8)
+        cdef const float[:, ::1] float_view
+        cdef const double[:, ::1] double_view
+        cdef const unsigned char[:, ::1] mask_view
+
+        if nrays == 0 or ngates == 0:
+            return
+
+        # pointers to the field data, masks and the array type, the
+        # memoryviews are kept in views so the pointers remain valid.
+        cdef const float **float_ptrs = <const float **>malloc(
+            nfields * sizeof(float *))
+        cdef const double **double_ptrs = <const double **>malloc(
+            nfields * sizeof(double *))
+        cdef const unsigned char **mask_ptrs = <const unsigned char **>malloc(
+            nfields * sizeof(unsigned char *))
+        views = []
+        try:
+            for i in range(nfields):
+                float_ptrs[i] = NULL
+                double_ptrs[i] = NULL
+                mask_ptrs[i] = NULL
+                if field_data[i].dtype == np.float64:
+                    double_view = field_data[i]
+                    double_ptrs[i] = &double_view[0, 0]
+                    views.append(double_view)
+                else:
+                    float_view = field_data[i]
+                    float_ptrs[i] = &float_view[0, 0]
+                    views.append(float_view)
+                if field_mask[i] is not None:
+                    mask_view = field_mask[i]
+                    mask_ptrs[i] = &mask_view[0, 0]
+                    views.append(mask_view)
+
+            # the radius of influence is found while holding the GIL as the
+            # RoIFunction may be implemented in Python.
+            for nray in range(nrays):
+                for ngate in range(ngates):
+                    if excluded_gates[nray, ngate]:
+                        continue
+                    x = gate_x[nray, ngate]
+                    y = gate_y[nray, ngate]
+                    z = gate_z[nray, ngate]
+                    rois[nray, ngate] = roi_func.get_roi(z, y, x)
+
+            with nogil:
+                for nray in range(nrays):
+                    for ngate in range(ngates):
+
+                        # continue if gate excluded
+                        if excluded_gates[nray, ngate]:
+                            continue
+
+                        # gather the field values and masks for the gate
+                        offset = nray * ngates + ngate
+                        for i in range(nfields):
+                            if double_ptrs[i] != NULL:
+                                values[i] = <float>double_ptrs[i][offset]
+                            else:
+                                values[i] = float_ptrs[i][offset]
+                            if mask_ptrs[i] != NULL:
+                                masks[i] = mask_ptrs[i][offset]
+
+                        x = gate_x[nray, ngate]
+                        y = gate_y[nray, ngate]
+                        z = gate_z[nray, ngate]
+                        roi = rois[nray, ngate]
+                        self.map_gate(x, y, z, roi, values, masks,
+                                      weighting_function)
+        finally:
+            free(float_ptrs)
+            free(double_ptrs)
+            free(mask_ptrs)
+
+    def get_min_dist2(self):
+        """
+        Return the squared distance from each grid point to the nearest
+        mapped gate for each field, used with Nearest weighting.
+        """
+        return np.asarray(self.min_dist2)
+
+    @cython.cdivision(True)
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def find_gate_weights(
+            self,
+            int ngates, int nrays,
+            const float[:, ::1] gate_z, const float[:, ::1] gate_y,
+            const float[:, ::1] gate_x,
+            const unsigned char[:, ::1] excluded_gates,
+            float toa, RoIFunction roi_func, int weighting_function):
+        """
+        Find the weights of radar gates at each grid point.
+
+        Parameters are the same as those of :py:func:`map_gates_to_grid`
+        without the field data and masks. Like map_gates_to_grid, toa is not
+        used. Nearest neighbor weighting is not supported.
+
+        Returns
+        -------
+        grid_index : 1D int64 array
+            Index of the grid point in the flattened grid for each weight.
+        gate_index : 1D int64 array
+            Index of the gate, nray * ngates + ngate, for each weight.
+        weights : 1D float32 array
+            Weight of the gate at the grid point.
+
+        """
+        cdef float roi, roi2, x, y, z, xg, yg, zg, dist2, weight
+        cdef int x_min, x_max, y_min, y_max, z_min, z_max
+        cdef int xi, yi, zi, nray, ngate
+        cdef Py_ssize_t nweights = 0
+        cdef Py_ssize_t capacity = max(nrays * ngates, 1024)
+        cdef long long[::1] grid_index_view
+        cdef long long[::1] gate_index_view
+        cdef float[::1] weights_view
+
+        if weighting_function == NEAREST:
+            raise ValueError('Nearest weighting is not supported')
+
+        grid_index = np.empty(capacity, dtype=np.int64)
+        gate_index = np.empty(capacity, dtype=np.int64)
+        weights = np.empty(capacity, dtype=np.float32)
+        grid_index_view = grid_index
+        gate_index_view = gate_index
+        weights_view = weights
+
+        for nray in range(nrays):
+            for ngate in range(ngates):
+
+                # continue if gate excluded
+                if excluded_gates[nray, ngate]:
+                    continue
+                z = gate_z[nray, ngate]
+                y = gate_y[nray, ngate]
+                x = gate_x[nray, ngate]
                 roi = roi_func.get_roi(z, y, x)
-                values = field_data[nray, ngate]
-                masks = field_mask[nray, ngate]
 
-                self.map_gate(x, y, z, roi, values, masks, weighting_function)
+                # shift positions so that grid starts at 0
+                x -= self.x_start
+                y -= self.y_start
+                z -= self.z_start
+
+                x_min = find_min(x, roi, self.x_step)
+                x_max = find_max(x, roi, self.x_step, self.nx)
+                y_min = find_min(y, roi, self.y_step)
+                y_max = find_max(y, roi, self.y_step, self.ny)
+                z_min = find_min(z, roi, self.z_step)
+                z_max = find_max(z, roi, self.z_step, self.nz)
+                if (x_min > self.nx-1 or x_max < 0 or y_min > self.ny-1 or
+                        y_max < 0 or z_min > self.nz-1 or z_max < 0):
+                    continue
+
+                roi2 = roi * roi
+                for xi in range(x_min, x_max+1):
+                    for yi in range(y_min, y_max+1):
+                        for zi in range(z_min, z_max+1):
+                            xg = self.x_step * xi
+                            yg = self.y_step * yi
+                            zg = self.z_step * zi
+                            dist2 = ((xg-x)*(xg-x) + (yg-y)*(yg-y) +
+                                     (zg-z)*(zg-z))
+
+                            if dist2 > roi2:
+                                continue
+
+                            if weighting_function == BARNES:
+                                weight = exp(-(dist2) / (2*roi2)) + 1e-5
+                            elif weighting_function == BARNES2:
+                                weight = exp(-(dist2) / (roi2/4)) + 1e-5
+                            else: # Cressman
+                                weight = (roi2 - dist2) / (roi2 + dist2)
+
+                            # grow the arrays when full
+                            if nweights == capacity:
+                                capacity *= 2
+                                grid_index = _grow(grid_index, capacity)
+                                gate_index = _grow(gate_index, capacity)
+                                weights = _grow(weights, capacity)
+                                grid_index_view = grid_index
+                                gate_index_view = gate_index
+                                weights_view = weights
+
+                            grid_index_view[nweights] = (
+                                (zi * self.ny + yi) * self.nx + xi)
+                            gate_index_view[nweights] = nray * ngates + ngate
+                            weights_view[nweights] = weight
+                            nweights += 1
+
+        return (grid_index[:nweights], gate_index[:nweights],
+                weights[:nweights])
 
     @cython.initializedcheck(False)
     @cython.cdivision(True)
@@ -293,12 +536,12 @@ cdef class GateToGridMapper:
     @cython.wraparound(False)
     cdef int map_gate(self, float x, float y, float z, float roi,
                       float[:] values, char[:] masks,
-                      int weighting_function):
+                      int weighting_function) nogil:
         """ Map a single gate to the grid. """
 
         cdef float xg, yg, zg, dist, weight, roi2, dist2, min_dist2
         cdef int x_min, x_max, y_min, y_max, z_min, z_max
-        cdef int xi, yi, zi, x_argmin, y_argmin, z_argmin
+        cdef int xi, yi, zi, x_argmin, y_argmin, z_argmin, i
         
         # shift positions so that grid starts at 0
         x -= self.x_start
@@ -381,8 +624,15 @@ cdef class GateToGridMapper:
         return 1
 
 
+def _grow(array, size):
+    """ Return a copy of array enlarged to size elements. """
+    new_array = np.empty(size, dtype=array.dtype)
+    new_array[:len(array)] = array
+    return new_array
+
+
 @cython.cdivision(True)
-cdef int find_min(float a, float roi, float step):
+cdef int find_min(float a, float roi, float step) nogil:
     """ Find the mimumum gate index for a dimension. """
     cdef int a_min
     if step == 0:
@@ -394,7 +644,7 @@ cdef int find_min(float a, float roi, float step):
 
 
 @cython.cdivision(True)
-cdef int find_max(float a, float roi, float step, int na):
+cdef int find_max(float a, float roi, float step, int na) nogil:
     """ Find the maximum gate index for a dimension. """
     cdef int a_max
     if step == 0:
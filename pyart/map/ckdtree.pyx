@@ -988,6 +988,168 @@ cdef class cKDTree:
             return
         self.__free_tree(self.tree)
 
+    # ------------------
+    # tree serialization
+    # ------------------
+    cdef np.intp_t __flatten(cKDTree self, innernode* node,
+                             np.intp_t* raw_nodes, np.float64_t* raw_splits,
+                             np.intp_t i):
+        # store node i and its descendants in depth first order, returns
+        # the index of the next node
+        cdef leafnode* leaf
+        cdef np.intp_t j
+        raw_nodes[3*i] = node.split_dim
+        if node.split_dim == -1:
+            leaf = <leafnode*>node
+            raw_nodes[3*i+1] = leaf.start_idx
+            raw_nodes[3*i+2] = leaf.end_idx
+            raw_splits[i] = 0
+            return i + 1
+        raw_splits[i] = node.split
+        raw_nodes[3*i+1] = i + 1
+        j = self.__flatten(node.less, raw_nodes, raw_splits, i + 1)
+        raw_nodes[3*i+2] = j
+        return self.__flatten(node.greater, raw_nodes, raw_splits, j)
+
+    cdef np.intp_t __count_nodes(cKDTree self, innernode* node):
+        if node.split_dim == -1:
+            return 1
+        return (1 + self.__count_nodes(node.less) +
+                self.__count_nodes(node.greater))
+
+    cdef innernode* __unflatten(cKDTree self, np.intp_t* raw_nodes,
+                                np.float64_t* raw_splits,
+                                np.intp_t i) except? <innernode*> NULL:
+        cdef leafnode* n
+        cdef innernode* ni
+        if raw_nodes[3*i] == -1:
+            n = <leafnode*>stdlib.malloc(sizeof(leafnode))
+            if n == <leafnode*> NULL:
+                raise MemoryError
+            n.split_dim = -1
+            n.start_idx = raw_nodes[3*i+1]
+            n.end_idx = raw_nodes[3*i+2]
+            n.children = n.end_idx - n.start_idx
+            return <innernode*>n
+        ni = <innernode*>stdlib.malloc(sizeof(innernode))
+        if ni == <innernode*> NULL:
+            raise MemoryError
+        ni.split_dim = raw_nodes[3*i]
+        ni.split = raw_splits[i]
+        ni.less = NULL
+        ni.greater = NULL
+        try:
+            ni.less = self.__unflatten(raw_nodes, raw_splits, raw_nodes[3*i+1])
+            ni.greater = self.__unflatten(
+                raw_nodes, raw_splits, raw_nodes[3*i+2])
+        except:
+            if ni.less != NULL:
+                self.__free_tree(ni.less)
+            stdlib.free(ni)
+            raise
+        ni.children = ni.less.children + ni.greater.children
+        return ni
+
+    def get_tree_arrays(cKDTree self):
+        """get_tree_arrays(self)
+
+        Return arrays describing the structure of the tree.
+
+        Together with the data these can be used to recreate the tree
+        without building it using from_tree_arrays.
+
+        Returns
+        -------
+        indices : ndarray of intp, shape (n, )
+            Order of the data points in the leaves of the tree.
+        nodes : ndarray of intp, shape (nnodes, 3)
+            Split dimension and children of each node in depth first order.
+            Leaves have a split dimension of -1 and the start and end of
+            their points in indices as children. Inner nodes have the
+            index of the less and greater nodes as children.
+        splits : ndarray of float64, shape (nnodes, )
+            Split value of each node, 0 for leaves.
+
+        """
+        cdef np.intp_t nnodes = self.__count_nodes(self.tree)
+        cdef np.ndarray nodes = np.empty((nnodes, 3), dtype=np.intp)
+        cdef np.ndarray splits = np.empty(nnodes, dtype=np.float64)
+        self.__flatten(self.tree, <np.intp_t*>np.PyArray_DATA(nodes),
+                       <np.float64_t*>np.PyArray_DATA(splits), 0)
+        return self.indices.copy(), nodes, splits
+
+    @staticmethod
+    def from_tree_arrays(data, indices, nodes, splits,
+                         np.intp_t leafsize=10, mins=None, maxes=None):
+        """from_tree_arrays(data, indices, nodes, splits, leafsize=10,
+                            mins=None, maxes=None)
+
+        Create a tree from data and the arrays returned by get_tree_arrays.
+
+        Parameters
+        ----------
+        data : array_like, shape (n,m)
+            The data points used to build the tree. As with the constructor
+            this array is not copied if it is a contiguous array of doubles,
+            a read-only numpy.memmap can be used.
+        indices, nodes, splits : array_like
+            Arrays returned by get_tree_arrays, not copied if contiguous and
+            of the correct dtype.
+        leafsize : positive integer
+            The leafsize used to build the tree.
+        mins, maxes : array_like, shape (m, ) or None
+            The mins and maxes attributes of the tree, None finds them from
+            the data which requires reading all of it.
+
+        """
+        cdef cKDTree self = cKDTree.__new__(cKDTree)
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+        self.n, self.m = np.shape(self.data)
+        self.leafsize = leafsize
+        if maxes is None:
+            maxes = np.amax(self.data,axis=0)
+        if mins is None:
+            mins = np.amin(self.data,axis=0)
+        self.maxes = np.array(maxes, dtype=np.float64)
+        self.mins = np.array(mins, dtype=np.float64)
+        if np.shape(self.maxes) != (self.m, ) or np.shape(self.mins) != (self.m, ):
+            raise ValueError("mins and maxes must have m elements")
+        self.indices = np.ascontiguousarray(indices, dtype=np.intp)
+        nodes = np.ascontiguousarray(nodes, dtype=np.intp)
+        splits = np.ascontiguousarray(splits, dtype=np.float64)
+
+        # check the arrays describe a tree over the data, children of inner
+        # nodes must follow their parent so the tree contains no cycles.
+        if np.shape(self.indices) != (self.n, ):
+            raise ValueError("indices must have one element per point")
+        if self.n > 0 and (self.indices.min() < 0 or
+                           self.indices.max() >= self.n):
+            raise ValueError("indices must lie in [0, n)")
+        if (nodes.ndim != 2 or nodes.shape[1] != 3 or len(nodes) == 0 or
+                splits.shape != (len(nodes), )):
+            raise ValueError("nodes and splits do not describe a tree")
+        leaf = nodes[:, 0] == -1
+        inner_children = nodes[~leaf, 1:]
+        inner_index = np.flatnonzero(~leaf)[:, np.newaxis]
+        leaf_children = nodes[leaf, 1:]
+        if (np.any(nodes[~leaf, 0] >= self.m) or np.any(nodes[:, 0] < -1) or
+                np.any(inner_children <= inner_index) or
+                np.any(inner_children >= len(nodes)) or
+                np.any(leaf_children < 0) or
+                np.any(leaf_children > self.n) or
+                np.any(leaf_children[:, 0] > leaf_children[:, 1])):
+            raise ValueError("nodes and splits do not describe a tree")
+
+        self.raw_data = <np.float64_t*>np.PyArray_DATA(self.data)
+        self.raw_maxes = <np.float64_t*>np.PyArray_DATA(self.maxes)
+        self.raw_mins = <np.float64_t*>np.PyArray_DATA(self.mins)
+        self.raw_indices = <np.intp_t*>np.PyArray_DATA(self.indices)
+
+        self.tree = self.__unflatten(
+            <np.intp_t*>np.PyArray_DATA(nodes),
+            <np.float64_t*>np.PyArray_DATA(splits), 0)
+        return self
+
     # -----
     # query
     # -----
@@ -1440,6 +1602,59 @@ cdef class cKDTree:
                 result[c] = self.__query_ball_point(&xx[0], r, p, eps)
             return result
 
+    def query_ball_points(cKDTree self, object x, object r,
+                          np.float64_t p=2., np.float64_t eps=0):
+        """query_ball_points(self, x, r, p, eps)
+
+        Find all points within a per-point distance of a number of points.
+
+        Parameters
+        ----------
+        x : array_like, shape (n, self.m)
+            The points to search for neighbors of.
+        r : array_like, shape (n, )
+            The radius of points to return for each point in x.
+        p : float, optional
+            Which Minkowski p-norm to use.  Should be in the range [1, inf].
+        eps : nonnegative float, optional
+            Approximate search, see query_ball_point.
+
+        Returns
+        -------
+        indices : ndarray of intp, shape (nnz, )
+            Indices of the neighbors of all points in x. The neighbors of
+            point i are found in indices[indptr[i]:indptr[i + 1]] in the same
+            order as returned by query_ball_point.
+        indptr : ndarray of intp, shape (n + 1, )
+            Offsets of the neighbors of each point into indices.
+
+        """
+        cdef np.ndarray[np.float64_t, ndim=2, mode="c"] xx
+        cdef np.ndarray[np.float64_t, ndim=1, mode="c"] rr
+        cdef np.ndarray[np.intp_t, ndim=1, mode="c"] indptr
+        cdef np.intp_t i, n
+        cdef PointRectDistanceTracker tracker
+        cdef list results = []
+
+        xx = np.ascontiguousarray(x, dtype=np.float64)
+        if xx.shape[1] != self.m:
+            raise ValueError("Searching for a %d-dimensional point in a " \
+                             "%d-dimensional KDTree" % (int(xx.shape[1]), int(self.m)))
+        n = xx.shape[0]
+        rr = np.ascontiguousarray(np.broadcast_to(r, (n, )), dtype=np.float64)
+        indptr = np.empty(n + 1, dtype=np.intp)
+        indptr[0] = 0
+
+        # the neighbors of all points are appended to a single list
+        for i in range(n):
+            tracker = PointRectDistanceTracker()
+            tracker.init(&xx[i, 0], Rectangle(self.mins, self.maxes),
+                         p, eps, rr[i])
+            self.__query_ball_point_traverse_checking(
+                results, self.tree, tracker)
+            indptr[i + 1] = len(results)
+        return np.array(results, dtype=np.intp), indptr
+
     # ---------------
     # query_ball_tree
     # ---------------
@@ -3,9 +3,11 @@ Generate a Cartesian grid by mapping from radar gates onto the grid.
 
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 
 import numpy as np
+import scipy.sparse
 
 from ..core.radar import Radar
 from ..core.transforms import geographic_to_cartesian
@@ -21,7 +23,7 @@ def map_gates_to_grid(
         fields=None, gatefilters=False, map_roi=True,
         weighting_function='Barnes', toa=17000.0, roi_func='dist_beam',
         constant_roi=None, z_factor=0.05, xy_factor=0.02, min_radius=500.0,
-        h_factor=1.0, nb=1.5, bsp=1.0, **kwargs):
+        h_factor=1.0, nb=1.5, bsp=1.0, n_threads=1, **kwargs):
     """
     Map gates from one or more radars to a Cartesian grid.
 
@@ -53,6 +55,15 @@ def map_gates_to_grid(
         A custom RoIFunction can be defined using the RoIFunction class
         and defining a get_roi method which returns the radius. For efficient
         mapping this class should be implemented in Cython.
+    n_threads : int
+        Number of threads used to map the gates. The rays of each radar are
+        split into blocks which are mapped onto separate grids by each
+        thread and then summed. Results are identical to those from a single
+        thread within floating point tolerance. Each thread requires its own
+        copy of the grid arrays, memory use grows linearly with the number
+        of threads by 16 bytes per grid point and field for each thread.
+        The number of threads is limited to the largest number of rays in
+        the radars.
 
     Returns
     -------
@@ -86,55 +97,29 @@ def map_gates_to_grid(
     cy_weighting_function = _detemine_cy_weighting_func(weighting_function)
     projparams = _find_projparams(grid_origin, radars, grid_projection)
     fields = _determine_fields(fields, radars)
+    if len(fields) == 0:
+        raise ValueError('No fields to map, radars share no common fields')
     grid_starts, grid_steps = _find_grid_params(grid_shape, grid_limits)
     offsets = _find_offsets(radars, projparams, grid_origin_alt)
     roi_func = _parse_roi_func(roi_func, constant_roi, z_factor, xy_factor,
                                min_radius, h_factor, nb, bsp, offsets)
 
-    # prepare grid storage arrays
-    nfields = len(fields)
-    grid_sum = np.zeros(grid_shape + (nfields, ), dtype=np.float32)
-    grid_wsum = np.zeros(grid_shape + (nfields, ), dtype=np.float32)
-    gatemapper = GateToGridMapper(
-        grid_shape, grid_starts, grid_steps, grid_sum, grid_wsum)
+    # prepare grid storage arrays, one set for each thread
+    gatemappers, grid_sums, grid_wsums = _make_gatemappers(
+        grid_shape, grid_starts, grid_steps, len(fields), n_threads,
+        max(radar.nrays for radar in radars))
+    gatemapper = gatemappers[0]
 
     # project gates from each radar onto the grid
     for radar, gatefilter in zip(radars, gatefilters):
+        _map_radar_gates(
+            radar, gatefilter, gatemappers, fields, projparams,
+            grid_origin_alt, skip_transform, toa, roi_func,
+            cy_weighting_function, **kwargs)
 
-        # Copy the field data and masks.
-        # TODO method that does not copy field data into new array
-        shape = (radar.nrays, radar.ngates, nfields)
-        field_data = np.empty(shape, dtype='float32')
-        field_mask = np.empty(shape, dtype='uint8')
-        for i, field in enumerate(fields):
-            fdata = radar.fields[field]['data']
-            field_data[:, :, i] = np.ma.getdata(fdata)
-            field_mask[:, :, i] = np.ma.getmaskarray(fdata)
-
-        # find excluded gates from the gatefilter
-        if gatefilter is False:
-            gatefilter = GateFilter(radar)  # include all gates
-        elif gatefilter is None:
-            gatefilter = moment_based_gate_filter(radar, **kwargs)
-        excluded_gates = gatefilter.gate_excluded.astype('uint8')
-
-        # calculate gate locations relative to the grid origin
-        if skip_transform:
-            # single radar, grid centered at radar location
-            gate_x = radar.gate_x['data']
-            gate_y = radar.gate_y['data']
-        else:
-            gate_x, gate_y = geographic_to_cartesian(
-                radar.gate_longitude['data'], radar.gate_latitude['data'],
-                projparams)
-        gate_z = radar.gate_altitude['data'] - grid_origin_alt
-
-        # map the gates onto the grid
-        gatemapper.map_gates_to_grid(
-            radar.ngates, radar.nrays, gate_z.astype('float32'),
-            gate_y.astype('float32'), gate_x.astype('float32'),
-            field_data, field_mask, excluded_gates,
-            toa, roi_func, cy_weighting_function)
+    # combine the grids from each thread
+    grid_sum, grid_wsum = _combine_thread_grids(
+        gatemappers, grid_sums, grid_wsums, cy_weighting_function)
 
     # create and return the grid dictionary
     mweight = np.ma.masked_equal(grid_wsum, 0)
@@ -148,6 +133,603 @@ def map_gates_to_grid(
     return grids
 
 
+def build_gates_to_grid_operator(
+        radars, grid_shape, grid_limits, grid_origin=None,
+        grid_origin_alt=None, grid_projection=None, map_roi=True,
+        weighting_function='Barnes', toa=17000.0, roi_func='dist_beam',
+        constant_roi=None, z_factor=0.05, xy_factor=0.02, min_radius=500.0,
+        h_factor=1.0, nb=1.5, bsp=1.0):
+    """
+    Build a reusable operator which maps gates from one or more radars to a
+    Cartesian grid.
+
+    The radius of influence and distance weight of every gate at every grid
+    point are found once and stored in a sparse matrix. Volumes collected
+    with the same scan geometry can then be mapped to the grid using
+    :py:func:`GatesToGridOperator.map_gates_to_grid` at the cost of a sparse
+    matrix product. Only the ranges, antenna angles and locations of the
+    radars are used, field data and gate filters are applied when mapping.
+
+    Parameters not defined below are identical to those in
+    :py:func:`map_gates_to_grid`.
+
+    Parameters
+    ----------
+    weighting_function : 'Barnes', 'Barnes2' or 'Cressman'
+        Function used to weight nearby collected points when interpolating
+        a grid point. Nearest neighbor weighting is not supported.
+    toa : float
+        Top of atmosphere in meters. Not used, gates at all heights are
+        included, as in :py:func:`map_gates_to_grid`.
+
+    Returns
+    -------
+    operator : GatesToGridOperator
+        Operator mapping gates from radars with the same scan geometry as
+        radars to the grid.
+
+    See Also
+    --------
+    load_gates_to_grid_operator : Load an operator saved to disk.
+
+    """
+    # make a tuple if passed a radar object as the first argument
+    if isinstance(radars, Radar):
+        radars = (radars, )
+
+    skip_transform = False
+    if len(radars) == 1 and grid_origin_alt is None and grid_origin is None:
+        skip_transform = True
+
+    if grid_origin_alt is None:
+        try:
+            grid_origin_alt = float(radars[0].altitude['data'])
+        except TypeError:
+            grid_origin_alt = np.mean(radars[0].altitude['data'])
+
+    cy_weighting_function = _detemine_cy_weighting_func(weighting_function)
+    if cy_weighting_function == 2:
+        raise ValueError(
+            'Nearest weighting_function is not supported by the operator')
+    projparams = _find_projparams(grid_origin, radars, grid_projection)
+    grid_starts, grid_steps = _find_grid_params(grid_shape, grid_limits)
+    offsets = _find_offsets(radars, projparams, grid_origin_alt)
+    roi_func = _parse_roi_func(roi_func, constant_roi, z_factor, xy_factor,
+                               min_radius, h_factor, nb, bsp, offsets)
+
+    # no field data is mapped, the grid storage arrays are empty
+    grid_empty = np.zeros(tuple(grid_shape) + (0, ), dtype=np.float32)
+    gatemapper = GateToGridMapper(
+        tuple(grid_shape), grid_starts, grid_steps, grid_empty, grid_empty)
+
+    # find the weights of the gates from each radar, the gates of all
+    # radars are the columns of the operator.
+    grid_indices = []
+    gate_indices = []
+    weights = []
+    gate_offset = 0
+    for radar in radars:
+        if skip_transform:
+            gate_x = radar.gate_x['data']
+            gate_y = radar.gate_y['data']
+        else:
+            gate_x, gate_y = geographic_to_cartesian(
+                radar.gate_longitude['data'], radar.gate_latitude['data'],
+                projparams)
+        gate_z = radar.gate_altitude['data'] - grid_origin_alt
+        excluded_gates = np.zeros((radar.nrays, radar.ngates), dtype='uint8')
+
+        grid_index, gate_index, weight = gatemapper.find_gate_weights(
+            radar.ngates, radar.nrays,
+            np.ascontiguousarray(gate_z, dtype='float32'),
+            np.ascontiguousarray(gate_y, dtype='float32'),
+            np.ascontiguousarray(gate_x, dtype='float32'),
+            excluded_gates, toa, roi_func, cy_weighting_function)
+        grid_indices.append(grid_index)
+        gate_indices.append(gate_index + gate_offset)
+        weights.append(weight)
+        gate_offset += radar.nrays * radar.ngates
+
+    matrix = scipy.sparse.csr_matrix(
+        (np.concatenate(weights),
+         (np.concatenate(grid_indices), np.concatenate(gate_indices))),
+        shape=(int(np.prod(grid_shape)), gate_offset), dtype=np.float32)
+
+    if map_roi:
+        roi = np.empty(grid_shape, dtype=np.float32)
+        gatemapper.find_roi_for_grid(roi, roi_func)
+    else:
+        roi = None
+    radar_shapes = [(radar.nrays, radar.ngates) for radar in radars]
+    return GatesToGridOperator(matrix, grid_shape, radar_shapes, roi)
+
+
+def load_gates_to_grid_operator(filename):
+    """
+    Load a gates to grid operator from a file.
+
+    Parameters
+    ----------
+    filename : str
+        Filename of the file created using
+        :py:func:`GatesToGridOperator.save`.
+
+    Returns
+    -------
+    operator : GatesToGridOperator
+        Operator loaded from the file.
+
+    """
+    with np.load(filename) as npz:
+        matrix = scipy.sparse.csr_matrix(
+            (npz['data'], npz['indices'], npz['indptr']),
+            shape=tuple(npz['shape']))
+        grid_shape = tuple(int(i) for i in npz['grid_shape'])
+        radar_shapes = [tuple(int(i) for i in s) for s in npz['radar_shapes']]
+        roi = npz['roi'] if 'roi' in npz.files else None
+    return GatesToGridOperator(matrix, grid_shape, radar_shapes, roi)
+
+
+class GatesToGridOperator(object):
+    """
+    A precomputed operator mapping radar gates to a Cartesian grid.
+
+    Operators should be created using
+    :py:func:`build_gates_to_grid_operator` or
+    :py:func:`load_gates_to_grid_operator`.
+
+    Parameters
+    ----------
+    matrix : scipy.sparse.csr_matrix
+        Sparse matrix of weights with a row for each point in the flattened
+        grid and a column for each gate of the radars, ordered by radar, ray
+        and gate.
+    grid_shape : tuple
+        Shape of the grid along the z, y, and x dimensions.
+    radar_shapes : list of tuples
+        Number of rays and gates of each radar.
+    roi : array or None
+        Radius of influence at each grid point or None if not calculated.
+
+    Attributes
+    ----------
+    matrix, grid_shape, radar_shapes, roi
+        See the parameters.
+
+    """
+
+    def __init__(self, matrix, grid_shape, radar_shapes, roi=None):
+        """ initialize the object. """
+        self.matrix = matrix
+        self.grid_shape = tuple(grid_shape)
+        self.radar_shapes = list(radar_shapes)
+        self.roi = roi
+
+    def save(self, filename):
+        """
+        Save the operator to a file.
+
+        Parameters
+        ----------
+        filename : str
+            Filename of the file to create, a NumPy .npz file.
+
+        """
+        arrays = {'data': self.matrix.data, 'indices': self.matrix.indices,
+                  'indptr': self.matrix.indptr,
+                  'shape': np.array(self.matrix.shape),
+                  'grid_shape': np.array(self.grid_shape),
+                  'radar_shapes': np.array(self.radar_shapes)}
+        if self.roi is not None:
+            arrays['roi'] = self.roi
+        with open(filename, 'wb') as fh:
+            np.savez(fh, **arrays)
+
+    def map_gates_to_grid(self, radars, fields=None, gatefilters=False,
+                          map_roi=True, **kwargs):
+        """
+        Map gates from one or more radars to the grid.
+
+        The radars must have the same number of rays and gates as those used
+        to build the operator and are assumed to have the same scan
+        geometry. Masked gates and gates excluded by the gatefilters do not
+        contribute to the grid, the weights of the remaining gates are
+        normalized at each grid point.
+
+        Parameters
+        ----------
+        radars : Radar or tuple of Radar objects.
+            Radar objects which will be mapped to the grid.
+        fields, gatefilters, map_roi : optional
+            See :py:func:`map_gates_to_grid`.
+
+        Returns
+        -------
+        grids : dict
+            Dictionary of mapped fields, see :py:func:`map_gates_to_grid`.
+
+        """
+        # make a tuple if passed a radar object as the first argument
+        if isinstance(radars, Radar):
+            radars = (radars, )
+        radar_shapes = [(radar.nrays, radar.ngates) for radar in radars]
+        if radar_shapes != self.radar_shapes:
+            raise ValueError(
+                'radars do not match the operator, expected radars with '
+                '(nrays, ngates): %s' % (self.radar_shapes, ))
+
+        gatefilters = _parse_gatefilters(gatefilters, radars)
+        fields = _determine_fields(fields, radars)
+        nfields = len(fields)
+
+        # gate values and weight multipliers, zero for masked and excluded
+        # gates, of all radars ordered as the columns of the operator.
+        ncols = self.matrix.shape[1]
+        gate_values = np.empty((ncols, 2 * nfields), dtype=np.float32)
+        start = 0
+        for radar, gatefilter in zip(radars, gatefilters):
+            end = start + radar.nrays * radar.ngates
+            if gatefilter is False:
+                excluded_gates = None
+            else:
+                if gatefilter is None:
+                    gatefilter = moment_based_gate_filter(radar, **kwargs)
+                excluded_gates = gatefilter.gate_excluded.ravel()
+            for i, field in enumerate(fields):
+                fdata = radar.fields[field]['data']
+                included = ~np.ma.getmaskarray(fdata).ravel()
+                if excluded_gates is not None:
+                    included &= ~excluded_gates
+                gate_values[start:end, nfields + i] = included
+                gate_values[start:end, i] = np.ma.getdata(fdata).ravel()
+                gate_values[start:end, i][~included] = 0
+            start = end
+
+        # a single sparse matrix product for all fields
+        grid_values = self.matrix.dot(gate_values)
+        grid_values.shape = self.grid_shape + (2 * nfields, )
+        grid_sum = grid_values[..., :nfields]
+        grid_wsum = grid_values[..., nfields:]
+
+        # create and return the grid dictionary
+        mweight = np.ma.masked_equal(grid_wsum, 0)
+        msum = np.ma.masked_array(grid_sum, mweight.mask)
+        grids = dict([(f, msum[..., i] / mweight[..., i])
+                      for i, f in enumerate(fields)])
+        if map_roi:
+            if self.roi is None:
+                raise ValueError(
+                    'the radius of influence was not stored in the operator')
+            grids['ROI'] = self.roi
+        return grids
+
+
+class GatesToGridMosaic(object):
+    """
+    A mosaic of gates from several radars mapped to a Cartesian grid.
+
+    The weighted sums each radar contributes to the grid are kept
+    separately so that when a new volume from one radar arrives only that
+    radar is mapped, its previous contribution is replaced and the mosaic is
+    recomposed in time proportional to the size of the grid.
+
+    The grid, its projection, the fields and the radius of influence are
+    fixed when the mosaic is created. The radius of influence is found from
+    the locations of the initial radars, new volumes are expected to be
+    collected by a radar at the same location as the volume they replace.
+
+    Parameters
+    ----------
+    radars : Radar or tuple of Radar objects.
+        Initial radar volumes which will be mapped to the grid.
+    weighting_function : 'Barnes', 'Barnes2' or 'Cressman'
+        Function used to weight nearby collected points when interpolating
+        a grid point. Nearest neighbor weighting is not supported.
+    gatefilters : GateFilter, tuple of GateFilter objects, optional
+        Gatefilters for the initial radars, see :py:func:`map_gates_to_grid`.
+    n_threads : int
+        Number of threads used to map the gates of each radar, limited to
+        the number of rays in the radar. Each thread requires its own copy of
+        the grid arrays while a radar is mapped, see
+        :py:func:`map_gates_to_grid`.
+    kwargs : optional
+        Additional keyword arguments passed to
+        :py:func:`moment_based_gate_filter` when a gatefilter is None.
+
+    Parameters not defined above are identical to those in
+    :py:func:`map_gates_to_grid`.
+
+    Attributes
+    ----------
+    fields : list of str
+        Fields mapped to the grid.
+    grid_shape : tuple
+        Shape of the grid along the z, y, and x dimensions.
+    nradars : int
+        Number of radars in the mosaic.
+
+    """
+
+    def __init__(self, radars, grid_shape, grid_limits, grid_origin=None,
+                 grid_origin_alt=None, grid_projection=None, fields=None,
+                 gatefilters=False, weighting_function='Barnes',
+                 toa=17000.0, roi_func='dist_beam', constant_roi=None,
+                 z_factor=0.05, xy_factor=0.02, min_radius=500.0,
+                 h_factor=1.0, nb=1.5, bsp=1.0, n_threads=1, **kwargs):
+        """ initialize the object. """
+        # make a tuple if passed a radar object as the first argument
+        if isinstance(radars, Radar):
+            radars = (radars, )
+
+        skip_transform = False
+        if (len(radars) == 1 and grid_origin_alt is None and
+                grid_origin is None):
+            skip_transform = True
+
+        if grid_origin_alt is None:
+            try:
+                grid_origin_alt = float(radars[0].altitude['data'])
+            except TypeError:
+                grid_origin_alt = np.mean(radars[0].altitude['data'])
+
+        cy_weighting_function = _detemine_cy_weighting_func(
+            weighting_function)
+        if cy_weighting_function == 2:
+            raise ValueError(
+                'Nearest weighting_function is not supported by the mosaic')
+        gatefilters = _parse_gatefilters(gatefilters, radars)
+        projparams = _find_projparams(grid_origin, radars, grid_projection)
+        fields = _determine_fields(fields, radars)
+        if len(fields) == 0:
+            raise ValueError('No fields to map, radars share no common fields')
+        grid_starts, grid_steps = _find_grid_params(grid_shape, grid_limits)
+        offsets = _find_offsets(radars, projparams, grid_origin_alt)
+        roi_func = _parse_roi_func(roi_func, constant_roi, z_factor,
+                                   xy_factor, min_radius, h_factor, nb, bsp,
+                                   offsets)
+
+        self.fields = fields
+        self.grid_shape = tuple(grid_shape)
+        self.nradars = len(radars)
+        self._grid_starts = grid_starts
+        self._grid_steps = grid_steps
+        self._grid_origin_alt = grid_origin_alt
+        self._projparams = projparams
+        self._skip_transform = skip_transform
+        self._toa = toa
+        self._roi_func = roi_func
+        self._cy_weighting_function = cy_weighting_function
+        self._n_threads = n_threads
+        self._kwargs = kwargs
+
+        # the contribution of each radar and their running totals, the
+        # totals are accumulated in double precision so that replacing a
+        # contribution does not accumulate rounding errors.
+        grid_fields_shape = self.grid_shape + (len(fields), )
+        self._sums = []
+        self._wsums = []
+        self._total_sum = np.zeros(grid_fields_shape, dtype=np.float64)
+        self._total_wsum = np.zeros(grid_fields_shape, dtype=np.float64)
+        self._ncontrib = np.zeros(grid_fields_shape, dtype=np.int32)
+        for radar, gatefilter in zip(radars, gatefilters):
+            grid_sum, grid_wsum = self._map_radar(radar, gatefilter)
+            self._sums.append(grid_sum)
+            self._wsums.append(grid_wsum)
+            self._total_sum += grid_sum
+            self._total_wsum += grid_wsum
+            self._ncontrib += grid_wsum > 0
+
+    def _map_radar(self, radar, gatefilter):
+        """ Return the grid_sum and grid_wsum contribution of a radar. """
+        gatemappers, grid_sums, grid_wsums = _make_gatemappers(
+            self.grid_shape, self._grid_starts, self._grid_steps,
+            len(self.fields), self._n_threads, radar.nrays)
+        _map_radar_gates(
+            radar, gatefilter, gatemappers, self.fields, self._projparams,
+            self._grid_origin_alt, self._skip_transform, self._toa,
+            self._roi_func, self._cy_weighting_function, **self._kwargs)
+        return _combine_thread_grids(
+            gatemappers, grid_sums, grid_wsums, self._cy_weighting_function)
+
+    def update(self, index, radar, gatefilter=False):
+        """
+        Replace the contribution of a radar with that of a new volume.
+
+        Only the new volume is mapped to the grid, the contributions of the
+        other radars are reused.
+
+        Parameters
+        ----------
+        index : int
+            Index of the radar to replace in the radars used to create the
+            mosaic.
+        radar : Radar
+            New volume from the radar, must contain all mapped fields.
+        gatefilter : GateFilter, None or False, optional
+            Gatefilter for the new volume, see :py:func:`map_gates_to_grid`.
+
+        """
+        if not -self.nradars <= index < self.nradars:
+            raise ValueError(
+                'index %d out of range for a mosaic of %d radars'
+                % (index, self.nradars))
+        missing = [f for f in self.fields if f not in radar.fields]
+        if missing:
+            raise ValueError(
+                'radar is missing mapped fields: %s' % (', '.join(missing)))
+
+        grid_sum, grid_wsum = self._map_radar(radar, gatefilter)
+        old_sum = self._sums[index]
+        old_wsum = self._wsums[index]
+        self._total_sum += grid_sum
+        self._total_sum -= old_sum
+        self._total_wsum += grid_wsum
+        self._total_wsum -= old_wsum
+        self._ncontrib += grid_wsum > 0
+        self._ncontrib -= old_wsum > 0
+        # remove residual rounding errors where no radar contributes
+        no_contrib = self._ncontrib == 0
+        self._total_sum[no_contrib] = 0
+        self._total_wsum[no_contrib] = 0
+        self._sums[index] = grid_sum
+        self._wsums[index] = grid_wsum
+
+    def get_grids(self, map_roi=True):
+        """
+        Return the mosaic of the fields.
+
+        Parameters
+        ----------
+        map_roi : bool, optional
+            True to include a radius of influence field in the returned
+            dictionary under the 'ROI' key.
+
+        Returns
+        -------
+        grids : dict
+            Dictionary of mapped fields, see :py:func:`map_gates_to_grid`.
+
+        """
+        grid_sum = self._total_sum.astype(np.float32)
+        grid_wsum = self._total_wsum.astype(np.float32)
+        mweight = np.ma.masked_equal(grid_wsum, 0)
+        msum = np.ma.masked_array(grid_sum, mweight.mask)
+        grids = dict([(f, msum[..., i] / mweight[..., i])
+                      for i, f in enumerate(self.fields)])
+        if map_roi:
+            grid_empty = np.zeros(self.grid_shape + (0, ), dtype=np.float32)
+            gatemapper = GateToGridMapper(
+                self.grid_shape, self._grid_starts, self._grid_steps,
+                grid_empty, grid_empty)
+            roi_array = np.empty(self.grid_shape, dtype=np.float32)
+            gatemapper.find_roi_for_grid(roi_array, self._roi_func)
+            grids['ROI'] = roi_array
+        return grids
+
+
+def _make_gatemappers(grid_shape, grid_starts, grid_steps, nfields,
+                      n_threads, max_nrays):
+    """
+    Return gate mappers and their grid_sum and grid_wsum arrays, one for each
+    thread. Threads beyond the number of rays would map no gates, at most
+    max_nrays mappers are created to avoid allocating unused grids.
+    """
+    n_threads = max(min(int(n_threads), max_nrays), 1)
+    gatemappers = []
+    grid_sums = []
+    grid_wsums = []
+    for _ in range(n_threads):
+        grid_sum = np.zeros(grid_shape + (nfields, ), dtype=np.float32)
+        grid_wsum = np.zeros(grid_shape + (nfields, ), dtype=np.float32)
+        gatemappers.append(GateToGridMapper(
+            grid_shape, grid_starts, grid_steps, grid_sum, grid_wsum))
+        grid_sums.append(grid_sum)
+        grid_wsums.append(grid_wsum)
+    return gatemappers, grid_sums, grid_wsums
+
+
+def _map_radar_gates(radar, gatefilter, gatemappers, fields, projparams,
+                     grid_origin_alt, skip_transform, toa, roi_func,
+                     cy_weighting_function, **kwargs):
+    """
+    Map the gates of a radar onto the grids of the gate mappers, the rays
+    are split into blocks which are mapped by one thread per mapper.
+    """
+    n_threads = len(gatemappers)
+
+    # field data and masks are passed to the mapper without copying
+    # when possible
+    field_data, field_mask = _find_field_buffers(radar, fields)
+
+    # find excluded gates from the gatefilter
+    if gatefilter is False:
+        gatefilter = GateFilter(radar)  # include all gates
+    elif gatefilter is None:
+        gatefilter = moment_based_gate_filter(radar, **kwargs)
+    excluded_gates = gatefilter.gate_excluded.astype('uint8')
+
+    # calculate gate locations relative to the grid origin
+    if skip_transform:
+        # single radar, grid centered at radar location
+        gate_x = radar.gate_x['data']
+        gate_y = radar.gate_y['data']
+    else:
+        gate_x, gate_y = geographic_to_cartesian(
+            radar.gate_longitude['data'], radar.gate_latitude['data'],
+            projparams)
+    gate_z = radar.gate_altitude['data'] - grid_origin_alt
+    gate_z = gate_z.astype('float32')
+    gate_y = gate_y.astype('float32')
+    gate_x = gate_x.astype('float32')
+
+    # map the gates onto the grid, each thread maps a block of rays
+    ray_bounds = np.linspace(0, radar.nrays, n_threads + 1).astype(int)
+
+    def map_ray_block(i):
+        """ Map a block of rays onto the grid of the i-th thread. """
+        start, end = ray_bounds[i], ray_bounds[i + 1]
+        if start == end:
+            return
+        gatemappers[i].map_fields_to_grid(
+            radar.ngates, end - start, gate_z[start:end],
+            gate_y[start:end], gate_x[start:end],
+            [data[start:end] for data in field_data],
+            [None if mask is None else mask[start:end]
+             for mask in field_mask],
+            excluded_gates[start:end],
+            toa, roi_func, cy_weighting_function)
+
+    if n_threads == 1:
+        map_ray_block(0)
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            list(executor.map(map_ray_block, range(n_threads)))
+
+
+def _combine_thread_grids(gatemappers, grid_sums, grid_wsums,
+                          cy_weighting_function):
+    """ Combine the grids mapped by each thread. """
+    grid_sum = grid_sums[0]
+    grid_wsum = grid_wsums[0]
+    n_threads = len(gatemappers)
+    if n_threads > 1:
+        if cy_weighting_function == 2:
+            # nearest neighbor, select the grid with the closest gate, the
+            # first on ties as when mapped with a single thread.
+            min_dist2 = np.stack([m.get_min_dist2() for m in gatemappers])
+            closest = np.argmin(min_dist2, axis=0)[np.newaxis]
+            grid_sum = np.take_along_axis(
+                np.stack(grid_sums), closest, axis=0)[0]
+            grid_wsum = np.take_along_axis(
+                np.stack(grid_wsums), closest, axis=0)[0]
+        else:
+            for i in range(1, n_threads):
+                grid_sum += grid_sums[i]
+                grid_wsum += grid_wsums[i]
+    return grid_sum, grid_wsum
+
+
+def _find_field_buffers(radar, fields):
+    """
+    Return the data and masks of fields in a form which can be read by the
+    gate mapper, copies are only made when needed.
+    """
+    field_data = []
+    field_mask = []
+    for field in fields:
+        fdata = radar.fields[field]['data']
+        data = np.ma.getdata(fdata)
+        if data.dtype not in (np.float32, np.float64):
+            data = data.astype(np.float32)
+        field_data.append(np.ascontiguousarray(data))
+        mask = np.ma.getmask(fdata)
+        if mask is np.ma.nomask:
+            field_mask.append(None)
+        else:
+            field_mask.append(np.ascontiguousarray(mask).view(np.uint8))
+    return field_data, field_mask
+
+
 def _detemine_cy_weighting_func(weighting_function):
     """ Determine cython weight function value. """
     if weighting_function.upper() == 'BARNES2':
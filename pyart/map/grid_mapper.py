@@ -3,6 +3,11 @@ Utilities for mapping radar objects to Cartesian grids.
 
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import json
+import mmap
+import multiprocessing
+import os
 import warnings
 
 import netCDF4
@@ -14,11 +19,21 @@ from ..core.transforms import geographic_to_cartesian
 from ..core.grid import Grid
 from ..core.radar import Radar
 from ..filters import GateFilter, moment_based_gate_filter
+from ..io.auto_read import read
 from ..io.common import make_time_unit_str
+from ..io.grid_io import write_grid
 from ._load_nn_field_data import _load_nn_field_data
 from .ckdtree import cKDTree
 from .gates_to_grid import map_gates_to_grid
 
+# number of grid points whose neighbors are found and weighted together
+# by map_to_grid, this limits the size of the temporary neighbor arrays.
+_MAP_TO_GRID_BLOCK_SIZE = 1024
+
+# function which maps a range of grid points in the worker processes of
+# map_to_grid, set before the workers are forked so it is inherited by them.
+_worker_map_grid_points = None
+
 
 def grid_from_radars(radars, grid_shape, grid_limits,
                      gridding_algo='map_gates_to_grid', **kwargs):
@@ -26,7 +41,10 @@ def grid_from_radars(radars, grid_shape, grid_limits,
     Map one or more radars to a Cartesian grid returning a Grid object.
 
     Additional arguments are passed to :py:func:`map_to_grid` or
-    :py:func:`map_gates_to_grid`.
+    :py:func:`map_gates_to_grid`. For example n_threads can be used to map
+    the gates using multiple threads with the 'map_gates_to_grid' algorithm
+    and n_workers to map the grid points using multiple processes with the
+    'map_to_grid' algorithm.
 
     Parameters
     ----------
@@ -173,6 +191,100 @@ def grid_from_radars(radars, grid_shape, grid_limits,
         radar_time=radar_time, projection=projection)
 
 
+def grid_from_radar_files(filenames, grid_shape, grid_limits, reader=None,
+                          gatefilter_func=None, output=None,
+                          write_kwargs=None, prefetch=True, **kwargs):
+    """
+    Map radar files to Cartesian grids one at a time.
+
+    Each file is read, optionally filtered, mapped to a grid using
+    :py:func:`grid_from_radars` and optionally written before the next file
+    is processed, so only one radar and one grid are held in memory at a
+    time, together with the next radar when prefetching. This is a
+    generator, files are only processed as grids are requested.
+
+    Additional arguments are passed to :py:func:`grid_from_radars`.
+
+    Parameters
+    ----------
+    filenames : iterable
+        Filenames of the radar files to grid, any iterable including a
+        generator can be used.
+    grid_shape : 3-tuple of floats
+        Number of points in the grid (z, y, x).
+    grid_limits : 3-tuple of 2-tuples
+        Minimum and maximum grid location (inclusive) in meters for the
+        z, y, x coordinates.
+    reader : function or None
+        Function which reads a filename and returns a Radar object. None
+        uses :py:func:`pyart.io.read`.
+    gatefilter_func : function or None
+        Function which takes a Radar object and returns the GateFilter used
+        when mapping it to the grid. None applies the default filtering of
+        :py:func:`grid_from_radars`.
+    output : str, function or None
+        Where the grids are written using :py:func:`pyart.io.write_grid`.
+        A str is the filename of a NetCDF file, created or overwritten with
+        the first grid, to which each later grid is appended as a new time
+        step. A function takes the filename of the
+        radar file and returns the filename to which the grid is written.
+        None does not write the grids.
+    write_kwargs : dict or None
+        Additional arguments passed to :py:func:`pyart.io.write_grid`.
+    prefetch : bool
+        True to read the next file in a background thread while the current
+        radar is being mapped.
+
+    Yields
+    ------
+    grid : Grid
+        Grid of each radar file, in the order of filenames.
+
+    """
+    if reader is None:
+        reader = read
+    if write_kwargs is None:
+        write_kwargs = {}
+    filenames = iter(filenames)
+
+    def read_next():
+        """ Read the next file, returning the filename and radar. """
+        for filename in filenames:
+            return filename, reader(filename)
+        return None
+
+    # the first grid written to a single output file replaces any existing
+    # file, later grids are appended to it.
+    append = False
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if prefetch:
+            next_read = executor.submit(read_next)
+        while True:
+            if prefetch:
+                filename_and_radar = next_read.result()
+                if filename_and_radar is not None:
+                    next_read = executor.submit(read_next)
+            else:
+                filename_and_radar = read_next()
+            if filename_and_radar is None:
+                break
+            filename, radar = filename_and_radar
+            del filename_and_radar
+
+            if gatefilter_func is not None:
+                kwargs['gatefilters'] = gatefilter_func(radar)
+            grid = grid_from_radars(radar, grid_shape, grid_limits, **kwargs)
+            del radar
+
+            if isinstance(output, str):
+                write_grid(output, grid, append=append, **write_kwargs)
+                append = True
+            elif output is not None:
+                write_grid(output(filename), grid, **write_kwargs)
+            yield grid
+            del grid
+
+
 def _unify_times_for_radars(radars):
     """ Return unified start times and units for a number of radars. """
     dates = [netCDF4.num2date(radar.time['data'][0], radar.time['units'])
@@ -202,11 +314,19 @@ class NNLocator:
         Algorithm used to compute the nearest neigbors. 'kd_tree' uses a
         k-d tree.
 
+    Attributes
+    ----------
+    geometry : dict or None
+        Projection parameters, grid origin altitude and radar locations used
+        to find the indexed gate locations, set by
+        :py:func:`build_nn_locator`. None when unknown.
+
     """
 
     def __init__(self, data, leafsize=10, algorithm='kd_tree'):
         """ initalize. """
         self._algorithm = algorithm
+        self.geometry = None
 
         if algorithm == 'kd_tree':
             self.tree = cKDTree(data, leafsize=leafsize)
@@ -240,6 +360,250 @@ class NNLocator:
 
             return ind, dist
 
+    def find_neighbors_and_dists_batch(self, q, r, include=None):
+        """
+        Find all neighbors and distances for a number of points.
+
+        Parameters
+        ----------
+        q : array, (n_points, n_dimensions)
+            Points to query.
+        r : array, (n_points, )
+            Distance within which neighbors are returned for each point.
+        include : array of bools, (n_samples, ) or None
+            True for the indexed points which can be returned as neighbors.
+            None returns all indexed points.
+
+        Returns
+        -------
+        ind : array of intergers
+            Indices of the neighbors of all points.
+        dist : array of floats
+            Distances to the neighbors of all points.
+        indptr : array of integers
+            Offsets of the neighbors of each point, the neighbors of point i
+            are ind[indptr[i]:indptr[i + 1]].
+
+        """
+        if self._algorithm == 'kd_tree':
+            ind, indptr = self.tree.query_ball_points(q, r)
+            if include is not None:
+                keep = include[ind]
+                ind = ind[keep]
+                indptr = np.append(0, np.cumsum(keep))[indptr]
+            counts = np.diff(indptr)
+            q_neighbor = np.repeat(np.asarray(q, dtype=np.float64), counts,
+                                   axis=0)
+            dist = scipy.spatial.minkowski_distance(
+                q_neighbor, self.tree.data[ind])
+            return ind, dist, indptr
+
+    def save(self, path):
+        """
+        Save the locator to a directory.
+
+        The indexed points and the structure of the tree are saved as NumPy
+        .npy files which can be memory-mapped when loaded, the geometry is
+        saved as a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            Directory in which the locator is saved, created if it does not
+            exist.
+
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        indices, nodes, splits = self.tree.get_tree_arrays()
+        arrays = {'data': self.tree.data, 'indices': indices,
+                  'nodes': nodes, 'splits': splits,
+                  'mins': self.tree.mins, 'maxes': self.tree.maxes,
+                  'leafsize': np.array(self.tree.leafsize)}
+        for name, array in arrays.items():
+            np.save(os.path.join(path, name + '.npy'), array)
+        if self.geometry is not None:
+            with open(os.path.join(path, 'geometry.json'), 'w') as f:
+                json.dump(self.geometry, f)
+
+
+def build_nn_locator(radars, grid_origin=None, grid_origin_alt=None,
+                     grid_projection=None, leafsize=10, algorithm='kd_tree'):
+    """
+    Build a neighbor locator over the gates of one or more radars.
+
+    The locator indexes the locations of all gates, no gates are filtered,
+    and can be passed to :py:func:`map_to_grid` to map volumes collected
+    with the same scan geometry without building a new locator. Locators
+    can be saved to disk using :py:func:`NNLocator.save` and loaded with
+    :py:func:`load_nn_locator`.
+
+    Parameters not defined below are identical to those in
+    :py:func:`map_to_grid`.
+
+    Parameters
+    ----------
+    radars : Radar or tuple of Radar objects.
+        Radar objects whose gates are indexed.
+
+    Returns
+    -------
+    nnlocator : NNLocator
+        Neighbor locator over the gates of all radars, ordered by radar,
+        ray and gate.
+
+    """
+    # make a tuple if passed a radar object as the first argument
+    if isinstance(radars, Radar):
+        radars = (radars, )
+
+    skip_transform = False
+    if len(radars) == 1 and grid_origin_alt is None and grid_origin is None:
+        skip_transform = True
+
+    projparams, grid_origin_alt = _find_projparams_and_origin_alt(
+        radars, grid_origin, grid_origin_alt, grid_projection)
+    gate_locations = []
+    for radar in radars:
+        gate_locations.append(np.column_stack([
+            loc.ravel() for loc in _find_gate_locations(
+                radar, projparams, grid_origin_alt, skip_transform)]))
+    nnlocator = NNLocator(np.concatenate(gate_locations), leafsize=leafsize,
+                          algorithm=algorithm)
+    nnlocator.geometry = _nn_locator_geometry(
+        radars, projparams, grid_origin_alt, skip_transform)
+    return nnlocator
+
+
+def load_nn_locator(path, mmap_mode='r'):
+    """
+    Load a neighbor locator from a directory.
+
+    Parameters
+    ----------
+    path : str
+        Directory in which the locator was saved using
+        :py:func:`NNLocator.save`.
+    mmap_mode : None or str
+        Mode used to memory-map the indexed points and the tree, see
+        :py:func:`numpy.load`. None reads them into memory.
+
+    Returns
+    -------
+    nnlocator : NNLocator
+        Locator loaded from the directory.
+
+    """
+    arrays = dict(
+        (name, np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode))
+        for name in ['data', 'indices', 'nodes', 'splits', 'mins', 'maxes',
+                     'leafsize'])
+    nnlocator = NNLocator.__new__(NNLocator)
+    nnlocator._algorithm = 'kd_tree'
+    nnlocator.tree = cKDTree.from_tree_arrays(
+        arrays['data'], arrays['indices'], arrays['nodes'], arrays['splits'],
+        int(arrays['leafsize']), arrays['mins'], arrays['maxes'])
+    nnlocator.geometry = None
+    geometry_file = os.path.join(path, 'geometry.json')
+    if os.path.exists(geometry_file):
+        with open(geometry_file) as f:
+            nnlocator.geometry = json.load(f)
+    return nnlocator
+
+
+def _nn_locator_geometry(radars, projparams, grid_origin_alt,
+                         skip_transform):
+    """
+    Return a JSON serializable description of the geometry used to find the
+    gate locations of a neighbor locator.
+    """
+    radar_locations = []
+    for radar in radars:
+        radar_locations.append([
+            float(np.mean(radar.latitude['data'])),
+            float(np.mean(radar.longitude['data'])),
+            float(np.mean(radar.altitude['data']))])
+    projparams = dict(
+        (key, value.item() if isinstance(value, np.generic) else value)
+        for key, value in projparams.items())
+    return {'projparams': projparams,
+            'grid_origin_alt': float(grid_origin_alt),
+            'skip_transform': bool(skip_transform),
+            'radar_locations': radar_locations}
+
+
+def _check_nn_locator_geometry(nnlocator, geometry):
+    """ Raise a ValueError if a locator was built for another geometry. """
+    if nnlocator.geometry is None:
+        return
+    saved = nnlocator.geometry
+    message = 'nnlocator was built for a different %s'
+    saved_params = saved['projparams']
+    params = geometry['projparams']
+    if set(saved_params) != set(params):
+        raise ValueError(message % 'projection')
+    for key, value in params.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if not np.isclose(saved_params[key], value, rtol=0, atol=1e-6):
+                raise ValueError(message % 'projection')
+        elif saved_params[key] != value:
+            raise ValueError(message % 'projection')
+    if saved['skip_transform'] != geometry['skip_transform']:
+        raise ValueError(message % 'projection')
+    if not np.isclose(saved['grid_origin_alt'], geometry['grid_origin_alt'],
+                      rtol=0, atol=1e-6):
+        raise ValueError(message % 'grid origin altitude')
+    if (np.shape(saved['radar_locations']) !=
+            np.shape(geometry['radar_locations']) or
+            not np.allclose(saved['radar_locations'],
+                            geometry['radar_locations'], rtol=0, atol=1e-6)):
+        raise ValueError(message % 'radar location')
+
+
+def _find_projparams_and_origin_alt(radars, grid_origin, grid_origin_alt,
+                                    grid_projection):
+    """ Return the projection parameters and altitude of the grid origin. """
+    # parse the grid_projection
+    if grid_projection is None:
+        grid_projection = {
+            'proj': 'pyart_aeqd', '_include_lon_0_lat_0': True}
+
+    # find the grid origin if not given
+    if grid_origin is None:
+        try:
+            lat = float(radars[0].latitude['data'])
+            lon = float(radars[0].longitude['data'])
+        except TypeError:
+            lat = np.mean(radars[0].latitude['data'])
+            lon = np.mean(radars[0].longitude['data'])
+        grid_origin = (lat, lon)
+    grid_origin_lat, grid_origin_lon = grid_origin
+
+    if grid_origin_alt is None:
+        try:
+            grid_origin_alt = float(radars[0].altitude['data'])
+        except TypeError:
+            grid_origin_alt = np.mean(radars[0].altitude['data'])
+
+    projparams = grid_projection.copy()
+    if projparams.pop('_include_lon_0_lat_0', False):
+        projparams['lon_0'] = grid_origin_lon
+        projparams['lat_0'] = grid_origin_lat
+    return projparams, grid_origin_alt
+
+
+def _find_gate_locations(radar, projparams, grid_origin_alt, skip_transform):
+    """ Return the z, y, x locations of the gates relative to the grid. """
+    if skip_transform:
+        xg_loc = radar.gate_x['data']
+        yg_loc = radar.gate_y['data']
+    else:
+        xg_loc, yg_loc = geographic_to_cartesian(
+            radar.gate_longitude['data'], radar.gate_latitude['data'],
+            projparams)
+    zg_loc = radar.gate_altitude['data'] - grid_origin_alt
+    return zg_loc, yg_loc, xg_loc
+
 
 def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
                 grid_origin_alt=None, grid_projection=None,
@@ -248,7 +612,8 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
                 copy_field_data=True, algorithm='kd_tree', leafsize=10.,
                 roi_func='dist_beam', constant_roi=None,
                 z_factor=0.05, xy_factor=0.02, min_radius=500.0,
-                h_factor=1.0, nb=1.5, bsp=1.0, **kwargs):
+                h_factor=1.0, nb=1.5, bsp=1.0, n_workers=1, nnlocator=None,
+                **kwargs):
     """
     Map one or more radars to a Cartesian grid.
 
@@ -367,6 +732,25 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
         to store the tree. The optimal value depends on the nature of the
         problem. This value should only effect the speed of the gridding,
         not the results.
+    n_workers : int
+        Number of processes used to map the grid points. The grid is split
+        into slabs of z-levels, or of rows within a z-level when there are
+        fewer levels than workers, which are mapped by a pool of forked
+        worker processes. The neighbor lookup tree and field data are shared
+        with the workers rather than copied and the results are identical to
+        those from a single process. Only available on platforms which can
+        fork processes, elsewhere the grid is mapped by a single process.
+    nnlocator : NNLocator or None
+        Neighbor locator over the locations of all gates in the radars,
+        created by :py:func:`build_nn_locator` or :py:func:`load_nn_locator`
+        using radars with the same scan geometry and the same grid origin
+        and projection. The gate locations stored in the locator are used
+        and gates excluded from the interpolation are removed when
+        neighbors are found. None, the default, builds a locator over the
+        included gates, the algorithm and leafsize parameters are only used
+        in this case. A ValueError is raised when the number of gates, the
+        projection, the grid origin altitude or the radar locations differ
+        from those recorded in the locator.
 
     Returns
     -------
@@ -406,27 +790,8 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
         raise ValueError('unknown algorithm: %s' % algorithm)
     badval = get_fillvalue()
 
-    # parse the grid_projection
-    if grid_projection is None:
-        grid_projection = {
-            'proj': 'pyart_aeqd', '_include_lon_0_lat_0': True}
-
-    # find the grid origin if not given
-    if grid_origin is None:
-        try:
-            lat = float(radars[0].latitude['data'])
-            lon = float(radars[0].longitude['data'])
-        except TypeError:
-            lat = np.mean(radars[0].latitude['data'])
-            lon = np.mean(radars[0].longitude['data'])
-        grid_origin = (lat, lon)
-    grid_origin_lat, grid_origin_lon = grid_origin
-
-    if grid_origin_alt is None:
-        try:
-            grid_origin_alt = float(radars[0].altitude['data'])
-        except TypeError:
-            grid_origin_alt = np.mean(radars[0].altitude['data'])
+    projparams, grid_origin_alt = _find_projparams_and_origin_alt(
+        radars, grid_origin, grid_origin_alt, grid_projection)
 
     # fields which should be mapped, None for fields which are in all radars
     if fields is None:
@@ -441,10 +806,18 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
     ngates_per_radar = [r.fields[fields[0]]['data'].size for r in radars]
     total_gates = np.sum(ngates_per_radar)
     gate_offset = np.cumsum([0] + ngates_per_radar)
+    if nnlocator is not None and nnlocator.tree.n != total_gates:
+        raise ValueError(
+            'nnlocator does not match the radars, it locates %d gates, the '
+            'radars have %d gates' % (nnlocator.tree.n, total_gates))
+    if nnlocator is not None:
+        _check_nn_locator_geometry(nnlocator, _nn_locator_geometry(
+            radars, projparams, grid_origin_alt, skip_transform))
 
     # create arrays to hold the gate locations and indicators if the gate
     # should be included in the interpolation.
-    gate_locations = np.ma.empty((total_gates, 3), dtype=np.float64)
+    if nnlocator is None:
+        gate_locations = np.ma.empty((total_gates, 3), dtype=np.float64)
     include_gate = np.ones((total_gates), dtype=np.bool)
 
     offsets = []    # offsets from the grid origin, in meters, for each radar
@@ -465,11 +838,6 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
         # in the NNLocator, the filtered_gates_per_radar list records this
         filtered_gates_per_radar = []
 
-    projparams = grid_projection.copy()
-    if projparams.pop('_include_lon_0_lat_0', False):
-        projparams['lon_0'] = grid_origin_lon
-        projparams['lat_0'] = grid_origin_lat
-
     # loop over the radars finding gate locations, field data, and offset
     for iradar, (radar, gatefilter) in enumerate(zip(radars, gatefilters)):
 
@@ -483,22 +851,20 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
             z_disp = np.mean(radar.altitude['data']) - grid_origin_alt
             offsets.append((z_disp, np.mean(y_disp), np.mean(x_disp)))
 
-        # calculate cartesian locations of gates
-        if skip_transform:
-            xg_loc = radar.gate_x['data']
-            yg_loc = radar.gate_y['data']
-        else:
-            xg_loc, yg_loc = geographic_to_cartesian(
-                radar.gate_longitude['data'], radar.gate_latitude['data'],
-                projparams)
-        zg_loc = radar.gate_altitude['data'] - grid_origin_alt
-
-        # add gate locations to gate_locations array
+        # calculate cartesian locations of gates and add them to the
+        # gate_locations array
         start, end = gate_offset[iradar], gate_offset[iradar + 1]
-        gate_locations[start:end, 0] = zg_loc.flatten()
-        gate_locations[start:end, 1] = yg_loc.flatten()
-        gate_locations[start:end, 2] = xg_loc.flatten()
-        del xg_loc, yg_loc
+        if nnlocator is None:
+            zg_loc, yg_loc, xg_loc = _find_gate_locations(
+                radar, projparams, grid_origin_alt, skip_transform)
+            gate_locations[start:end, 0] = zg_loc.flatten()
+            gate_locations[start:end, 1] = yg_loc.flatten()
+            gate_locations[start:end, 2] = xg_loc.flatten()
+            del xg_loc, yg_loc
+        else:
+            # the gate locations are stored in the locator
+            zg_loc = nnlocator.tree.data[start:end, 0].reshape(
+                radar.fields[fields[0]]['data'].shape)
 
         # determine which gates should be included in the interpolation
         gflags = zg_loc < toa      # include only those below toa
@@ -554,8 +920,14 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
             lookup[l_start:l_end] += (total_gates * i - gates_before)
 
     # populate the nearest neighbor locator with the filtered gate locations
-    nnlocator = NNLocator(gate_locations[include_gate], algorithm=algorithm,
-                          leafsize=leafsize)
+    # or find the filtered gate number of the gates in the given locator.
+    if nnlocator is None:
+        nnlocator = NNLocator(gate_locations[include_gate],
+                              algorithm=algorithm, leafsize=leafsize)
+        locator_include = None
+    else:
+        locator_include = include_gate
+        filtered_gate_number = np.cumsum(include_gate) - 1
 
     # unpack the grid parameters
     nz, ny, nx = grid_shape
@@ -577,6 +949,8 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
     else:
         x_step = (x_stop - x_start) / (nx - 1.)
 
+    # the built in RoI functions can be evaluated on arrays of grid points
+    vectorized_roi = not hasattr(roi_func, '__call__')
     if not hasattr(roi_func, '__call__'):
         if constant_roi is not None:
             roi_func = 'constant'
@@ -595,67 +969,140 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
 
     # create array to hold interpolated grid data and roi if requested
     grid_data = np.ma.empty((nz, ny, nx, nfields), dtype=np.float64)
+    grid_data.mask = np.ma.make_mask_none(grid_data.shape)
     grid_data.set_fill_value(badval)
 
     if map_roi:
         roi = np.empty((nz, ny, nx), dtype=np.float64)
 
-    # interpolate field values for each point in the grid
-    for iz, iy, ix in np.ndindex(nz, ny, nx):
+    n_workers = max(int(n_workers), 1)
+    if n_workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        warnings.warn('n_workers requires processes to be forked, mapping '
+                      'the grid using a single process', RuntimeWarning)
+        n_workers = 1
 
-        # calculate the grid point
+    npoints = nz * ny * nx
+    if n_workers == 1:
+        flat_grid_data = grid_data.data.reshape(-1, nfields)
+        flat_grid_mask = grid_data.mask.reshape(-1, nfields)
+        if map_roi:
+            flat_roi = roi.reshape(-1)
+    else:
+        # the workers write into memory which is shared with this process
+        flat_grid_data = _shared_empty((npoints, nfields), np.float64)
+        flat_grid_mask = _shared_empty((npoints, nfields), np.bool_)
+        if map_roi:
+            flat_roi = _shared_empty((npoints, ), np.float64)
+
+    weighting_function = weighting_function.upper()
+    if weighting_function == 'BARNES':
+        warnings.warn("Barnes weighting function is deprecated."
+                      " Please use Barnes 2 to be consistent with"
+                      " Pauley and Wu 1990.", DeprecationWarning)
+
+    def map_grid_points(bounds):
+        """ Map the grid points in the flat index range given by bounds. """
+        # interpolate field values for blocks of grid points, the radius of
+        # influence, neighbors and weights of all points in a block are
+        # found using array operations.
+        for start in range(bounds[0], bounds[1], _MAP_TO_GRID_BLOCK_SIZE):
+            end = min(start + _MAP_TO_GRID_BLOCK_SIZE, bounds[1])
+            map_grid_block(start, end)
+
+    def map_grid_block(start, end):
+        """ Map the grid points from start to end. """
+        # calculate the grid points
+        iz, iy, ix = np.unravel_index(np.arange(start, end), (nz, ny, nx))
         x = x_start + x_step * ix
         y = y_start + y_step * iy
         z = z_start + z_step * iz
-        r = roi_func(z, y, x)
+        if vectorized_roi:
+            r = np.broadcast_to(roi_func(z, y, x), z.shape)
+        else:
+            r = np.array([roi_func(*point) for point in zip(z, y, x)],
+                         dtype=np.float64)
         if map_roi:
-            roi[iz, iy, ix] = r
+            flat_roi[start:end] = r
 
         # find neighbors and distances
-        ind, dist = nnlocator.find_neighbors_and_dists((z, y, x), r)
-
+        ind, dist, indptr = nnlocator.find_neighbors_and_dists_batch(
+            np.column_stack((z, y, x)), r, locator_include)
+        if locator_include is not None:
+            ind = filtered_gate_number[ind]
+        counts = np.diff(indptr)
+
+        # when there are no neighbors, mark the grid point as bad
+        has_neighbors = counts > 0
+        block_data = flat_grid_data[start:end]
+        block_mask = flat_grid_mask[start:end]
+        block_data[~has_neighbors] = badval
+        block_mask[~has_neighbors] = True
         if len(ind) == 0:
-            # when there are no neighbors, mark the grid point as bad
-            grid_data[iz, iy, ix] = np.ma.masked
-            grid_data.data[iz, iy, ix] = badval
-            continue
+            return
 
         # find the field values for all neighbors
         if copy_field_data:
             # copy_field_data == True, a slice will get the field data.
-            nn_field_data = filtered_field_data[ind]
+            nn_field_data = filtered_field_data.data[ind]
+            nn_field_mask = np.ma.getmask(filtered_field_data)
+            if nn_field_mask is not np.ma.nomask:
+                nn_field_mask = nn_field_mask[ind]
         else:
             # copy_field_data == False, use the lookup table to find the
             # radar numbers and gate numbers for the neighbors. Then
             # use the _load_nn_field_data function to load this data from
             # the field data object array. This is done in Cython for speed.
             r_nums, e_nums = divmod(lookup[ind], total_gates)
-            npoints = r_nums.size
+            nn_points = r_nums.size
             r_nums = r_nums.astype(np.intc)
             e_nums = e_nums.astype(np.intc)
-            nn_field_data = np.empty((npoints, nfields), np.float64)
-            _load_nn_field_data(field_data_objs, nfields, npoints, r_nums,
+            nn_field_data = np.empty((nn_points, nfields), np.float64)
+            _load_nn_field_data(field_data_objs, nfields, nn_points, r_nums,
                                 e_nums, nn_field_data)
+            nn_field_mask = np.ma.nomask
 
-        # preforms weighting of neighbors.
+        # preforms weighting of neighbors, the weights of the neighbors of
+        # each grid point are reduced over the segments given by indptr.
         dist2 = dist * dist
-        r2 = r * r
-
-        if weighting_function.upper() == 'NEAREST':
-            value = nn_field_data[np.argmin(dist2)]
+        r2 = np.repeat(r * r, counts)
+        seg_starts = indptr[:-1][has_neighbors]
+
+        if weighting_function == 'NEAREST':
+            nearest = _segment_argmin(dist2, seg_starts)
+            if nn_field_mask is not np.ma.nomask:
+                nn_field_mask = nn_field_mask[nearest]
+            value = np.ma.array(nn_field_data[nearest], mask=nn_field_mask)
         else:
-            if weighting_function.upper() == 'CRESSMAN':
+            if weighting_function == 'CRESSMAN':
                 weights = (r2 - dist2) / (r2 + dist2)
-            elif weighting_function.upper() == 'BARNES':
-                warnings.warn("Barnes weighting function is deprecated."
-                              " Please use Barnes 2 to be consistent with"
-                              " Pauley and Wu 1990.", DeprecationWarning)
+            elif weighting_function == 'BARNES':
                 weights = np.exp(-dist2 / (2.0 * r2)) + 1e-5
-            elif weighting_function.upper() == 'BARNES2':
+            elif weighting_function == 'BARNES2':
                 weights = np.exp(-dist2 / (r2/4)) + 1e-5
-            value = np.ma.average(nn_field_data, weights=weights, axis=0)
+            value = _segment_average(
+                nn_field_data, nn_field_mask, weights, seg_starts)
 
-        grid_data[iz, iy, ix] = value
+        block_data[has_neighbors] = value.data
+        block_mask[has_neighbors] = np.ma.getmaskarray(value)
+
+    if n_workers == 1:
+        map_grid_points((0, npoints))
+    else:
+        # the workers are forked after map_grid_points is made available to
+        # them, the tree and field data are shared not copied.
+        global _worker_map_grid_points
+        _worker_map_grid_points = map_grid_points
+        try:
+            slab_bounds = _find_slab_bounds(grid_shape, n_workers)
+            with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+                list(pool.imap_unordered(
+                    _map_grid_points_in_worker, slab_bounds))
+        finally:
+            _worker_map_grid_points = None
+        grid_data.data.reshape(-1, nfields)[:] = flat_grid_data
+        grid_data.mask.reshape(-1, nfields)[:] = flat_grid_mask
+        if map_roi:
+            roi.reshape(-1)[:] = flat_roi
 
     # create and return the grid dictionary
     grids = dict([(f, grid_data[..., i]) for i, f in enumerate(fields)])
@@ -664,6 +1111,67 @@ def map_to_grid(radars, grid_shape, grid_limits, grid_origin=None,
     return grids
 
 
+def _map_grid_points_in_worker(bounds):
+    """ Map a range of grid points in a map_to_grid worker process. """
+    _worker_map_grid_points(bounds)
+
+
+def _find_slab_bounds(grid_shape, n_workers):
+    """
+    Return the flat index ranges of the slabs mapped by the workers.
+
+    Each z-level is a slab, when there are fewer levels than workers the
+    levels are split into bands of rows so that all workers are used.
+    """
+    nz, ny, nx = grid_shape
+    nbands = min(ny, -(-n_workers // nz))
+    row_bounds = np.linspace(0, ny, nbands + 1).astype(int)
+    return [((iz * ny + row_start) * nx, (iz * ny + row_end) * nx)
+            for iz in range(nz)
+            for row_start, row_end in zip(row_bounds[:-1], row_bounds[1:])]
+
+
+def _shared_empty(shape, dtype):
+    """ Return an empty array in memory which is shared with forks. """
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    buf = mmap.mmap(-1, max(nbytes, 1))
+    return np.frombuffer(buf, dtype=dtype, count=int(np.prod(shape))).reshape(
+        shape)
+
+
+def _segment_average(data, mask, weights, starts):
+    """
+    Weighted average over segments of the rows of data.
+
+    Segments begin at the indices in starts and end at the next start, the
+    result for each segment is equal to that of np.ma.average with axis=0.
+    """
+    wgt = np.broadcast_to(weights[:, np.newaxis], data.shape)
+    if mask is np.ma.nomask:
+        scl = np.add.reduceat(weights, starts)[:, np.newaxis]
+        avg = np.add.reduceat(data * wgt, starts)
+        return np.ma.array(avg) / np.ma.array(scl)
+
+    # masked values do not contribute to the weighted sum, segments where
+    # all values are masked are masked.
+    wgt = wgt * ~mask
+    all_masked = np.logical_and.reduceat(mask, starts)
+    scl = np.ma.array(np.add.reduceat(wgt, starts), mask=all_masked)
+    avg = np.add.reduceat(np.where(mask, 0., data * wgt), starts)
+    return np.ma.array(avg, mask=all_masked) / scl
+
+
+def _segment_argmin(values, starts):
+    """ Return the index of the first minimum in each segment of values. """
+    counts = np.diff(np.append(starts, len(values)))
+    seg_min = np.minimum.reduceat(values, starts)
+    candidates = np.flatnonzero(values == np.repeat(seg_min, counts))
+    segment = np.repeat(np.arange(len(starts)), counts)[candidates]
+    first = np.ones(len(candidates), dtype=bool)
+    first[1:] = segment[1:] != segment[:-1]
+    return candidates[first]
+
+
 # Radius of Influence (RoI) functions
 
 
@@ -743,11 +1251,14 @@ def _gen_roi_func_dist(z_factor, xy_factor, min_radius, offsets):
 
     def roi(zg, yg, xg):
         """ dist radius of influence function. """
+        # zg, yg, xg may be arrays, the radars are along the first axis
+        shape = (-1, ) + (1, ) * np.ndim(zg)
         r = np.maximum(
-            z_factor * (zg - zg_off) +
-            xy_factor * np.sqrt((xg - xg_off)**2 + (yg - yg_off)**2),
+            z_factor * (zg - zg_off.reshape(shape)) +
+            xy_factor * np.sqrt((xg - xg_off.reshape(shape))**2 +
+                                (yg - yg_off.reshape(shape))**2),
             min_radius)
-        return min(r)
+        return r.min(axis=0)
 
     return roi
 
@@ -799,10 +1310,13 @@ def _gen_roi_func_dist_beam(h_factor, nb, bsp, min_radius, offsets):
 
     def roi(zg, yg, xg):
         """ dist_beam radius of influence function. """
+        # zg, yg, xg may be arrays, the radars are along the first axis
+        shape = (-1, ) + (1, ) * np.ndim(zg)
         r = np.maximum(
-            h_factor * ((zg - zg_off) / 20.0) +
-            np.sqrt((yg - yg_off)**2 + (xg - xg_off)**2) *
+            h_factor * ((zg - zg_off.reshape(shape)) / 20.0) +
+            np.sqrt((yg - yg_off.reshape(shape))**2 +
+                    (xg - xg_off.reshape(shape))**2) *
             np.tan(nb * bsp * np.pi / 180.0), min_radius)
-        return min(r)
+        return r.min(axis=0)
 
     return roi
@@ -5,6 +5,7 @@ from numpy.testing import assert_almost_equal
 import pytest
 
 import pyart
+from pyart.map import gates_to_grid
 
 EXPECTED_CENTER_SLICE = [40, 30, 20, 10, 0, 0, 10, 20, 30, 40]
 
@@ -52,6 +53,66 @@ def test_map_to_grid_default():
     assert_almost_equal(np.round(center_slice), EXPECTED_CENTER_SLICE)
 
 
+@pytest.mark.parametrize('weighting_function',
+                         ['Barnes2', 'Cressman', 'Nearest'])
+def test_map_to_grid_n_threads(weighting_function):
+    radar = pyart.testing.make_target_radar()
+    radar.fields['reflectivity']['data'] = np.ma.masked_greater(
+        radar.fields['reflectivity']['data'], 35.)
+    grids = pyart.map.map_gates_to_grid(
+        (radar,), weighting_function=weighting_function,
+        **COMMON_MAP_TO_GRID_ARGS)
+    grids_threaded = pyart.map.map_gates_to_grid(
+        (radar,), weighting_function=weighting_function, n_threads=4,
+        **COMMON_MAP_TO_GRID_ARGS)
+    assert np.all(grids['reflectivity'].mask ==
+                  grids_threaded['reflectivity'].mask)
+    assert_almost_equal(grids['reflectivity'],
+                        grids_threaded['reflectivity'], 4)
+    assert_almost_equal(grids['ROI'], grids_threaded['ROI'])
+
+
+def test_map_to_grid_n_threads_limited_by_rays():
+    # no more grids are allocated than there are rays to map
+    gatemappers, grid_sums, grid_wsums = gates_to_grid._make_gatemappers(
+        (3, 9, 10), (0., 0., 0.), (1., 1., 1.), 1, 16, 2)
+    assert len(gatemappers) == len(grid_sums) == len(grid_wsums) == 2
+
+    radar = pyart.testing.make_empty_ppi_radar(50, 2, 1)
+    radar.add_field('reflectivity', {'data': np.ones((2, 50))})
+    grids = pyart.map.map_gates_to_grid(
+        (radar,), weighting_function='Barnes2', **COMMON_MAP_TO_GRID_ARGS)
+    grids_threaded = pyart.map.map_gates_to_grid(
+        (radar,), weighting_function='Barnes2', n_threads=16,
+        **COMMON_MAP_TO_GRID_ARGS)
+    assert np.all(grids['reflectivity'].mask ==
+                  grids_threaded['reflectivity'].mask)
+    assert_almost_equal(grids['reflectivity'],
+                        grids_threaded['reflectivity'], 4)
+
+
+def test_map_to_grid_field_dtypes():
+    radar = pyart.testing.make_target_radar()
+    data = radar.fields['reflectivity']['data']
+    radar.add_field_like('reflectivity', 'ref_float32',
+                         np.ma.masked_greater(data.astype('float32'), 35.))
+    radar.add_field_like('reflectivity', 'ref_float64',
+                         np.ma.masked_greater(data.astype('float64'), 35.))
+    radar.add_field_like('reflectivity', 'ref_int16',
+                         np.ma.masked_greater(data.astype('int16'), 35))
+    radar.add_field_like('reflectivity', 'ref_nomask',
+                         np.asfortranarray(data.astype('float64')))
+    grids = pyart.map.map_gates_to_grid(
+        (radar,), weighting_function='Barnes2', **COMMON_MAP_TO_GRID_ARGS)
+
+    assert np.all(grids['ref_float32'] == grids['ref_float64'])
+    assert np.all(grids['ref_float32'].mask == grids['ref_float64'].mask)
+    assert np.all(grids['ref_float32'] == grids['ref_int16'])
+    assert grids['ref_float32'].max() <= 35.
+    assert grids['ref_nomask'].max() > 35.
+    assert_almost_equal(grids['ref_nomask'], grids['reflectivity'])
+
+
 def test_map_to_grid_cressman():
     radar = pyart.testing.make_target_radar()
     grids = pyart.map.map_gates_to_grid(
@@ -161,6 +222,135 @@ def test_map_to_grid_errors():
                   (1, 1, 1), ((-1, 1), (-1, 1), (-1, 1)))
 
 
+OPERATOR_ARGS = {
+    'grid_shape': (3, 9, 10),
+    'grid_limits': ((-400.0, 400.0), (-900.0, 900.0), (-900, 900)),
+    'roi_func': 'constant',
+    'constant_roi': 30.,
+    'weighting_function': 'Barnes2', }
+
+
+def test_gates_to_grid_operator():
+    radar = pyart.testing.make_target_radar()
+    operator = pyart.map.build_gates_to_grid_operator(radar, **OPERATOR_ARGS)
+    assert operator.matrix.shape == (270, 360 * 50)
+    assert operator.radar_shapes == [(360, 50)]
+
+    grids = operator.map_gates_to_grid(radar)
+    center_slice = grids['reflectivity'][1, 4, :]
+    assert_almost_equal(np.round(center_slice), EXPECTED_CENTER_SLICE)
+    assert np.all(grids['ROI'] == 30.)
+
+    expected = pyart.map.map_gates_to_grid(radar, **OPERATOR_ARGS)
+    assert_almost_equal(grids['reflectivity'], expected['reflectivity'])
+
+
+def test_gates_to_grid_operator_above_toa():
+    # gates above toa are mapped by both the operator and map_gates_to_grid
+    radar = pyart.testing.make_target_radar()
+    operator = pyart.map.build_gates_to_grid_operator(
+        radar, toa=0., **OPERATOR_ARGS)
+    grids = operator.map_gates_to_grid(radar)
+    expected = pyart.map.map_gates_to_grid(radar, toa=0., **OPERATOR_ARGS)
+    assert np.array_equal(np.ma.getmaskarray(grids['reflectivity']),
+                          np.ma.getmaskarray(expected['reflectivity']))
+    assert_almost_equal(grids['reflectivity'], expected['reflectivity'])
+
+
+def test_gates_to_grid_operator_gatefilter():
+    radar = pyart.testing.make_target_radar()
+    radar.fields['reflectivity']['data'][0:100, 25] = 99999.0
+    operator = pyart.map.build_gates_to_grid_operator(radar, **OPERATOR_ARGS)
+
+    gatefilter = pyart.filters.GateFilter(radar)
+    grids = operator.map_gates_to_grid(radar, gatefilters=gatefilter)
+    assert grids['reflectivity'].max() > 41.0
+
+    # excluded and masked gates are removed by reweighting
+    gatefilter.exclude_above('reflectivity', 41.0)
+    grids = operator.map_gates_to_grid(radar, gatefilters=gatefilter)
+    expected = pyart.map.map_gates_to_grid(
+        radar, gatefilters=gatefilter, **OPERATOR_ARGS)
+    assert grids['reflectivity'].max() < 41.0
+    assert_almost_equal(grids['reflectivity'], expected['reflectivity'])
+
+    radar.fields['reflectivity']['data'] = np.ma.masked_greater(
+        radar.fields['reflectivity']['data'], 41.0)
+    grids = operator.map_gates_to_grid(radar, map_roi=False)
+    assert grids['reflectivity'].max() < 41.0
+    assert 'ROI' not in grids
+
+
+def test_gates_to_grid_operator_save_load():
+    radar = pyart.testing.make_target_radar()
+    operator = pyart.map.build_gates_to_grid_operator(radar, **OPERATOR_ARGS)
+    with pyart.testing.InTemporaryDirectory():
+        operator.save('operator.npz')
+        operator2 = pyart.map.load_gates_to_grid_operator('operator.npz')
+    assert operator2.grid_shape == (3, 9, 10)
+    assert operator2.radar_shapes == [(360, 50)]
+    assert (operator2.matrix != operator.matrix).nnz == 0
+    grids = operator2.map_gates_to_grid(radar)
+    center_slice = grids['reflectivity'][1, 4, :]
+    assert_almost_equal(np.round(center_slice), EXPECTED_CENTER_SLICE)
+
+
+def test_gates_to_grid_operator_errors():
+    radar = pyart.testing.make_target_radar()
+    pytest.raises(
+        ValueError, pyart.map.build_gates_to_grid_operator, radar,
+        (3, 9, 10), ((-400.0, 400.0), (-900.0, 900.0), (-900, 900)),
+        weighting_function='Nearest')
+    operator = pyart.map.build_gates_to_grid_operator(
+        radar, map_roi=False, **OPERATOR_ARGS)
+    pytest.raises(ValueError, operator.map_gates_to_grid, radar)
+    radar2 = pyart.testing.make_empty_ppi_radar(50, 36, 1)
+    pytest.raises(ValueError, operator.map_gates_to_grid, radar2)
+
+
+def test_gates_to_grid_mosaic():
+    radar = pyart.testing.make_target_radar()
+    radar2 = pyart.testing.make_target_radar()
+    radar2.fields['reflectivity']['data'] = (
+        radar2.fields['reflectivity']['data'] + 10.)
+    mosaic = pyart.map.GatesToGridMosaic((radar, radar2), **OPERATOR_ARGS)
+    assert mosaic.nradars == 2
+    assert mosaic.fields == ['reflectivity']
+    grids = mosaic.get_grids()
+    expected = pyart.map.map_gates_to_grid((radar, radar2), **OPERATOR_ARGS)
+    assert_almost_equal(grids['reflectivity'], expected['reflectivity'], 5)
+    assert_almost_equal(grids['ROI'], expected['ROI'])
+
+    # replace the contribution of the second radar
+    radar3 = pyart.testing.make_target_radar()
+    radar3.fields['reflectivity']['data'][0:100, 25] = 99999.0
+    gatefilter = pyart.filters.GateFilter(radar3)
+    gatefilter.exclude_above('reflectivity', 41.0)
+    mosaic.update(1, radar3, gatefilter)
+    grids = mosaic.get_grids(map_roi=False)
+    expected = pyart.map.map_gates_to_grid(
+        (radar, radar3), gatefilters=(False, gatefilter), **OPERATOR_ARGS)
+    assert_almost_equal(grids['reflectivity'], expected['reflectivity'], 5)
+    assert 'ROI' not in grids
+
+    # replacing a volume with itself restores the original mosaic
+    mosaic.update(1, radar)
+    center_slice = mosaic.get_grids()['reflectivity'][1, 4, :]
+    assert_almost_equal(np.round(center_slice), EXPECTED_CENTER_SLICE)
+
+
+def test_gates_to_grid_mosaic_errors():
+    radar = pyart.testing.make_target_radar()
+    pytest.raises(
+        ValueError, pyart.map.GatesToGridMosaic, radar,
+        (3, 9, 10), ((-400.0, 400.0), (-900.0, 900.0), (-900, 900)),
+        weighting_function='Nearest')
+    mosaic = pyart.map.GatesToGridMosaic(radar, **OPERATOR_ARGS)
+    pytest.raises(ValueError, mosaic.update, 1, radar)
+    radar2 = pyart.testing.make_empty_ppi_radar(50, 36, 1)
+    pytest.raises(ValueError, mosaic.update, 0, radar2)
+
+
 def test_grid_from_radars():
     radar = pyart.testing.make_target_radar()
     grid = pyart.map.grid_from_radars((radar,), **COMMON_MAP_TO_GRID_ARGS)
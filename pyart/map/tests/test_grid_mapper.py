@@ -1,5 +1,6 @@
 """ Unit Tests for Py-ART's map/grid_mapper.py module. """
 
+import netCDF4
 import numpy as np
 from numpy.testing import assert_almost_equal
 import pytest
@@ -158,6 +159,144 @@ def test_map_to_grid_tiny_grid():
     assert int(grids['reflectivity'][0]) == 40
 
 
+def test_map_to_grid_batch_matches_point_queries():
+    radar = pyart.testing.make_target_radar()
+    refl = radar.fields['reflectivity']['data']
+    radar.fields['reflectivity']['data'] = np.ma.masked_greater(refl, 30)
+    grid_shape = (3, 9, 10)
+    grid_limits = ((-400.0, 400.0), (-900.0, 900.0), (-900, 900))
+    gate_locations = np.column_stack([
+        radar.gate_z['data'].ravel(), radar.gate_y['data'].ravel(),
+        radar.gate_x['data'].ravel()])
+    nnlocator = pyart.map.grid_mapper.NNLocator(gate_locations)
+    field_data = radar.fields['reflectivity']['data'].reshape(-1)
+    zg, yg, xg = [np.linspace(start, stop, num) for (start, stop), num in
+                  zip(grid_limits, grid_shape)]
+
+    for weighting_function in ['Cressman', 'Barnes2', 'Nearest']:
+        grids = pyart.map.map_to_grid(
+            (radar,), grid_shape, grid_limits, roi_func='constant',
+            constant_roi=150., weighting_function=weighting_function)
+        refl_grid = grids['reflectivity']
+        for iz, iy, ix in np.ndindex(grid_shape):
+            ind, dist = nnlocator.find_neighbors_and_dists(
+                (zg[iz], yg[iy], xg[ix]), 150.)
+            dist2 = dist * dist
+            if len(ind) == 0:
+                value = np.ma.masked
+            elif weighting_function == 'Nearest':
+                value = field_data[ind][np.argmin(dist2)]
+            else:
+                if weighting_function == 'Cressman':
+                    weights = (150. ** 2 - dist2) / (150. ** 2 + dist2)
+                else:
+                    weights = np.exp(-dist2 / (150. ** 2 / 4)) + 1e-5
+                value = np.ma.average(field_data[ind], weights=weights)
+            if value is np.ma.masked:
+                assert refl_grid[iz, iy, ix] is np.ma.masked
+            else:
+                assert_almost_equal(refl_grid[iz, iy, ix], value)
+
+
+def test_map_to_grid_n_workers():
+    radar = pyart.testing.make_target_radar()
+    grids = pyart.map.map_to_grid(
+        (radar,), n_workers=4, **COMMON_MAP_TO_GRID_ARGS)
+    center_slice = grids['reflectivity'][1, 4, :]
+    assert_almost_equal(center_slice, EXPECTED_CENTER_SLICE)
+
+    serial_grids = pyart.map.map_to_grid(
+        (radar,), **COMMON_MAP_TO_GRID_ARGS)
+    assert np.ma.allequal(grids['reflectivity'], serial_grids['reflectivity'])
+    assert_almost_equal(grids['ROI'], serial_grids['ROI'])
+
+
+def test_find_slab_bounds():
+    find_slab_bounds = pyart.map.grid_mapper._find_slab_bounds
+    assert find_slab_bounds((3, 4, 5), 2) == [(0, 20), (20, 40), (40, 60)]
+    assert find_slab_bounds((1, 4, 5), 2) == [(0, 10), (10, 20)]
+    assert find_slab_bounds((1, 2, 5), 8) == [(0, 5), (5, 10)]
+
+
+def test_nnlocator_find_neighbors_and_dists_batch():
+    data = np.random.RandomState(0).uniform(size=(200, 3))
+    nnlocator = pyart.map.grid_mapper.NNLocator(data)
+    q = np.array([[0.5, 0.5, 0.5], [0.1, 0.2, 0.3], [5., 5., 5.]])
+    r = np.array([0.2, 0.3, 0.1])
+    ind, dist, indptr = nnlocator.find_neighbors_and_dists_batch(q, r)
+    assert len(indptr) == 4
+    assert indptr[-1] == len(ind) == len(dist)
+    for i in range(3):
+        ind_i, dist_i = nnlocator.find_neighbors_and_dists(q[i], r[i])
+        assert list(ind[indptr[i]:indptr[i + 1]]) == list(ind_i)
+        assert_almost_equal(dist[indptr[i]:indptr[i + 1]], dist_i)
+
+
+def test_map_to_grid_nnlocator():
+    radar = pyart.testing.make_target_radar()
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_above('reflectivity', 30.)
+    nnlocator = pyart.map.build_nn_locator(radar)
+    assert nnlocator.tree.n == radar.nrays * radar.ngates
+    with pyart.testing.InTemporaryDirectory():
+        nnlocator.save('locator')
+        loaded_nnlocator = pyart.map.load_nn_locator('locator')
+
+    grids = pyart.map.map_to_grid(
+        (radar,), gatefilters=(gatefilter, ), **COMMON_MAP_TO_GRID_ARGS)
+    for copy_field_data in [True, False]:
+        for locator in [nnlocator, loaded_nnlocator]:
+            locator_grids = pyart.map.map_to_grid(
+                (radar,), gatefilters=(gatefilter, ), nnlocator=locator,
+                copy_field_data=copy_field_data, **COMMON_MAP_TO_GRID_ARGS)
+            assert_almost_equal(
+                locator_grids['reflectivity'], grids['reflectivity'])
+            assert np.all(np.ma.getmaskarray(locator_grids['reflectivity']) ==
+                          np.ma.getmaskarray(grids['reflectivity']))
+
+    # locator with a different number of gates
+    pytest.raises(ValueError, pyart.map.map_to_grid, (radar, radar),
+                  nnlocator=nnlocator, **COMMON_MAP_TO_GRID_ARGS)
+
+
+def test_nnlocator_geometry():
+    radar = pyart.testing.make_target_radar()
+    origin = dict(grid_origin=(36.5, -97.5), grid_origin_alt=200.)
+    nnlocator = pyart.map.build_nn_locator(radar, **origin)
+    with pyart.testing.InTemporaryDirectory():
+        nnlocator.save('locator')
+        loaded_nnlocator = pyart.map.load_nn_locator('locator')
+
+        # indices outside of the indexed points are rejected
+        indices = np.load('locator/indices.npy')
+        indices[0] = len(indices)
+        np.save('locator/indices.npy', indices)
+        pytest.raises(ValueError, pyart.map.load_nn_locator, 'locator')
+
+    assert loaded_nnlocator.geometry == nnlocator.geometry
+    for locator in [nnlocator, loaded_nnlocator]:
+        # the geometry the locator was built for
+        pyart.map.map_to_grid((radar, ), nnlocator=locator, **dict(
+            COMMON_MAP_TO_GRID_ARGS, **origin))
+        # a different projection
+        with pytest.raises(ValueError, match='projection'):
+            pyart.map.map_to_grid(
+                (radar, ), nnlocator=locator, grid_projection={'proj': 'lcc'},
+                **dict(COMMON_MAP_TO_GRID_ARGS, **origin))
+        # a different grid origin altitude
+        with pytest.raises(ValueError, match='grid origin altitude'):
+            pyart.map.map_to_grid(
+                (radar, ), nnlocator=locator, grid_origin=(36.5, -97.5),
+                grid_origin_alt=100., **COMMON_MAP_TO_GRID_ARGS)
+
+    # a radar at a different site
+    other_radar = pyart.testing.make_target_radar()
+    other_radar.latitude['data'] = other_radar.latitude['data'] + 1.
+    with pytest.raises(ValueError, match='radar location'):
+        pyart.map.map_to_grid((other_radar, ), nnlocator=nnlocator, **dict(
+            COMMON_MAP_TO_GRID_ARGS, **origin))
+
+
 def test_map_to_grid_errors():
     pytest.raises(ValueError, pyart.map.map_to_grid, (None, ), (1, 1, 1),
                   ((-1, 1), (-1, 1), (-1, 1)),
@@ -211,6 +350,58 @@ def test_grid_from_radars():
     assert grid.nradar == 1
 
 
+def test_grid_from_radar_files():
+    radar = pyart.testing.make_target_radar()
+    filenames = ['radar_%d' % i for i in range(3)]
+    read_filenames = []
+
+    def reader(filename):
+        read_filenames.append(filename)
+        return radar
+
+    def gatefilter_func(radar):
+        gatefilter = pyart.filters.GateFilter(radar)
+        gatefilter.exclude_above('reflectivity', 30.)
+        return gatefilter
+
+    for prefetch in [True, False]:
+        del read_filenames[:]
+        grids = pyart.map.grid_from_radar_files(
+            iter(filenames), reader=reader, gatefilter_func=gatefilter_func,
+            prefetch=prefetch, **COMMON_MAP_TO_GRID_ARGS)
+        count = 0
+        for grid in grids:
+            assert grid.fields['reflectivity']['data'].max() < 30.5
+            count += 1
+        assert count == 3
+        assert read_filenames == filenames
+
+
+def test_grid_from_radar_files_output():
+    radar = pyart.testing.make_target_radar()
+    filenames = ['radar_%d' % i for i in range(3)]
+    with pyart.testing.InTemporaryDirectory():
+        grids = list(pyart.map.grid_from_radar_files(
+            filenames, reader=lambda filename: radar,
+            output=lambda filename: filename + '.nc',
+            **COMMON_MAP_TO_GRID_ARGS))
+        for filename, grid in zip(filenames, grids):
+            saved_grid = pyart.io.read_grid(filename + '.nc')
+            assert_almost_equal(saved_grid.fields['reflectivity']['data'],
+                                grid.fields['reflectivity']['data'])
+
+        # running the pipeline again replaces the file rather than
+        # appending to it
+        for _ in range(2):
+            list(pyart.map.grid_from_radar_files(
+                filenames, reader=lambda filename: radar, output='grids.nc',
+                **COMMON_MAP_TO_GRID_ARGS))
+            dset = netCDF4.Dataset('grids.nc')
+            assert len(dset.dimensions['time']) == 3
+            assert dset.variables['reflectivity'].shape == (3, 3, 9, 10)
+            dset.close()
+
+
 def test_unify_times_for_radars():
     radar1 = pyart.testing.make_target_radar()
     radar2 = pyart.testing.make_target_radar()
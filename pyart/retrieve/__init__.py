@@ -4,6 +4,7 @@ Radar retrievals.
 """
 
 from .kdp_proc import kdp_maesaka, kdp_schneebeli, kdp_vulpiani
+from .kdp_proc import KdpPool
 from .echo_class import steiner_conv_strat, hydroclass_semisupervised
 from .echo_class import get_freq_band
 from .gate_id import map_profile_to_gates, fetch_radar_time_profile
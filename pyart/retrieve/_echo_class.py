@@ -1,4 +1,25 @@
 import numpy as np
+from scipy import signal
+
+from ._echo_steiner import steiner_classify
+
+
+# Upper bounds (exclusive) of the background reflectivity intervals in dBZ
+# and the convective radius in meters of each interval for the convective
+# area relations.
+_CONV_RAD_BINS = {
+    0: ([30., 35., 40., 45.], [1000., 2000., 3000., 4000., 5000.]),
+    1: ([25., 30., 35., 40.], [1000., 2000., 3000., 4000., 5000.]),
+    2: ([20., 25., 30., 35.], [1000., 2000., 3000., 4000., 5000.]),
+    3: ([40., 45., 50., 55.], [0., 1000., 2000., 6000., 8000.]),
+}
+
+# Peakedness for background reflectivities below 0 dBZ and for background
+# reflectivities of 42.43 dBZ or above for the peakedness relations.
+_PEAK_LIMITS = {
+    0: (10., 0.),
+    1: (14., 4.),
+}
 
 
 def _steiner_conv_strat(refl, x, y, dx, dy, intense=42, peak_relation=0,
@@ -12,190 +33,105 @@ def _steiner_conv_strat(refl, x, y, dx, dy, intense=42, peak_relation=0,
     0 = Undefined
     1 = Stratiform
     2 = Convective
+
+    The background reflectivity and the convective core criteria of all grid
+    points are computed with array operations, the classification, which
+    depends on the order grid points are visited in, is done by the compiled
+    steiner_classify.
     """
-    def convective_radius(ze_bkg, area_relation):
-        """
-        Given a mean background reflectivity value, we determine via a step
-        function what the corresponding convective radius would be.
-
-        Higher background reflectivitives are expected to have larger
-        convective influence on surrounding areas, so a larger convective
-        radius would be prescribed.
-        """
-        if area_relation == 0:
-            if ze_bkg < 30:
-                conv_rad = 1000.
-            elif (ze_bkg >= 30) & (ze_bkg < 35.):
-                conv_rad = 2000.
-            elif (ze_bkg >= 35.) & (ze_bkg < 40.):
-                conv_rad = 3000.
-            elif (ze_bkg >= 40.) & (ze_bkg < 45.):
-                conv_rad = 4000.
-            else:
-                conv_rad = 5000.
-
-        if area_relation == 1:
-            if ze_bkg < 25:
-                conv_rad = 1000.
-            elif (ze_bkg >= 25) & (ze_bkg < 30.):
-                conv_rad = 2000.
-            elif (ze_bkg >= 30.) & (ze_bkg < 35.):
-                conv_rad = 3000.
-            elif (ze_bkg >= 35.) & (ze_bkg < 40.):
-                conv_rad = 4000.
-            else:
-                conv_rad = 5000.
-
-        if area_relation == 2:
-            if ze_bkg < 20:
-                conv_rad = 1000.
-            elif (ze_bkg >= 20) & (ze_bkg < 25.):
-                conv_rad = 2000.
-            elif (ze_bkg >= 25.) & (ze_bkg < 30.):
-                conv_rad = 3000.
-            elif (ze_bkg >= 30.) & (ze_bkg < 35.):
-                conv_rad = 4000.
-            else:
-                conv_rad = 5000.
-
-        if area_relation == 3:
-            if ze_bkg < 40:
-                conv_rad = 0.
-            elif (ze_bkg >= 40) & (ze_bkg < 45.):
-                conv_rad = 1000.
-            elif (ze_bkg >= 45.) & (ze_bkg < 50.):
-                conv_rad = 2000.
-            elif (ze_bkg >= 50.) & (ze_bkg < 55.):
-                conv_rad = 6000.
-            else:
-                conv_rad = 8000.
-
-        return conv_rad
-
-    def peakedness(ze_bkg, peak_relation):
-        """
-        Given a background reflectivity value, we determine what the necessary
-        peakedness (or difference) has to be between a grid point's
-        reflectivity and the background reflectivity in order for that grid
-        point to be labeled convective.
-        """
-        if peak_relation == 0:
-            if ze_bkg < 0.:
-                peak = 10.
-            elif (ze_bkg >= 0.) and (ze_bkg < 42.43):
-                peak = 10. - ze_bkg ** 2 / 180.
-            else:
-                peak = 0.
-
-        elif peak_relation == 1:
-            if ze_bkg < 0.:
-                peak = 14.
-            elif (ze_bkg >= 0.) and (ze_bkg < 42.43):
-                peak = 14. - ze_bkg ** 2 / 180.
-            else:
-                peak = 4.
-
-        return peak
-
-    sclass = np.zeros(refl.shape, dtype=int)
-    ny, nx = refl.shape
-
-    for i in range(0, nx):
-        # Get stencil of x grid points within the background radius
-        imin = np.max(np.array([1, (i - bkg_rad / dx)], dtype=int))
-        imax = np.min(np.array([nx, (i + bkg_rad / dx)], dtype=int))
-
-        for j in range(0, ny):
-            # First make sure that the current grid point has not already been
-            # classified. This can happen when grid points within the
-            # convective radius of a previous grid point have also been
-            # classified.
-            if ~np.isnan(refl[j, i]) & (sclass[j, i] == 0):
-                # Get stencil of y grid points within the background radius
-                jmin = np.max(np.array([1, (j - bkg_rad / dy)], dtype=int))
-                jmax = np.min(np.array([ny, (j + bkg_rad / dy)], dtype=int))
-
-                n = 0
-                sum_ze = 0
-
-                # Calculate the mean background reflectivity for the current
-                # grid point, which will be used to determine the convective
-                # radius and the required peakedness.
-
-                for l in range(imin, imax):
-                    for m in range(jmin, jmax):
-                        if not np.isnan(refl[m, l]):
-                            rad = np.sqrt(
-                                (x[l] - x[i]) ** 2 + (y[m] - y[j]) ** 2)
-
-                        # The mean background reflectivity will first be
-                        # computed in linear units, i.e. mm^6/m^3, then
-                        # converted to decibel units.
-                            if rad <= bkg_rad:
-                                n += 1
-                                sum_ze += 10. ** (refl[m, l] / 10.)
-
-                if n == 0:
-                    ze_bkg = np.inf
-                else:
-                    ze_bkg = 10.0 * np.log10(sum_ze / n)
-
-                # Now get the corresponding convective radius knowing the mean
-                # background reflectivity.
-                conv_rad = convective_radius(ze_bkg, area_relation)
-
-                # Now we want to investigate the points surrounding the current
-                # grid point that are within the convective radius, and whether
-                # they too are convective, stratiform or undefined.
-
-                # Get stencil of x and y grid points within the convective
-                # radius.
-                lmin = np.max(
-                    np.array([1, int(i - conv_rad / dx)], dtype=int))
-                lmax = np.min(
-                    np.array([nx, int(i + conv_rad / dx)], dtype=int))
-                mmin = np.max(
-                    np.array([1, int(j - conv_rad / dy)], dtype=int))
-                mmax = np.min(
-                    np.array([ny, int(j + conv_rad / dy)], dtype=int))
-
-                if use_intense and (refl[j, i] >= intense):
-                    sclass[j, i] = 2
-
-                    for l in range(lmin, lmax):
-                        for m in range(mmin, mmax):
-                            if not np.isnan(refl[m, l]):
-                                rad = np.sqrt(
-                                    (x[l] - x[i]) ** 2
-                                    + (y[m] - y[j]) ** 2)
-
-                                if rad <= conv_rad:
-                                    sclass[m, l] = 2
-
-                else:
-                    peak = peakedness(ze_bkg, peak_relation)
-
-                    if refl[j, i] - ze_bkg >= peak:
-                        sclass[j, i] = 2
-
-                        for l in range(imin, imax):
-                            for m in range(jmin, jmax):
-                                if not np.isnan(refl[m, l]):
-                                    rad = np.sqrt(
-                                        (x[l] - x[i]) ** 2
-                                        + (y[m] - y[j]) ** 2)
-
-                                    if rad <= conv_rad:
-                                        sclass[m, l] = 2
-
-                    else:
-                        # If by now the current grid point has not been
-                        # classified as convective by either the intensity
-                        # criteria or the peakedness criteria, then it must be
-                        # stratiform.
-                        sclass[j, i] = 1
+    refl = np.ascontiguousarray(refl, dtype=np.float64)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    is_valid = ~np.isnan(refl)
 
-    return sclass
+    ze_bkg = _background_reflectivity(refl, is_valid, dx, dy, bkg_rad)
+    conv_rad = _convective_radius(ze_bkg, area_relation)
+    peak = _peakedness(ze_bkg, peak_relation)
+
+    # determine which grid points are convective cores and by which criteria
+    with np.errstate(invalid='ignore'):
+        is_intense = np.logical_and(use_intense, refl >= intense)
+        is_peaked = refl - ze_bkg >= peak
+    core = np.zeros(refl.shape, dtype=np.int8)
+    core[is_peaked] = 2
+    core[is_intense] = 1
+    core[~is_valid] = 0
+
+    return steiner_classify(refl, core, conv_rad, x, y, dx, dy, bkg_rad)
+
+
+def _background_reflectivity(refl, is_valid, dx, dy, bkg_rad):
+    """
+    Compute the mean background reflectivity in dBZ of every grid point.
+
+    The mean is taken in linear units over the grid points within the
+    background radius, using the same stencil as the original algorithm
+    which excludes the first row and column of the grid and the last grid
+    point in each positive direction. The sums are computed with FFT
+    convolutions. Grid points without valid grid points in the stencil have
+    an infinite background reflectivity.
+    """
+    # offsets of the stencil in the y and x directions
+    y_offsets = np.arange(np.floor(-bkg_rad / dy), np.floor(bkg_rad / dy))
+    x_offsets = np.arange(np.floor(-bkg_rad / dx), np.floor(bkg_rad / dx))
+    rad = np.sqrt((x_offsets[np.newaxis, :] * dx) ** 2 +
+                  (y_offsets[:, np.newaxis] * dy) ** 2)
+    kernel = (rad <= bkg_rad).astype(np.float64)
+
+    linear = np.where(is_valid, 10. ** (refl / 10.), 0.)
+    count = is_valid.astype(np.float64)
+    linear[0, :] = linear[:, 0] = 0.
+    count[0, :] = count[:, 0] = 0.
+
+    sum_ze = _correlate_stencil(linear, kernel, y_offsets, x_offsets)
+    n = np.rint(_correlate_stencil(count, kernel, y_offsets, x_offsets))
+
+    ze_bkg = np.full(refl.shape, np.inf)
+    has_bkg = n > 0
+    ze_bkg[has_bkg] = 10. * np.log10(sum_ze[has_bkg] / n[has_bkg])
+    return ze_bkg
+
+
+def _correlate_stencil(data, kernel, y_offsets, x_offsets):
+    """
+    Sum the data weighted by the kernel over a stencil, the kernel element
+    [m, l] is the weight of the grid point offset by y_offsets[m] and
+    x_offsets[l]. Grid points outside the grid are not included.
+    """
+    pad = int(max(np.abs(y_offsets).max(), np.abs(x_offsets).max()))
+    padded = np.pad(data, pad, mode='constant')
+    out = signal.fftconvolve(padded, kernel[::-1, ::-1], mode='valid')
+    ny, nx = data.shape
+    j0 = int(y_offsets[0]) + pad
+    i0 = int(x_offsets[0]) + pad
+    return out[j0:j0 + ny, i0:i0 + nx]
+
+
+def _convective_radius(ze_bkg, area_relation):
+    """
+    Given mean background reflectivity values, we determine via a step
+    function what the corresponding convective radii would be.
+
+    Higher background reflectivitives are expected to have larger
+    convective influence on surrounding areas, so a larger convective
+    radius would be prescribed.
+    """
+    bins, radii = _CONV_RAD_BINS[area_relation]
+    return np.asarray(radii)[np.digitize(ze_bkg, bins)]
+
+
+def _peakedness(ze_bkg, peak_relation):
+    """
+    Given background reflectivity values, we determine what the necessary
+    peakedness (or difference) has to be between a grid point's
+    reflectivity and the background reflectivity in order for that grid
+    point to be labeled convective.
+    """
+    low_peak, high_peak = _PEAK_LIMITS[peak_relation]
+    peak = np.full(ze_bkg.shape, high_peak)
+    peak[ze_bkg < 42.43] = low_peak - ze_bkg[ze_bkg < 42.43] ** 2 / 180.
+    peak[ze_bkg < 0.] = low_peak
+    return peak
 
 
 def steiner_class_buff(ze, x, y, z, dx, dy, bkg_rad,
@@ -0,0 +1,88 @@
+"""
+Cython routines for the Steiner convective-stratiform classification.
+
+"""
+
+from libc.math cimport sqrt, isnan
+
+import numpy as np
+
+cimport cython
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def steiner_classify(
+        double[:, ::1] refl, signed char[:, ::1] core,
+        double[:, ::1] conv_rad, double[::1] x, double[::1] y,
+        double dx, double dy, double bkg_rad):
+    """
+    Classify grid points as undefined, stratiform or convective.
+
+    Grid points are visited in the same order as the original algorithm, a
+    grid point which lies within the convective radius of an earlier
+    convective core is not classified again, so its own convective radius is
+    not applied.
+
+    Parameters
+    ----------
+    refl : array, 2D
+        Reflectivity in dBZ, NaN where missing.
+    core : array, 2D
+        Convective core criteria met by each grid point. 0 for none, 1 for the
+        intensity criteria and 2 for the peakedness criteria.
+    conv_rad : array, 2D
+        Convective radius of each grid point in meters.
+    x, y : array, 1D
+        Grid x and y coordinates in meters.
+    dx, dy : float
+        Grid x and y resolutions in meters.
+    bkg_rad : float
+        Background radius in meters.
+
+    Returns
+    -------
+    sclass : array, 2D
+        0 = Undefined, 1 = Stratiform, 2 = Convective.
+
+    """
+    cdef int ny = refl.shape[0]
+    cdef int nx = refl.shape[1]
+    cdef int i, j, l, m, lmin, lmax, mmin, mmax
+    cdef double rad, radius
+
+    sclass_arr = np.zeros((ny, nx), dtype=np.int32)
+    cdef int[:, ::1] sclass = sclass_arr
+
+    for i in range(nx):
+        for j in range(ny):
+            if isnan(refl[j, i]) or sclass[j, i] != 0:
+                continue
+            if core[j, i] == 0:
+                sclass[j, i] = 1
+                continue
+            sclass[j, i] = 2
+
+            # stencil of grid points within the convective radius, cores
+            # found by the peakedness criteria use the background stencil
+            radius = conv_rad[j, i]
+            if core[j, i] == 1:
+                lmin = max(1, <int>(i - radius / dx))
+                lmax = min(nx, <int>(i + radius / dx))
+                mmin = max(1, <int>(j - radius / dy))
+                mmax = min(ny, <int>(j + radius / dy))
+            else:
+                lmin = max(1, <int>(i - bkg_rad / dx))
+                lmax = min(nx, <int>(i + bkg_rad / dx))
+                mmin = max(1, <int>(j - bkg_rad / dy))
+                mmax = min(ny, <int>(j + bkg_rad / dy))
+
+            for l in range(lmin, lmax):
+                for m in range(mmin, mmax):
+                    if not isnan(refl[m, l]):
+                        rad = sqrt((x[l] - x[i]) ** 2 + (y[m] - y[j]) ** 2)
+                        if rad <= radius:
+                            sclass[m, l] = 2
+
+    return sclass_arr
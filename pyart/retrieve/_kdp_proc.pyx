@@ -10,6 +10,8 @@ Cython routines for specific differential phase retrievals.
 #   be fruitless in the end.
 
 
+from libc.math cimport sqrt
+
 cimport cython
 
 
@@ -151,3 +153,193 @@ def lowpass_maesaka_jac(
     else:
         raise ValueError("Invalid finite_order")
     return
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def kalman_filter_ensemble(
+        double[:, ::1] psidp, int[::1] lengths, double[::1] scalers,
+        double[:, ::1] pcov, double[:, ::1] rcov, double dr, double c1,
+        double c2, double b1, double b2, double kdp_th,
+        double[:, :, ::1] kdp):
+    """
+    Run an ensemble of Kalman filters along profiles of differential phase.
+
+    Filter profiles of total differential phase with the Kalman filter
+    described in Schneebeli et al. (2014), once for each scaling of the state
+    transition error covariance matrix. The filters of all profiles and
+    ensemble members are independent, each filter starts from a zero state.
+
+    Parameters
+    ----------
+    psidp : 2D array of float64
+        Profiles of total differential phase without missing values, each
+        profile is stored at the start of a row.
+    lengths : 1D array of int32
+        Number of gates in each profile.
+    scalers : 1D array of float64
+        Scaling of the state transition error covariance matrix of each
+        ensemble member.
+    pcov : 2D array of float64
+        4x4 state transition error covariance matrix.
+    rcov : 2D array of float64
+        3x3 measurement error covariance matrix.
+    dr : float
+        The range resolution in kilometers.
+    c1, c2, b1, b2 : float
+        The values of the intercept of the relation c = b*Kdp - delta.
+        This relation uses b1, c1 if kdp is lower than kdp_th and b2, c2
+        otherwise.
+    kdp_th : float
+        The kdp threshold which separates the two Kdp - delta regimes.
+    kdp : 3D array of float64
+        Filtered Kdp of each profile, ensemble member and gate, the last
+        gate of each profile is not updated. Updated in place.
+
+    """
+
+    # define local variables
+    cdef int nprof, nscalers, r, j, ii, a, b, c, n
+    cdef double sc, tmp
+    cdef double s[4]
+    cdef double sp[4]
+    cdef double f[4][4]
+    cdef double p[4][4]
+    cdef double fp[4][4]
+    cdef double pp[4][4]
+    cdef double h[3][4]
+    cdef double am[3][3]
+    cdef double bm[3][4]
+    cdef double lm[3][3]
+    cdef double km[4][3]
+    cdef double kh[4][4]
+    cdef double z[3]
+    cdef double v[3]
+
+    nprof = psidp.shape[0]
+    nscalers = scalers.shape[0]
+
+    # state transition matrix
+    for a in range(4):
+        for b in range(4):
+            f[a][b] = 0.
+    f[0][0] = 1.
+    f[1][1] = 1.
+    f[2][3] = 1.
+    f[3][0] = 2. * dr
+    f[3][3] = 1.
+
+    # measurement prediction matrix, h[2][0] depends on the predicted kdp
+    h[0][0] = -2. * dr
+    h[0][1] = 1.
+    h[0][2] = 0.
+    h[0][3] = 1.
+    h[1][0] = 2. * dr
+    h[1][1] = 1.
+    h[1][2] = 1.
+    h[1][3] = 0.
+    h[2][0] = 0.
+    h[2][1] = -1.
+    h[2][2] = 0.
+    h[2][3] = 0.
+
+    for r in range(nprof):
+        n = lengths[r]
+        for j in range(nscalers):
+            sc = scalers[j]
+
+            # initial state and error
+            for a in range(4):
+                s[a] = 0.
+                for b in range(4):
+                    p[a][b] = 0.
+                p[a][a] = 4.
+
+            for ii in range(n - 1):
+                z[0] = psidp[r, ii]
+                z[1] = psidp[r, ii + 1]
+
+                # state and error prediction
+                for a in range(4):
+                    sp[a] = 0.
+                    for b in range(4):
+                        sp[a] += f[a][b] * s[b]
+                        tmp = 0.
+                        for c in range(4):
+                            tmp += f[a][c] * p[c][b]
+                        fp[a][b] = tmp
+                for a in range(4):
+                    for b in range(4):
+                        tmp = sc * pcov[a, b]
+                        for c in range(4):
+                            tmp += fp[a][c] * f[b][c]
+                        pp[a][b] = tmp
+
+                if sp[0] > kdp_th:
+                    h[2][0] = b2
+                    z[2] = c2
+                else:
+                    h[2][0] = b1
+                    z[2] = c1
+
+                # bm = h pp, am = h pp h' + rcov
+                for a in range(3):
+                    for b in range(4):
+                        tmp = 0.
+                        for c in range(4):
+                            tmp += h[a][c] * pp[c][b]
+                        bm[a][b] = tmp
+                for a in range(3):
+                    for b in range(3):
+                        tmp = rcov[a, b]
+                        for c in range(4):
+                            tmp += bm[a][c] * h[b][c]
+                        am[a][b] = tmp
+
+                # solve am km' = bm using the Cholesky decomposition of am
+                lm[0][0] = sqrt(am[0][0])
+                lm[1][0] = am[1][0] / lm[0][0]
+                lm[2][0] = am[2][0] / lm[0][0]
+                lm[1][1] = sqrt(am[1][1] - lm[1][0] * lm[1][0])
+                lm[2][1] = (am[2][1] - lm[2][0] * lm[1][0]) / lm[1][1]
+                lm[2][2] = sqrt(
+                    am[2][2] - lm[2][0] * lm[2][0] - lm[2][1] * lm[2][1])
+                for b in range(4):
+                    for a in range(3):
+                        tmp = bm[a][b]
+                        for c in range(a):
+                            tmp -= lm[a][c] * km[b][c]
+                        km[b][a] = tmp / lm[a][a]
+                    for a in range(2, -1, -1):
+                        tmp = km[b][a]
+                        for c in range(a + 1, 3):
+                            tmp -= lm[c][a] * km[b][c]
+                        km[b][a] = tmp / lm[a][a]
+
+                # update state and error
+                for a in range(3):
+                    tmp = z[a]
+                    for c in range(4):
+                        tmp -= h[a][c] * sp[c]
+                    v[a] = tmp
+                for a in range(4):
+                    tmp = sp[a]
+                    for c in range(3):
+                        tmp += km[a][c] * v[c]
+                    s[a] = tmp
+                    for b in range(4):
+                        tmp = 0.
+                        for c in range(3):
+                            tmp -= km[a][c] * h[c][b]
+                        kh[a][b] = tmp
+                    kh[a][a] += 1.
+                for a in range(4):
+                    for b in range(4):
+                        tmp = 0.
+                        for c in range(4):
+                            tmp += kh[a][c] * pp[c][b]
+                        p[a][b] = tmp
+
+                kdp[r, j, ii] = s[0]
+    return
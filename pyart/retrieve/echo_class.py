@@ -110,7 +110,9 @@ def hydroclass_semisupervised(radar, mass_centers=None,
                               weights=np.array([1., 1., 1., 0.75, 0.5]),
                               refl_field=None, zdr_field=None, rhv_field=None,
                               kdp_field=None, temp_field=None,
-                              hydro_field=None):
+                              hydro_field=None, chunk_size=100,
+                              compute_confidence=False,
+                              confidence_field=None):
     """
     Classifies precipitation echoes following the approach by Besic et al
     (2016).
@@ -135,11 +137,25 @@ def hydroclass_semisupervised(radar, mass_centers=None,
         Output. Field name which represents the hydrometeor class field.
         A value of None will use the default field name as defined in the
         Py-ART configuration file.
+    chunk_size : int, optional
+        Number of rays classified at once, must be positive. Memory use is
+        proportional to the number of rays in a chunk.
+    compute_confidence : bool, optional
+        True to also return the confidence of the classification.
+    confidence_field : str, optional
+        Output. Field name which represents the classification confidence
+        field. A value of None will use the default field name as defined in
+        the Py-ART configuration file.
 
     Returns
     -------
     hydro : dict
         Hydrometeor classification field.
+    confidence : dict
+        Classification confidence field, one minus the ratio of the
+        distances to the nearest and second nearest centroids. Values close
+        to 0 indicate gates nearly as close to another class. Only returned
+        when compute_confidence is True.
 
     References
     ----------
@@ -151,6 +167,9 @@ def hydroclass_semisupervised(radar, mass_centers=None,
     """
     lapse_rate = -6.5
 
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive, got %r' % chunk_size)
+
     # select the centroids as a function of frequency band
     if mass_centers is None:
         # assign coefficients according to radar frequency
@@ -175,6 +194,8 @@ def hydroclass_semisupervised(radar, mass_centers=None,
         temp_field = get_field_name('temperature')
     if hydro_field is None:
         hydro_field = get_field_name('radar_echo_classification')
+    if confidence_field is None:
+        confidence_field = get_field_name('hydroclass_confidence')
 
     # extract fields and parameters from radar
     radar.check_field_exists(refl_field)
@@ -189,16 +210,6 @@ def hydroclass_semisupervised(radar, mass_centers=None,
     kdp = radar.fields[kdp_field]['data']
     temp = radar.fields[temp_field]['data']
 
-    # convert temp in relative height respect to iso0
-    relh = temp*(1000./lapse_rate)
-
-    # standardize data
-    refl_std = _standardize(refl, 'Zh')
-    zdr_std = _standardize(zdr, 'ZDR')
-    kdp_std = _standardize(kdp, 'KDP')
-    rhohv_std = _standardize(rhohv, 'RhoHV')
-    relh_std = _standardize(relh, 'relH')
-
     # standardize centroids
     mc_std = np.zeros(np.shape(mass_centers))
     mc_std[:, 0] = _standardize(mass_centers[:, 0], 'Zh')
@@ -207,15 +218,43 @@ def hydroclass_semisupervised(radar, mass_centers=None,
     mc_std[:, 3] = _standardize(mass_centers[:, 3], 'RhoHV')
     mc_std[:, 4] = _standardize(mass_centers[:, 4], 'relH')
 
-    # assign to class
-    hydroclass_data, min_dist = _assign_to_class(
-        refl_std, zdr_std, kdp_std, rhohv_std, relh_std, mc_std,
-        weights=weights)
+    hydroclass_data = np.zeros((radar.nrays, radar.ngates), dtype=np.intp)
+    if compute_confidence:
+        confidence_data = np.ma.masked_all(
+            (radar.nrays, radar.ngates), dtype=np.float32)
+
+    # classify the volume in chunks of rays to bound the memory use
+    for start in range(0, radar.nrays, chunk_size):
+        rays = slice(start, start + chunk_size)
+
+        # convert temp in relative height respect to iso0
+        relh = temp[rays]*(1000./lapse_rate)
+
+        # standardize data
+        refl_std = _standardize(refl[rays], 'Zh')
+        zdr_std = _standardize(zdr[rays], 'ZDR')
+        kdp_std = _standardize(kdp[rays], 'KDP')
+        rhohv_std = _standardize(rhohv[rays], 'RhoHV')
+        relh_std = _standardize(relh, 'relH')
+
+        # assign to class
+        hydroclass_data[rays], min_dist, second_dist = _assign_to_class(
+            refl_std, zdr_std, kdp_std, rhohv_std, relh_std, mc_std,
+            weights=weights)
+
+        if compute_confidence:
+            confidence_data[rays] = np.ma.masked_where(
+                hydroclass_data[rays] == 0, 1. - min_dist / second_dist)
 
     # prepare output fields
     hydro = get_metadata(hydro_field)
     hydro['data'] = hydroclass_data
 
+    if compute_confidence:
+        confidence = get_metadata(confidence_field)
+        confidence['data'] = confidence_data
+        return hydro, confidence
+
     return hydro
 
 
@@ -267,11 +306,15 @@ def _standardize(data, field_name, mx=None, mn=None):
 
 
 def _assign_to_class(zh, zdr, kdp, rhohv, relh, mass_centers,
-                    weights=np.array([1., 1., 1., 0.75, 0.5])):
+                     weights=np.array([1., 1., 1., 0.75, 0.5])):
     """
     Assigns an hydrometeor class to a radar range bin computing
     the distance between the radar variables an a centroid.
 
+    Distances are computed in single precision one class at a time, keeping
+    the running minimum and second minimum distance, so memory use does not
+    grow with the number of classes.
+
     Parameters
     ----------
     zh, zdr, kdp, rhohv, relh : radar fields
@@ -287,43 +330,49 @@ def _assign_to_class(zh, zdr, kdp, rhohv, relh, mass_centers,
         The index corresponding to the assigned class.
     mind_dist : float array
         The minimum distance to the centroids.
+    second_dist : float array
+        The distance to the second nearest centroid.
 
     """
-    # prepare data
-    nrays = zh.shape[0]
-    nbins = zdr.shape[1]
-    nclasses = mass_centers.shape[0]
-    nvariables = mass_centers.shape[1]
-
-    data = np.ma.array([zh, zdr, kdp, rhohv, relh])
-    weights_mat = np.broadcast_to(
-        weights.reshape(nvariables, 1, 1),
-        (nvariables, nrays, nbins))
-    dist = np.ma.zeros((nclasses, nrays, nbins), dtype='float64')
-
-    # compute distance: masked entries will not contribute to the distance
-    for i in range(nclasses):
-        centroids_class = mass_centers[i, :]
-        centroids_class = np.broadcast_to(
-            centroids_class.reshape(nvariables, 1, 1),
-            (nvariables, nrays, nbins))
-        dist[i, :, :] = np.ma.sqrt(np.ma.sum(
-            ((centroids_class-data)**2.)*weights_mat, axis=0))
-
-    # use very large fill_value so that masked entries will be sorted at the
-    # end. There should not be any masked entry anyway
-    class_vec = dist.argsort(axis=0, fill_value=10e40)
-
-    # get minimum distance. Acts as a confidence value
-    dist_sorted = dist.sort(axis=0, fill_value=10e40)
-    min_dist = dist[0, :, :]
+    # prepare data, masked entries will not contribute to the distance
+    variables = [zh, zdr, kdp, rhohv, relh]
+    data = [np.ma.getdata(var).astype(np.float32) for var in variables]
+    valid = [~np.ma.getmaskarray(var) for var in variables]
+    mass_centers = mass_centers.astype(np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+
+    min_dist = np.full(zh.shape, np.inf, dtype=np.float32)
+    second_dist = np.full(zh.shape, np.inf, dtype=np.float32)
+    class_vec = np.zeros(zh.shape, dtype=np.intp)
+    dist = np.empty(zh.shape, dtype=np.float32)
+    diff = np.empty(zh.shape, dtype=np.float32)
+    has_data = np.logical_or.reduce(valid)
+
+    for i in range(mass_centers.shape[0]):
+        # compute distance to the centroids of the class
+        dist.fill(0.)
+        for j, (var, is_valid) in enumerate(zip(data, valid)):
+            np.subtract(mass_centers[i, j], var, out=diff)
+            diff *= diff
+            diff *= weights[j]
+            diff[~is_valid] = 0.
+            dist += diff
+        np.sqrt(dist, out=dist)
+        dist[~has_data] = np.inf
+
+        # keep the minimum and second minimum, the first class wins ties
+        is_min = dist < min_dist
+        np.minimum(second_dist, np.where(is_min, min_dist, dist),
+                   out=second_dist)
+        np.copyto(min_dist, dist, where=is_min)
+        class_vec[is_min] = i
 
     # Entries with non-valid reflectivity values are set to 0 (No class)
     mask = np.ma.getmaskarray(zh)
-    hydroclass = class_vec[0, :, :]+1
+    hydroclass = class_vec+1
     hydroclass[mask] = 0
 
-    return hydroclass, min_dist
+    return hydroclass, min_dist, second_dist
 
 
 def _get_mass_centers(freq):
@@ -13,6 +13,13 @@ import warnings
 import numpy as np
 from scipy import optimize, stats, interpolate, linalg, signal
 
+# shared memory between processes is only available in Python 3.8 or newer
+try:
+    from multiprocessing import shared_memory
+    _SHARED_MEMORY_AVAILABLE = True
+except ImportError:
+    _SHARED_MEMORY_AVAILABLE = False
+
 from . import _kdp_proc
 from ..config import get_field_name, get_metadata, get_fillvalue
 from ..util import rolling_window
@@ -23,13 +30,17 @@ from ..util import rolling_window
 SCALERS = [0.1, 10**(-0.8), 10**(-0.6), 10**(-0.4), 10**(-0.2), 1,
            10**(0.2), 10**(0.4), 10**(0.6), 10**(0.8), 1, 10]
 
+# scipy.optimize.minimize methods which use Hessian-vector products
+_HESSP_METHODS = ['newton-cg', 'trust-ncg', 'trust-krylov', 'trust-constr']
+
 PADDING = 50  # Noise padding of the psidp signal (before and after signal)
 SHIFT = 13  # Shifting of the final signal
 
 
 def kdp_schneebeli(radar, gatefilter=None, fill_value=None, psidp_field=None,
                    kdp_field=None, phidp_field=None, band='C', rcov=0, pcov=0,
-                   prefilter_psidp=False, filter_opt=None, parallel=True):
+                   prefilter_psidp=False, filter_opt=None, parallel=True,
+                   pool=None):
     """
     Estimates Kdp with the Kalman filter method by Schneebeli and al. (2014)
     for a set of psidp measurements.
@@ -69,7 +80,13 @@ def kdp_schneebeli(radar, gatefilter=None, fill_value=None, psidp_field=None,
         The arguments for the prefilter_psidp method, if empty, the defaults
         arguments of this method will be used.
     parallel : bool, optional
-        Flag to enable parallel computation (one core for every psidp profile).
+        Flag to enable parallel computation (one core for every block of
+        psidp profiles). The Kalman filters of all profiles in a block are
+        run together by a compiled kernel.
+    pool : KdpPool, optional
+        Pool of worker processes used for the computation. Reusing a pool
+        across calls avoids starting new processes for every volume. If
+        given, parallel is ignored.
 
     Returns
     -------
@@ -88,12 +105,6 @@ def kdp_schneebeli(radar, gatefilter=None, fill_value=None, psidp_field=None,
     5137-5149, doi:10.1109/TGRS.2013.2287017, 2014.
 
     """
-    # create parallel computing instance
-    if parallel:
-        import multiprocessing as mp
-
-        pool = mp.Pool(processes=mp.cpu_count(), maxtasksperchild=1)
-
     # parse fill value
     if fill_value is None:
         fill_value = get_fillvalue()
@@ -125,30 +136,18 @@ def kdp_schneebeli(radar, gatefilter=None, fill_value=None, psidp_field=None,
     if gatefilter is not None:
         psidp_o = np.ma.masked_where(gatefilter.gate_excluded, psidp_o)
 
-    func = partial(_kdp_kalman_profile, dr=dr, band=band, rcov=rcov,
+    func = partial(_kdp_kalman_profiles, dr=dr, band=band, rcov=rcov,
                    pcov=pcov)
 
-    all_psidp_prof = list(psidp_o)
-
-    if parallel:
-        list_est = pool.map(func, all_psidp_prof)
-    else:
-        list_est = map(func, all_psidp_prof)
+    # the Kalman filters of a block of rays are run together, in parallel
+    # each process handles a block of rays at a time
+    kdp, kdp_stdev, phidp_rec = _map_kdp_rays(
+        func, psidp_o, 3, parallel=parallel, pool=pool)
 
-    kdp = np.zeros(psidp_o.shape) * np.nan
     kdp = np.ma.masked_array(kdp, fill_value=fill_value)
-
-    kdp_stdev = np.zeros(psidp_o.shape) * np.nan
     kdp_stdev = np.ma.masked_array(kdp_stdev, fill_value=fill_value)
-
-    phidp_rec = np.zeros(psidp_o.shape) * np.nan
     phidp_rec = np.ma.masked_array(phidp_rec, fill_value=fill_value)
 
-    for i, l in enumerate(list_est):
-        kdp[i, 0:len(l[0])] = l[0]
-        kdp_stdev[i, 0:len(l[1])] = l[1]
-        phidp_rec[i, 0:len(l[2])] = l[2]
-
     # Mask the estimated Kdp and reconstructed Phidp with the mask of original
     # psidp
     if isinstance(psidp_o, np.ma.masked_array):
@@ -176,9 +175,6 @@ def kdp_schneebeli(radar, gatefilter=None, fill_value=None, psidp_field=None,
     kdp_stdev_dict['data'] = kdp_stdev
     kdp_stdev_dict['valid_min'] = 0.0
 
-    if parallel:
-        pool.close()
-
     return kdp_dict, kdp_stdev_dict, phidpr_dict
 
 
@@ -443,6 +439,40 @@ def _kdp_kalman_profile(psidp_in, dr, band='X', rcov=0, pcov=0):
     Kalman Filter Ensembles, IEEE T. Geosci. Remote Sens., 52,
     5137-5149, doi:10.1109/TGRS.2013.2287017, 2014.
 
+    """
+    kdp, kdp_std, phidp = _kdp_kalman_profiles(
+        np.ma.atleast_2d(psidp_in), dr, band=band, rcov=rcov, pcov=pcov)
+    return kdp[0], kdp_std[0], phidp[0]
+
+
+def _kdp_kalman_profiles(psidp_in, dr, band='X', rcov=0, pcov=0):
+    """
+    Estimates Kdp with the Kalman filter method by Schneebeli and al. (2014)
+    for a block of psidp profiles.
+
+    The Kalman filters of all profiles, ensemble members and directions are
+    run by a single call to a compiled kernel, only the preparation of the
+    profiles and the compilation of the final estimates are done for each
+    profile.
+
+    Parameters
+    ----------
+    psidp_in : ndarray
+        Two-dimensional array of shape (nrays, nrg) containining the input
+        psidp [degrees].
+    dr, band, rcov, pcov :
+        See :py:func:`_kdp_kalman_profile`.
+
+    Returns
+    -------
+    kdp : ndarray
+        Retrieved specific differential phase data, NaN where not
+        retrieved.
+    kdp_std : ndarray
+        Estimated specific differential phase standard dev. data.
+    phidp : ndarray
+        Retrieved differential phase data.
+
     """
 
     dr = dr / 1000.  # Convert rad. res. to km
@@ -450,10 +480,12 @@ def _kdp_kalman_profile(psidp_in, dr, band='X', rcov=0, pcov=0):
     # NOTE! Parameters are not checked to save as much time as possible
 
     # Replace missing values with nans
-    psidp_in = np.ma.filled(psidp_in, np.nan)
-    # Check if psidp has at least one finite value
-    if not np.isfinite(psidp_in).any():
-        return psidp_in, psidp_in, psidp_in  # Return the NaNs...
+    psidp_in = np.ma.filled(psidp_in, np.nan).astype(float)
+    nrays, ngates = psidp_in.shape
+
+    kdp_out = np.full((nrays, ngates), np.nan)
+    kdp_std_out = np.full((nrays, ngates), np.nan)
+    phidp_out = np.full((nrays, ngates), np.nan)
 
     # Set default of the error covariance matrices
     if not isinstance(pcov, np.ndarray):
@@ -502,119 +534,136 @@ def _kdp_kalman_profile(psidp_in, dr, band='X', rcov=0, pcov=0):
         b2 = 0.019
         kdp_th = 1.1
 
-    # Parameters for the final selection from the KF ensemble members
-    fac1 = 1.2
-    fac2 = 3.
-
-    th1_comp = -0.15
-    th2_comp = 0.15
-    th1_final = -0.25
-
-    # Kalman matrices
-    # State matrix
-    f = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1],
-                  [2 * dr, 0, 0, 1]], dtype=float)
-    f_transposed = f.T
-
-    # Measurement prediction matrix--------------------------------
-    # J. Grazioli modification 07.2015 --previous H_plus buggy--
-    h_plus = np.array(
-        [[-2 * dr, 1, 0, 1], [2 * dr, 1, 1, 0], [0, -1, 0, 0]], dtype=float)
-
-    # Define the input
-    psidp = psidp_in
-    # Get indices of finite data
-    real_data_ind = np.where(np.isfinite(psidp.ravel()))[0]
-    offset = real_data_ind[0]
-
-    if len(real_data_ind):
-        mpsidp = psidp.ravel()[real_data_ind[-1]]
-    else:
-        mpsidp = np.nan
+    # Prepare the profiles with some extra gates on each side, valid
+    # profiles are filtered in the forward (first half of the rows) and
+    # backward (second half) directions.
+    valid_rays = []
+    offsets = []
+    mpsidps = []
+    psidp_long = np.zeros((2 * nrays, ngates + PADDING * 2))
+    lengths = np.zeros(2 * nrays, dtype=np.int32)
+    for i in range(nrays):
+        # Get indices of finite data
+        real_data_ind = np.where(np.isfinite(psidp_in[i]))[0]
+        # Check if psidp has at least one finite value
+        if not len(real_data_ind):
+            continue
+        offset = real_data_ind[0]
+        mpsidp = psidp_in[i, real_data_ind[-1]]
+        psidp = psidp_in[i, offset:real_data_ind[-1] + 1]
+        nrg = len(psidp)
+        nn = nrg + PADDING * 2
+
+        # add values at the beginning and at the end of the profile
+        k = len(valid_rays)
+        prof = psidp_long[k, :nn]
+        noise = 2 * np.random.randn(PADDING)
+        prof[0:PADDING] = noise + psidp[0]
+        prof[nrg + PADDING: nrg + 2 * PADDING] = mpsidp + noise
+        prof[PADDING:nrg + PADDING] = psidp
+
+        # interpolate (zero order) and add noise to non valid points
+        nan = np.isnan(prof)
+        if nan.any():
+            last_valid = np.maximum.accumulate(
+                np.where(nan, 0, np.arange(nn)))
+            prof[nan] = prof[last_valid[nan]]
+            prof[nan] += 2 * np.random.randn(np.count_nonzero(nan))
+
+        valid_rays.append(i)
+        offsets.append(offset)
+        mpsidps.append(mpsidp)
+        lengths[k] = nn
+
+    nvalid = len(valid_rays)
+    if nvalid == 0:
+        return kdp_out, kdp_std_out, phidp_out
+
+    # invert Psidp for the backward estimation
+    for k in range(nvalid):
+        nn = lengths[k]
+        psidp_long[nvalid + k, :nn] = mpsidps[k] - psidp_long[k, nn - 1::-1]
+        lengths[nvalid + k] = nn
+    psidp_long = np.ascontiguousarray(psidp_long[:2 * nvalid])
+    lengths = lengths[:2 * nvalid]
 
-    psidp = psidp[offset:real_data_ind[-1] + 1]
+    # Generate the ensemble of Kalman filters estimates in backward and
+    # forward directions, the smallest scaler is the first member
+    scalers = np.array([10 ** (-2.)] + SCALERS)
+    kdp_ens = np.zeros((2 * nvalid, len(scalers), psidp_long.shape[1]))
+    _kdp_proc.kalman_filter_ensemble(
+        psidp_long, lengths, scalers, np.ascontiguousarray(pcov, dtype=float),
+        np.ascontiguousarray(rcov, dtype=float), dr, c1, c2, b1, b2, kdp_th,
+        kdp_ens)
+
+    for k, i in enumerate(valid_rays):
+        nn = lengths[k]
+        nrg = nn - PADDING * 2
+
+        # Shift the forward estimates
+        kdp_f = kdp_ens[k, :, :nn]
+        kdp_f_shift = np.zeros_like(kdp_f)
+        kdp_f_shift[:, :nn - SHIFT] = kdp_f[:, SHIFT:]
+
+        # Shift and reverse the backward estimates
+        kdp_b = kdp_ens[nvalid + k, :, :nn]
+        kdp_b_shift = kdp_b.copy()
+        kdp_b_shift[:, nn - SHIFT:] = 0
+        kdp_b_shift[:, :nn - 1 - SHIFT] = kdp_b[:, SHIFT:nn - 1]
+        kdp_b_shift = kdp_b_shift[:, ::-1]
+
+        kdp_mat = np.empty((nrg, 2 * len(SCALERS)))
+        kdp_mat[:, 0::2] = kdp_f_shift[1:, PADDING:nrg + PADDING].T
+        kdp_mat[:, 1::2] = kdp_b_shift[1:, PADDING:nrg + PADDING].T
+        kdp002 = kdp_b_shift[0, PADDING:nrg + PADDING]
+        kdp002f = kdp_f_shift[0, PADDING:nrg + PADDING]
+
+        kdp_filter_out, kdp_std, phidp_filter_out = _kdp_kalman_compile(
+            kdp_mat, kdp002, kdp002f, dr)
+
+        offset = offsets[k]
+        kdp_out[i, offset:offset + nrg] = kdp_filter_out
+        kdp_std_out[i, offset:offset + nrg] = kdp_std
+        phidp_out[i, offset:offset + nrg] = phidp_filter_out
+
+    return kdp_out, kdp_std_out, phidp_out
+
+
+def _kdp_kalman_compile(kdp_mat, kdp002, kdp002f, dr):
+    """
+    Compile the final Kdp estimate of a profile from the Kalman filter
+    ensemble members.
 
-    nrg = len(psidp)
+    Parameters
+    ----------
+    kdp_mat : ndarray
+        Forward (even columns) and backward (odd columns) estimates of each
+        scaler in SCALERS, of shape (nrg, 2 * len(SCALERS)).
+    kdp002, kdp002f : ndarray
+        Backward and forward estimates of the smallest scaler.
+    dr : float
+        Range resolution in kilometers.
 
-    # Define the output
-    kdp_filter_out = np.zeros([nrg, ])
+    Returns
+    -------
+    kdp_filter_out : ndarray
+        Retrieved specific differential phase data.
+    kdp_std : ndarray
+        Estimated specific differential phase standard dev. data.
+    phidp_filter_out : ndarray
+        Retrieved differential phase data.
 
-    kdp_mat = np.zeros([nrg, 2 * len(SCALERS)])
+    """
+    nrg = kdp_mat.shape[0]
     kdp_sim = np.zeros([nrg, len(SCALERS)])
-    phidp_filter_out = np.zeros([nrg])
-
-    # Prepare a longer array with some extra gates on each side
-    # add values at the beginning and at the end of the profile
-    psidp_long = np.zeros([nrg + PADDING * 2, ]) * np.nan
-
-    nn = nrg + PADDING * 2
-
-    noise = 2 * np.random.randn(PADDING)
-    psidp_long[0:PADDING] = noise + psidp[0]
-    psidp_long[nrg + PADDING: nrg + 2 * PADDING] = mpsidp + noise
-    psidp_long[PADDING:nrg + PADDING] = psidp
-
-    psidp = psidp_long
 
-    # Get information of valid and non valid points in psidp the new psidp
-    nonan = np.where(np.isfinite(psidp))[0]
-    nan = np.where(np.isnan(psidp))[0]
-
-    ranged = np.arange(0, nn)
-
-    psidp_interp = psidp
-
-    # interpolate
-    if len(nan):
-        interp = interpolate.interp1d(ranged[nonan], psidp[nonan], kind='zero')
-        psidp_interp[nan] = interp(ranged[nan])
-    else:
-        psidp_interp = psidp
-
-    # add noise
-    if len(nan):
-        psidp_interp[nan] = psidp_interp[nan] + 2 * np.random.randn(len(nan))
-
-    # Define the final input and output
-    psidp = psidp_interp
-
-
-    # Smallest scaler
-    scaler = 10 ** (-2.)
-
-    # Backward
-    kdp_dummy_b2, _ = _kdp_estimation_backward_fixed(psidp, rcov,
-                                                     pcov * scaler, f,
-                                                     f_transposed, h_plus,
-                                                     c1, c2, b1, b2,
-                                                     kdp_th, mpsidp)
-    kdp002 = kdp_dummy_b2[PADDING:nrg + PADDING]
-
-    # Forward
-    kdp_dummy_b2, _, _ = _kdp_estimation_forward_fixed(psidp, rcov,
-                                                       pcov * scaler, f,
-                                                       f_transposed, h_plus,
-                                                       c1, c2, b1, b2, kdp_th)
-    kdp002f = kdp_dummy_b2[PADDING:nrg + PADDING]
+    # Parameters for the final selection from the KF ensemble members
+    fac1 = 1.2
+    fac2 = 3.
 
-    # Generate the ensemble of Kalman filters estimates in backward and
-    # Forward directions
-    for i, sc in enumerate(SCALERS):  # Loop on scalers
-        # Forward
-        kdp_dummy_f2, _, _ = _kdp_estimation_forward_fixed(psidp,
-                                                           rcov, pcov * sc,
-                                                           f, f_transposed,
-                                                           h_plus, c1, c2,
-                                                           b1, b2, kdp_th)
-        kdp_mat[:, 2 * i] = kdp_dummy_f2[PADDING:nrg + PADDING]
-
-        # Backward
-        kdp_dummy_b2, _ = _kdp_estimation_backward_fixed(psidp, rcov,
-                                                         pcov * sc, f,
-                                                         f_transposed, h_plus,
-                                                         c1, c2, b1, b2,
-                                                         kdp_th, mpsidp)
-        kdp_mat[:, 2 * i + 1] = kdp_dummy_b2[PADDING:nrg + PADDING]
+    th1_comp = -0.15
+    th2_comp = 0.15
+    th1_final = -0.25
 
     # Compile the final estimate
     # Get some reference mean values
@@ -675,12 +724,18 @@ def _kdp_kalman_profile(psidp_in, dr, band='X', rcov=0, pcov=0):
     upper_bound = np.maximum(upper_bound, 0)
     upper_bound = np.minimum(upper_bound, len(SCALERS) - 1)
 
-    # Final selection of the ensemble members
-    for uu in range(0, nrg - 1):
-        selection_vector = np.arange(
-            upper_bound[uu] - lower_bound[uu] + 1) + lower_bound[uu]
-        selection_vector = selection_vector.astype(int)
-        kdp_filter_out[uu] = np.mean(kdp_sim[uu, selection_vector])
+    # Final selection of the ensemble members, the mean of the members
+    # between the bounds of each gate is found from cumulative sums.
+    lower_bound = lower_bound[:nrg - 1].astype(int)
+    upper_bound = upper_bound[:nrg - 1].astype(int)
+    kdp_sim_cumsum = np.zeros((nrg, len(SCALERS) + 1))
+    np.cumsum(kdp_sim, axis=1, out=kdp_sim_cumsum[:, 1:])
+    gates = np.arange(nrg - 1)
+    kdp_filter_out = np.zeros([nrg, ])
+    kdp_filter_out[:nrg - 1] = (
+        (kdp_sim_cumsum[gates, upper_bound + 1] -
+         kdp_sim_cumsum[gates, lower_bound]) /
+        (upper_bound - lower_bound + 1))
 
     # Final filtering of excessively negative values:
     # TO DO: It would be better to get rid of this filtering
@@ -692,28 +747,17 @@ def _kdp_kalman_profile(psidp_in, dr, band='X', rcov=0, pcov=0):
     # Compute phidp from Kdp
     phidp_filter_out = np.cumsum(kdp_filter_out) * 2. * dr
 
-    phinan = np.where(np.isnan(psidp))[0]
-    if len(phinan):
-        phidp_filter_out[phinan] = np.nan
-        kdp_filter_out[phinan] = np.nan
     phidp_filter_out[nrg - 1] = np.nan
     kdp_filter_out[nrg - 1] = np.nan
 
-    # Pad with nan if offset > 0
-    kdp_filter_out = np.pad(kdp_filter_out, (offset, 0), mode='constant',
-                            constant_values=np.nan)
-    kdp_std = np.pad(kdp_std, (offset, 0), mode='constant',
-                     constant_values=np.nan)
-    phidp_filter_out = np.pad(phidp_filter_out, (offset, 0), mode='constant',
-                              constant_values=np.nan)
-
     return kdp_filter_out, kdp_std, phidp_filter_out
 
 
 def kdp_vulpiani(radar, gatefilter=None, fill_value=None, psidp_field=None,
                  kdp_field=None, phidp_field=None, band='C', windsize=10,
                  n_iter=10, interp=False, prefilter_psidp=False,
-                 filter_opt=None, parallel=False):
+                 filter_opt=None, parallel=False, pool=None,
+                 engine='profile'):
     """
     Estimates Kdp with the Vulpiani method for a 2D array of psidp measurements
     with the first dimension being the distance from radar and the second
@@ -759,7 +803,18 @@ def kdp_vulpiani(radar, gatefilter=None, fill_value=None, psidp_field=None,
         The arguments for the prefilter_psidp method, if empty, the defaults
         arguments of this method will be used.
     parallel : bool, optional
-        Flag to enable parallel computation (one core for every psidp profile).
+        Flag to enable parallel computation (one core for every block of
+        psidp profiles).
+    pool : KdpPool, optional
+        Pool of worker processes used for the computation. Reusing a pool
+        across calls avoids starting new processes for every volume. If
+        given, parallel is ignored.
+    engine : 'profile' or 'vectorized', optional
+        Implementation of the method. 'profile' processes one psidp profile
+        at a time. 'vectorized' processes all profiles together using array
+        operations which is considerably faster and gives the same results.
+        With interp set, the 'vectorized' engine does not modify the psidp
+        field of the radar and masks Kdp where psidp is masked.
 
     Returns
     -------
@@ -781,10 +836,6 @@ def kdp_vulpiani(radar, gatefilter=None, fill_value=None, psidp_field=None,
                       + 'Using default value, windsize = 10')
         windsize = 10
 
-    if parallel:
-        import multiprocessing as mp
-        pool = mp.Pool(processes=mp.cpu_count(), maxtasksperchild=1)
-
     # parse fill value
     if fill_value is None:
         fill_value = get_fillvalue()
@@ -816,28 +867,23 @@ def kdp_vulpiani(radar, gatefilter=None, fill_value=None, psidp_field=None,
     if gatefilter is not None:
         psidp_o = np.ma.masked_where(gatefilter.gate_excluded, psidp_o)
 
-    func = partial(_kdp_vulpiani_profile, dr=dr, windsize=windsize,
-                   band=band, n_iter=n_iter, interp=interp)
-
-    all_psidp_prof = list(psidp_o)
-
-    if parallel:
-        list_est = pool.map(func, all_psidp_prof)
+    if engine == 'profile':
+        kdp_func = _kdp_vulpiani_profiles
+    elif engine == 'vectorized':
+        kdp_func = _kdp_vulpiani_vectorized
     else:
-        list_est = map(func, all_psidp_prof)
+        raise ValueError('Unknown engine: %s' % (engine, ))
+    func = partial(kdp_func, dr=dr, windsize=windsize, band=band,
+                   n_iter=n_iter, interp=interp)
 
-    kdp = np.ma.zeros(psidp_o.shape)
-    kdp[:] = np.ma.masked
-    kdp.set_fill_value(fill_value)
+    kdp, phidp_rec = _map_kdp_rays(
+        func, psidp_o, 2, parallel=parallel, pool=pool)
 
-    phidp_rec = np.ma.zeros(psidp_o.shape)
-    phidp_rec[:] = np.ma.masked
+    kdp = np.ma.asarray(kdp)
+    kdp.set_fill_value(fill_value)
+    phidp_rec = np.ma.asarray(phidp_rec)
     phidp_rec.set_fill_value(fill_value)
 
-    for i, l in enumerate(list_est):
-        kdp[i, 0:len(l[0])] = l[0]
-        phidp_rec[i, 0:len(l[1])] = l[1]
-
     # Mask the estimated Kdp and reconstructed Phidp with the mask of original
     # psidp
     if isinstance(psidp_o, np.ma.masked_array):
@@ -855,9 +901,6 @@ def kdp_vulpiani(radar, gatefilter=None, fill_value=None, psidp_field=None,
     phidpr_dict['data'] = phidp_rec
     # phidpr_dict['valid_min'] = 0.0
 
-    if parallel:
-        pool.close()
-
     return kdp_dict, phidpr_dict
 
 
@@ -988,6 +1031,329 @@ def _kdp_vulpiani_profile(psidp_in, dr, windsize=10,
     return kdp_calc, phidp_rec
 
 
+def _kdp_vulpiani_profiles(psidp_in, dr, windsize=10, band='X', n_iter=10,
+                           interp=False):
+    """
+    Estimates Kdp with the Vulpiani method for a block of psidp profiles.
+
+    Parameters
+    ----------
+    psidp_in : ndarray
+        Two-dimensional array of shape (nrays, nrg) containining the total
+        differential phase measurements.
+    dr, windsize, band, n_iter, interp :
+        See :py:func:`_kdp_vulpiani_profile`.
+
+    Returns
+    -------
+    kdp_calc : ndarray
+        Retrieved specific differential phase of each profile.
+    phidp_rec,: ndarray
+        Retrieved differential phase of each profile.
+
+    """
+    kdp_calc = np.ma.masked_all(psidp_in.shape)
+    phidp_rec = np.ma.masked_all(psidp_in.shape)
+    for i, psidp_prof in enumerate(psidp_in):
+        kdp_prof, phidp_prof = _kdp_vulpiani_profile(
+            psidp_prof, dr, windsize=windsize, band=band, n_iter=n_iter,
+            interp=interp)
+        kdp_calc[i, 0:len(kdp_prof)] = kdp_prof
+        phidp_rec[i, 0:len(phidp_prof)] = phidp_prof
+    return kdp_calc, phidp_rec
+
+
+def _kdp_vulpiani_vectorized(psidp_in, dr, windsize=10, band='X', n_iter=10,
+                             interp=False):
+    """
+    Estimates Kdp with the Vulpiani method for a block of psidp profiles
+    using array operations on all profiles at once.
+
+    Parameters
+    ----------
+    psidp_in : ndarray
+        Two-dimensional array of shape (nrays, nrg) containining the total
+        differential phase measurements.
+    dr, windsize, band, n_iter, interp :
+        See :py:func:`_kdp_vulpiani_profile`.
+
+    Returns
+    -------
+    kdp_calc : ndarray
+        Retrieved specific differential phase of each profile.
+    phidp_rec,: ndarray
+        Retrieved differential phase of each profile.
+
+    """
+    mask = np.ma.getmaskarray(psidp_in)
+    l = windsize
+    l2 = int(l/2)
+    drm = dr/1000.
+
+    # Thresholds in kdp calculation
+    if band == 'X':
+        th1 = -2.
+        th2 = 40.
+        std_th = 5.
+    elif band == 'C':
+        th1 = -2.
+        th2 = 20.
+        std_th = 5.
+    elif band == 'S':
+        th1 = -2.
+        th2 = 14.
+        std_th = 5.
+    else:
+        raise ValueError('Unexpected value set for the band keyword: %s'
+                         % (band, ))
+
+    psidp = np.ma.filled(psidp_in.astype(float), np.nan)
+    nn = psidp.shape[1]
+
+    if interp and mask.any():
+        # zero order interpolation of non valid points between the first
+        # and last valid points of each profile
+        gates = np.arange(nn)
+        last_valid = np.maximum.accumulate(
+            np.where(mask, -1, gates), axis=1)
+        rays = np.arange(psidp.shape[0])[:, np.newaxis]
+        psidp_interp = psidp[rays, np.maximum(last_valid, 0)]
+        after_last = gates > np.max(np.where(mask, -1, gates),
+                                    axis=1)[:, np.newaxis]
+        psidp_interp[(last_valid < 0) | after_last] = np.nan
+        psidp = np.where(mask, psidp_interp, psidp)
+        # as in _kdp_vulpiani_profile the interpolated points are not
+        # censored, they are masked by the mask of psidp in kdp_vulpiani
+        mask = np.zeros(mask.shape, dtype=bool)
+
+    kdp_calc = np.zeros(psidp.shape)
+
+    def derivative(phidp, kdp):
+        """ Range derivative of phidp over the window, thresholded. """
+        # In the core of the profile
+        kdp[:, l2:nn-l2] = (phidp[:, l:nn]-phidp[:, 0:nn-l])/(2.*l*drm)
+
+        # set ray extremes to 0
+        kdp[:, 0:l2] = 0.
+        kdp[:, nn-l2:] = 0.
+
+        # apply thresholds
+        with np.errstate(invalid='ignore'):
+            kdp[kdp <= th1] = 0.
+            kdp[kdp >= th2] = 0.
+
+    # first guess
+    derivative(psidp, kdp_calc)
+
+    # set all non-valid data to 0
+    kdp_calc[np.isnan(kdp_calc)] = 0.
+
+    # Remove bins with texture higher than treshold
+    tex = np.zeros(kdp_calc.shape)
+    # compute the local standard deviation
+    # (make sure that it is and odd window)
+    tex[:, l2:nn-l2] = np.std(rolling_window(kdp_calc, l2*2+1), -1)
+    kdp_calc[tex > std_th] = 0.
+
+    # Loop over iterations, all profiles are updated together
+    for i in range(0, n_iter):
+        phidp_rec = np.cumsum(kdp_calc, axis=1)*2.*drm
+        derivative(phidp_rec, kdp_calc)
+
+    # Censor Kdp where Psidp was not defined
+    kdp_calc = np.ma.masked_where(mask, kdp_calc)
+
+    # final reconstructed PhiDP from KDP
+    phidp_rec = np.ma.cumsum(kdp_calc, axis=1)*2.*drm
+
+    return kdp_calc, phidp_rec
+
+
+class KdpPool(object):
+    """
+    A persistent pool of worker processes for Kdp retrievals.
+
+    The processes are started once and can be reused by
+    :py:func:`kdp_schneebeli` and :py:func:`kdp_vulpiani` for many volumes.
+    For each retrieval the differential phase is copied once into shared
+    memory, the workers process blocks of rays and write their results
+    directly into shared output arrays. Before Python 3.8, where shared
+    memory is not available, the blocks of rays and their results are
+    pickled and sent between the processes instead.
+
+    The pool should be closed when no longer needed, either explicitly with
+    :py:func:`close` or by using it as a context manager.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Number of worker processes. None uses the number of CPUs.
+
+    Attributes
+    ----------
+    processes : int
+        Number of worker processes.
+
+    Examples
+    --------
+    >>> with pyart.retrieve.KdpPool() as pool:
+    ...     for radar in radars:
+    ...         kdp_dict, phidpr_dict = pyart.retrieve.kdp_vulpiani(
+    ...             radar, pool=pool)
+
+    """
+
+    def __init__(self, processes=None):
+        """ initialize the object. """
+        import multiprocessing as mp
+
+        if processes is None:
+            processes = mp.cpu_count()
+        self.processes = processes
+        if _SHARED_MEMORY_AVAILABLE:
+            # start the tracker of shared memory before the workers so that
+            # they share it with this process, otherwise segments attached by
+            # the workers are reported as leaked when the workers exit.
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        self._pool = mp.Pool(processes=processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Stop the worker processes. """
+        self._pool.close()
+        self._pool.join()
+
+    def map(self, func, iterable):
+        """
+        Apply a picklable function to every item of iterable in the workers.
+
+        Returns
+        -------
+        results : list
+            Results of func for each item in order.
+
+        """
+        return self._pool.map(func, iterable)
+
+    def map_rays(self, func, psidp, nout):
+        """
+        Apply a function to blocks of rays of a differential phase array.
+
+        Parameters
+        ----------
+        func : callable
+            Picklable function which takes a (nrays, ngates) masked array
+            and returns a sequence of nout arrays of the same shape.
+        psidp : array
+            Differential phase with rays along the first dimension.
+        nout : int
+            Number of arrays returned by func.
+
+        Returns
+        -------
+        outputs : list of arrays
+            The nout float64 arrays returned by func for all rays, masks of
+            the returned arrays are not preserved.
+
+        """
+        psidp = np.ma.asarray(psidp)
+        shape = psidp.shape
+
+        # several blocks per process to balance the load of rays with
+        # different amounts of valid data
+        nblocks = max(min(shape[0], 4 * self.processes), 1)
+        bounds = np.linspace(0, shape[0], nblocks + 1).astype(int)
+        blocks = [(start, end) for start, end in zip(bounds[:-1], bounds[1:])
+                  if start < end]
+        if not _SHARED_MEMORY_AVAILABLE:
+            return self._map_rays_pickled(func, psidp, nout, blocks)
+
+        SharedMemory = shared_memory.SharedMemory
+        dtypes = _kdp_pool_dtypes(nout)
+        size = max(int(np.prod(shape)), 1)
+        shms = [SharedMemory(create=True, size=size * np.dtype(d).itemsize)
+                for d in dtypes]
+        arrays = None
+        try:
+            arrays = _kdp_pool_arrays(shms, shape, dtypes)
+            arrays[0][:] = np.ma.getdata(psidp)
+            arrays[1][:] = np.ma.getmaskarray(psidp)
+
+            names = [shm.name for shm in shms]
+            tasks = [(func, names, shape, nout, start, end)
+                     for start, end in blocks]
+            self._pool.map(_kdp_pool_worker, tasks)
+            outputs = [array.copy() for array in arrays[2:]]
+        finally:
+            # views of the shared memory must be released before closing it
+            arrays = None
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+        return outputs
+
+    def _map_rays_pickled(self, func, psidp, nout, blocks):
+        """ Apply func to blocks of rays sent to the workers by pickling. """
+        results = self._pool.map(
+            func, [psidp[start:end] for start, end in blocks])
+        outputs = [np.empty(psidp.shape, dtype=np.float64)
+                   for _ in range(nout)]
+        for (start, end), result in zip(blocks, results):
+            for output, array in zip(outputs, result):
+                output[start:end] = np.ma.getdata(array)
+        return outputs
+
+
+def _kdp_pool_dtypes(nout):
+    """ Data types of the shared arrays of a KdpPool. """
+    return [np.float64, np.bool_] + [np.float64] * nout
+
+
+def _kdp_pool_arrays(shms, shape, dtypes):
+    """ Arrays backed by the shared memory of a KdpPool. """
+    return [np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, dtype in zip(shms, dtypes)]
+
+
+def _kdp_pool_worker(task):
+    """ Process a block of rays in a KdpPool worker. """
+    func, names, shape, nout, start, end = task
+    shms = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        _kdp_pool_map_block(func, shms, shape, nout, start, end)
+    finally:
+        for shm in shms:
+            shm.close()
+
+
+def _kdp_pool_map_block(func, shms, shape, nout, start, end):
+    """ Apply func to the rays from start to end of the shared arrays. """
+    arrays = _kdp_pool_arrays(shms, shape, _kdp_pool_dtypes(nout))
+    psidp = np.ma.array(arrays[0][start:end], mask=arrays[1][start:end])
+    results = func(psidp)
+    for output, result in zip(arrays[2:], results):
+        output[start:end] = np.ma.getdata(result)
+
+
+def _map_kdp_rays(func, psidp, nout, parallel=False, pool=None):
+    """
+    Apply func to all rays of psidp, in the pool if given, in a temporary
+    pool if parallel is True or else in this process.
+    """
+    if pool is not None:
+        return pool.map_rays(func, psidp, nout)
+    if parallel:
+        with KdpPool() as pool:
+            return pool.map_rays(func, psidp, nout)
+    return func(psidp)
+
+
 def filter_psidp(radar, psidp_field=None, rhohv_field=None, minsize_seq=5,
                  median_filter_size=7, thresh_rhohv=0.65, max_discont=90):
     """
@@ -1107,7 +1473,7 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
                 Clpf=1.0, length_scale=None, first_guess=0.01,
                 finite_order='low', fill_value=None, proc=1, psidp_field=None,
                 kdp_field=None, phidp_field=None, debug=False, verbose=False,
-                **kwargs):
+                block_size=None, pool=None, **kwargs):
     """
     Compute the specific differential phase (KDP) from corrected (e.g.,
     unfolded) total differential phase data based on the variational method
@@ -1139,7 +1505,9 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
         algorithm. In Maesaka et al. (2012) they use the Broyden-Fletcher-
         Goldfarb-Shanno (BFGS) algorithm, however for large functional size
         (e.g., 100K+ variables) this algorithm is considerably slower than a
-        conjugate gradient algorithm.
+        conjugate gradient algorithm. The analytic Hessian-vector product of
+        the cost functional is supplied to methods which use it, e.g.,
+        'Newton-CG' and 'trust-ncg'.
     backscatter : optional
         Define the backscatter differential phase. If None, the backscatter
         differential phase is set to zero for all range gates. Note that
@@ -1171,8 +1539,8 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
     fill_value : float, optional
         Value indicating missing or bad data in differential phase field.
     proc : int, optional
-        The number of parallel threads (CPUs) to use. Currently no
-        multiprocessing capability exists.
+        The number of processes used to minimize blocks of rays in parallel
+        when block_size is set.
     psidp_field : str, optional
         Total differential phase field. If None, the default field name must be
         specified in the Py-ART configuration file.
@@ -1186,6 +1554,17 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
         True to print debugging information, False to suppress.
     verbose : bool, optional
         True to print relevant information, False to suppress.
+    block_size : int, optional
+        The cost functional is a sum of independent terms for each ray. If
+        set, the rays are split into blocks of this many rays and the cost
+        functional of each block is minimized separately, otherwise the
+        entire volume is minimized at once. Small blocks combined with a
+        method using Hessian-vector products, e.g., 'Newton-CG', converge
+        in far less time than the entire volume. The maximum number of
+        iterations applies to each block.
+    pool : KdpPool, optional
+        Pool of worker processes used to minimize the blocks of rays. If
+        given, proc is ignored.
 
     Returns
     -------
@@ -1248,9 +1627,10 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
 
     # mask any radar gates which are closer (further) than the near (far)
     # boundary condition ranges
-    for ray in range(radar.nrays):
-        psidp_o[ray, :idx_near[ray]] = np.ma.masked
-        psidp_o[ray, idx_far[ray] + 1:] = np.ma.masked
+    gates = np.arange(radar.ngates)
+    psidp_o = np.ma.masked_where(
+        np.logical_or(gates < idx_near[:, np.newaxis],
+                      gates > idx_far[:, np.newaxis]), psidp_o)
 
     if debug:
         N = np.ma.count(psidp_o)
@@ -1267,40 +1647,49 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
     # parse solver options
     options = {
         'maxiter': kwargs.get('maxiter', 50),
-        'gtol': kwargs.get('gtol', 1.0e-5),
         'disp': verbose,
     }
+    if method.lower() == 'newton-cg':
+        options['xtol'] = kwargs.get('xtol', 1.0e-5)
+    else:
+        options['gtol'] = kwargs.get('gtol', 1.0e-5)
     if debug:
         optimize.show_options(solver='minimize', method=method)
 
-    # parse initial conditions (first guess)
-    x0 = np.zeros_like(psidp_o, subok=False).flatten()
-    x0.fill(first_guess)
-
     if verbose:
-        print('Cost functional size: {}'.format(x0.size))
-
-    # define arguments for cost functional and its Jacobian (gradient)
-    args = (psidp_o, [phi_near, phi_far],
-            dhv, dr, Cobs, Clpf,
-            finite_order, fill_value,
-            proc, debug, verbose)
+        print('Cost functional size: {}'.format(psidp_o.size))
+
+    # split the rays into blocks which are minimized independently
+    if block_size is None:
+        block_size = radar.nrays
+    blocks = [
+        (psidp_o[start:start + block_size], phi_near[start:start + block_size],
+         phi_far[start:start + block_size], dhv[start:start + block_size],
+         Cobs[start:start + block_size])
+        for start in range(0, radar.nrays, block_size)]
+    func = partial(
+        _minimize_maesaka_block, dr=dr, Clpf=Clpf, finite_order=finite_order,
+        fill_value=fill_value, method=method, options=options,
+        first_guess=first_guess, debug=debug, verbose=verbose)
 
     if debug:
         start = time.time()
 
     # minimize the cost functional
-    xopt = optimize.minimize(
-        _cost_maesaka, x0, args=args, method=method, jac=_jac_maesaka,
-        hess=None, hessp=None, bounds=None, constraints=None, callback=None,
-        options=options)
+    if pool is not None:
+        k_blocks = pool.map(func, blocks)
+    elif proc > 1 and len(blocks) > 1:
+        with KdpPool(processes=proc) as pool:
+            k_blocks = pool.map(func, blocks)
+    else:
+        k_blocks = [func(block) for block in blocks]
 
     if debug:
         elapsed = time.time() - start
         print('Elapsed time for minimization: {:.0f} sec'.format(elapsed))
 
     # parse control variables from optimized result
-    k = xopt.x.reshape(psidp_o.shape)
+    k = np.concatenate(k_blocks)
 
     # compute specific differential phase from control variable k in deg/km
     kdp = k**2 / (2.0 * dr) * 1000.0
@@ -1335,6 +1724,38 @@ def kdp_maesaka(radar, gatefilter=None, method='cg', backscatter=None,
     return kdp_dict, phidpf_dict, phidpr_dict
 
 
+def _minimize_maesaka_block(block, dr, Clpf, finite_order, fill_value, method,
+                            options, first_guess, debug=False, verbose=False):
+    """
+    Minimize the cost functional for a block of rays and return the control
+    variable k of the block. The block contains the total differential phase
+    measurements, near and far range gate boundary conditions, backscatter
+    differential phase and measurement constraint weights of the rays.
+    """
+    psidp_o, phi_near, phi_far, dhv, Cobs = block
+
+    # parse initial conditions (first guess)
+    x0 = np.zeros_like(psidp_o, subok=False).flatten()
+    x0.fill(first_guess)
+
+    # define arguments for cost functional and its Jacobian (gradient)
+    args = (psidp_o, [phi_near, phi_far],
+            dhv, dr, Cobs, Clpf,
+            finite_order, fill_value,
+            1, debug, verbose)
+
+    # supply the Hessian-vector product to methods which use it
+    hessp = None
+    if method.lower() in _HESSP_METHODS:
+        hessp = _hessp_maesaka
+
+    xopt = optimize.minimize(
+        _cost_maesaka, x0, args=args, method=method, jac=_jac_maesaka,
+        hess=None, hessp=hessp, bounds=None, constraints=None, callback=None,
+        options=options)
+    return xopt.x.reshape(psidp_o.shape)
+
+
 def boundary_conditions_maesaka(
         radar, gatefilter=None, n=20, psidp_field=None, debug=False,
         verbose=False, **kwargs):
@@ -1736,6 +2157,84 @@ def _jac_maesaka(x, psidp_o, bcs, dhv, dr, Cobs, Clpf, finite_order,
     return jac
 
 
+def _hessp_maesaka(x, p, psidp_o, bcs, dhv, dr, Cobs, Clpf, finite_order,
+                   fill_value, proc, debug=False, verbose=False):
+    """
+    Compute the product of the Hessian of the cost functional with a vector.
+
+    Parameters
+    ----------
+    x : ndarray
+        Analysis vector containing control variable k.
+    p : ndarray
+        Vector to multiply with the Hessian.
+    psidp_o, bcs, dhv, dr, Cobs, Clpf, finite_order, fill_value, proc :
+        See :py:func:`_jac_maesaka`.
+    debug : bool, optional
+        True to print debugging information, False to suppress.
+    verbose : bool, optional
+        True to print progress information, False to suppress.
+
+    Returns
+    -------
+    hessp : ndarray
+        Product of the Hessian of the cost functional with p.
+
+    """
+    # parse control variable k and vector v from analysis vectors
+    nr, ng = psidp_o.shape
+    k = x.reshape(nr, ng)
+    v = p.reshape(nr, ng)
+
+    # parse near and far range gate boundary conditions
+    phi_near, phi_far = bcs
+
+    # compute forward and reverse direction propagation differential phase
+    # from control variable k and their derivatives in the direction v
+    phi_fa = np.zeros_like(k, subok=False)
+    phi_fa[:, 1:] = np.cumsum(k[:, :-1]**2, axis=1)
+    phi_ra = np.zeros_like(k, subok=False)
+    phi_ra[:, :-1] = np.cumsum(k[:, :0:-1]**2, axis=1)[:, ::-1]
+
+    dkv = 2.0 * k * v
+    dphi_fa = np.zeros_like(k, subok=False)
+    dphi_fa[:, 1:] = np.cumsum(dkv[:, :-1], axis=1)
+    dphi_ra = np.zeros_like(k, subok=False)
+    dphi_ra[:, :-1] = np.cumsum(dkv[:, :0:-1], axis=1)[:, ::-1]
+
+    # compute forward and reverse propagation differential phase
+    # from total differential phase observations
+    phi_fo = psidp_o - dhv - phi_near[:, np.newaxis]
+    phi_ro = phi_far[:, np.newaxis] - psidp_o + dhv
+
+    # cost: forward direction differential phase observations, the
+    # derivative of dJof/dk = 2 k sum(Cobs (phi_fa - phi_fo)) over further
+    # gates
+    d2Jofdk = np.zeros_like(k, subok=False)
+    d2Jofdk[:, :-1] = 2.0 * v[:, :-1] * np.cumsum(
+        (Cobs[:, 1:] * (phi_fa[:, 1:] - phi_fo[:, 1:]))[:, ::-1],
+        axis=1)[:, ::-1]
+    d2Jofdk[:, :-1] += 2.0 * k[:, :-1] * np.cumsum(
+        (Cobs[:, 1:] * dphi_fa[:, 1:])[:, ::-1], axis=1)[:, ::-1]
+
+    # cost: reverse direction differential phase observations
+    d2Jordk = np.zeros_like(k, subok=False)
+    d2Jordk[:, 1:] = 2.0 * v[:, 1:] * np.cumsum(
+        (Cobs[:, :-1] * (phi_ra[:, :-1] - phi_ro[:, :-1])), axis=1)
+    d2Jordk[:, 1:] += 2.0 * k[:, 1:] * np.cumsum(
+        Cobs[:, :-1] * dphi_ra[:, :-1], axis=1)
+
+    # the low-pass filter cost is quadratic in k, its Hessian-vector product
+    # is the gradient of the low-pass filter cost evaluated at v
+    v = np.ascontiguousarray(v, dtype=np.float64)
+    d2vdr2 = np.empty_like(v)
+    _kdp_proc.lowpass_maesaka_term(v, dr, finite_order, d2vdr2)
+    d2Jlpfdk = np.empty_like(d2vdr2)
+    _kdp_proc.lowpass_maesaka_jac(d2vdr2, dr, Clpf, finite_order, d2Jlpfdk)
+
+    return (d2Jofdk + d2Jordk + d2Jlpfdk).flatten()
+
+
 def _forward_reverse_phidp(k, bcs, verbose=False):
     """
     Compute the forward and reverse direction propagation differential phases
@@ -0,0 +1,4 @@
+# remove and rebuild the _echo_steiner.so module
+rm -fv _echo_steiner.so
+cython _echo_steiner.pyx
+python setup.py build_ext -i
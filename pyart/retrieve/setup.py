@@ -6,6 +6,9 @@ def configuration(parent_package='', top_path=None):
 
     # KDP processing Cython extension
     config.add_extension('_kdp_proc', sources=['_kdp_proc.c'])
+
+    # Steiner echo classification Cython extension
+    config.add_extension('_echo_steiner', sources=['_echo_steiner.c'])
     return config
 
 if __name__ == '__main__':
@@ -0,0 +1,33 @@
+"""
+A script for benchmarking the profile and vectorized engines of the Vulpiani
+method for KDP estimation with a synthetic volume.
+"""
+
+import time
+
+import numpy as np
+
+from pyart.retrieve.kdp_proc import kdp_vulpiani
+from pyart.testing import sample_objects
+
+
+def benchmark_kdp_vulpiani(repeat=3):
+    """
+    Time both engines of kdp_vulpiani and check that they agree.
+    """
+    radar = sample_objects.make_synthetic_polarimetric_radar()
+    results = {}
+    for engine in ['profile', 'vectorized']:
+        times = []
+        for _ in range(repeat):
+            start = time.time()
+            kdp, phidp = kdp_vulpiani(radar, engine=engine)
+            times.append(time.time() - start)
+        results[engine] = kdp['data']
+        print('%-10s: %.3f s' % (engine, min(times)))
+    diff = np.ma.max(np.abs(results['profile'] - results['vectorized']))
+    print('max difference: %g deg/km' % diff)
+
+
+if __name__ == "__main__":
+    benchmark_kdp_vulpiani()
@@ -12,3 +12,53 @@ def test_steiner_conv_strat():
     assert np.all(eclass['data'][25] == np.array(
         [0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
          2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0]))
+
+
+def test_steiner_conv_strat_peakedness():
+    # a single peak is convective within its convective radius
+    x = np.arange(30) * 1000.
+    y = np.arange(30) * 1000.
+    refl = np.full((30, 30), 20.)
+    refl[15, 15] = 40.
+    refl[0, :] = np.nan
+    sclass = pyart.retrieve._echo_class._steiner_conv_strat(
+        refl, x, y, 1000., 1000., use_intense=False)
+
+    expected = np.ones((30, 30), dtype=int)
+    expected[0, :] = 0
+    expected[14:17, 15] = 2
+    expected[15, 14:17] = 2
+    assert np.array_equal(sclass, expected)
+
+
+def test_hydroclass_semisupervised():
+    # gates with the values of each centroid are assigned to its class
+    mass_centers = pyart.retrieve.echo_class._mass_centers_table()['X']
+    nclasses = mass_centers.shape[0]
+    radar = pyart.testing.make_empty_ppi_radar(nclasses, 5, 1)
+    for i, field_name in enumerate(['reflectivity',
+                                    'differential_reflectivity',
+                                    'specific_differential_phase',
+                                    'cross_correlation_ratio']):
+        data = np.ma.array(np.tile(mass_centers[:, i], (5, 1)))
+        radar.add_field(field_name, {'data': data})
+    radar.add_field('temperature', {
+        'data': np.ma.array(np.tile(mass_centers[:, 4] * -6.5 / 1000.,
+                                    (5, 1)))})
+    radar.fields['reflectivity']['data'][2, 3] = np.ma.masked
+
+    hydro, confidence = pyart.retrieve.hydroclass_semisupervised(
+        radar, mass_centers=mass_centers, temp_field='temperature',
+        chunk_size=2, compute_confidence=True)
+
+    expected = np.tile(np.arange(1, nclasses + 1), (5, 1))
+    expected[2, 3] = 0
+    assert np.array_equal(hydro['data'], expected)
+    assert confidence['data'][2, 3] is np.ma.masked
+    assert np.ma.allclose(confidence['data'], 1., atol=1e-3)
+
+    for chunk_size in [0, -1]:
+        pytest.raises(
+            ValueError, pyart.retrieve.hydroclass_semisupervised, radar,
+            mass_centers=mass_centers, temp_field='temperature',
+            chunk_size=chunk_size)
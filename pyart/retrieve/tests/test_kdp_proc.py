@@ -1,6 +1,7 @@
 """ Unit tests for pyart's retrieve/kdp_proc.py module. """
 
 import numpy as np
+import pytest
 
 from pyart.retrieve import kdp_proc
 from pyart.filters import GateFilter
@@ -32,7 +33,170 @@ def test_kdp_maesaka_all_excluded(first_guess=0.01, maxiter=100):
     return
 
 
-def _make_linear_psidp_radar(slope=0.002):
+def test_kdp_maesaka_blocks(slope=0.002, maxiter=100):
+    radar = _make_linear_psidp_radar(slope=slope, nrays=5)
+    kdp_volume, phidpf_volume, phidpr_volume = kdp_proc.kdp_maesaka(
+        radar, maxiter=maxiter, check_outliers=False)
+    kdp_dict, phidpf_dict, phidpr_dict = kdp_proc.kdp_maesaka(
+        radar, maxiter=maxiter, check_outliers=False, method='Newton-CG',
+        block_size=2)
+
+    assert kdp_dict['data'].shape == (5, 101)
+    assert np.allclose(kdp_dict['data'], 1000.0 * slope / 2.0, atol=0.1)
+    assert np.allclose(kdp_dict['data'], kdp_volume['data'], atol=0.1)
+
+    with kdp_proc.KdpPool(processes=2) as pool:
+        kdp_pool, phidpf_pool, phidpr_pool = kdp_proc.kdp_maesaka(
+            radar, maxiter=maxiter, check_outliers=False, method='Newton-CG',
+            block_size=2, pool=pool)
+    assert np.allclose(kdp_pool['data'], kdp_dict['data'])
+
+    return
+
+
+def test_hessp_maesaka():
+    # compare the Hessian-vector product with finite differences of the
+    # Jacobian
+    rng = np.random.RandomState(0)
+    psidp_o = np.ma.masked_array(
+        np.cumsum(rng.rand(3, 40), axis=1), mask=rng.rand(3, 40) < 0.1)
+    bcs = [psidp_o[:, 0].filled(0.0), psidp_o[:, -1].filled(40.0)]
+    dhv = np.zeros(psidp_o.shape)
+    Cobs = np.logical_not(np.ma.getmaskarray(psidp_o)).astype(float)
+    psidp_o = psidp_o.filled(-9999.0)
+    args = (psidp_o, bcs, dhv, 100.0, Cobs, 1.0e-2, 'low', -9999.0, 1)
+    x = rng.rand(psidp_o.size)
+    p = rng.rand(psidp_o.size)
+    eps = 1.0e-6
+    fd = (kdp_proc._jac_maesaka(x + eps * p, *args) -
+          kdp_proc._jac_maesaka(x - eps * p, *args)) / (2.0 * eps)
+    hessp = kdp_proc._hessp_maesaka(x, p, *args)
+
+    assert np.allclose(hessp, fd, rtol=1.0e-5, atol=1.0e-8 * np.abs(fd).max())
+
+    return
+
+
+def test_kdp_schneebeli_linear_psidp(slope=0.002):
+    radar = _make_linear_psidp_radar(slope=slope, nrays=3)
+    # Kalman filters are tuned for range resolutions of hundreds of meters
+    radar.range['data'] = radar.range['data'] * 25.0
+    psidp = radar.fields[get_field_name('differential_phase')]['data']
+    psidp[:] = psidp * 25.0
+    psidp[2] = np.ma.masked
+    kdp_dict, kdp_std_dict, phidpr_dict = kdp_proc.kdp_schneebeli(
+        radar, band='X', parallel=False)
+
+    kdp = kdp_dict['data']
+    assert kdp.shape == (3, 101)
+    assert np.ma.count(kdp[2]) == 0
+    assert np.allclose(kdp[:2, 20:-20], 1000.0 * slope / 2.0, atol=0.01)
+
+    return
+
+
+def test_kdp_vulpiani_vectorized(slope=0.002):
+    radar = _make_linear_psidp_radar(slope=slope, nrays=4)
+    radar.range['data'] = radar.range['data'] * 25.0
+    psidp = radar.fields[get_field_name('differential_phase')]['data']
+    np.random.seed(0)
+    psidp[:] = psidp * 25.0 + np.random.randn(4, 101)
+    psidp[0, :5] = np.ma.masked
+    psidp[1, 40:45] = np.ma.masked
+    psidp[2, -5:] = np.ma.masked
+    psidp_orig = psidp.copy()
+    valid = ~np.ma.getmaskarray(psidp_orig)
+
+    for interp in [False, True]:
+        kdp_vec, phidp_vec = kdp_proc.kdp_vulpiani(
+            radar, windsize=4, interp=interp, engine='vectorized')
+        assert np.array_equal(
+            np.ma.getmaskarray(kdp_vec['data']), ~valid)
+        kdp_prof, phidp_prof = kdp_proc.kdp_vulpiani(
+            radar, windsize=4, interp=interp, engine='profile')
+        assert np.allclose(kdp_vec['data'].data[valid],
+                           kdp_prof['data'].data[valid])
+        assert np.allclose(phidp_vec['data'].data[valid],
+                           phidp_prof['data'].data[valid])
+        radar.fields[get_field_name('differential_phase')]['data'] = (
+            psidp_orig.copy())
+
+    assert np.allclose(kdp_vec['data'][3, 10:-10], 1000.0 * slope / 2.0,
+                       atol=0.5)
+    pytest.raises(ValueError, kdp_proc.kdp_vulpiani, radar,
+                  engine='unknown')
+
+    return
+
+
+@pytest.mark.parametrize('shared_memory', [
+    pytest.param(True, marks=pytest.mark.skipif(
+        not kdp_proc._SHARED_MEMORY_AVAILABLE,
+        reason='shared memory requires Python 3.8 or newer')),
+    False])
+def test_kdp_pool(shared_memory, monkeypatch, slope=0.002):
+    # without shared memory the blocks of rays are pickled
+    monkeypatch.setattr(kdp_proc, '_SHARED_MEMORY_AVAILABLE', shared_memory)
+    radar = _make_linear_psidp_radar(slope=slope, nrays=5)
+    radar.range['data'] = radar.range['data'] * 25.0
+    psidp = radar.fields[get_field_name('differential_phase')]['data']
+    psidp[:] = psidp * 25.0
+    psidp[1, 50:60] = np.ma.masked
+    kdp_serial, phidp_serial = kdp_proc.kdp_vulpiani(radar, windsize=4)
+
+    with kdp_proc.KdpPool(processes=2) as pool:
+        # the pool is reused for several retrievals
+        for _ in range(2):
+            kdp_dict, phidpr_dict = kdp_proc.kdp_vulpiani(
+                radar, windsize=4, pool=pool)
+            assert np.ma.allclose(kdp_dict['data'], kdp_serial['data'])
+            assert np.array_equal(np.ma.getmaskarray(kdp_dict['data']),
+                                  np.ma.getmaskarray(kdp_serial['data']))
+            assert np.ma.allclose(phidpr_dict['data'], phidp_serial['data'])
+        kdp_dict, kdp_std_dict, phidpr_dict = kdp_proc.kdp_schneebeli(
+            radar, band='X', pool=pool)
+
+    kdp = kdp_dict['data']
+    assert kdp.shape == (5, 101)
+    assert np.ma.count_masked(kdp[1]) == 10
+    assert np.allclose(kdp[[0, 2, 3, 4], 20:-20], 1000.0 * slope / 2.0,
+                       atol=0.01)
+
+    return
+
+
+def test_kalman_filter_ensemble():
+    # compare the compiled filters with the reference implementation
+    np.random.seed(0)
+    psidp = np.cumsum(np.random.rand(2, 60), axis=1) + np.random.randn(2, 60)
+    lengths = np.array([60, 45], dtype=np.int32)
+    scalers = np.array(kdp_proc.SCALERS[:3])
+    dr = 0.25
+    pcov = np.diag([0.5, 1.0, 0.0, 0.2]) * dr
+    rcov = np.diag([4.0, 4.0, 1.5])
+    kdp = np.zeros((2, len(scalers), 60))
+    kdp_proc._kdp_proc.kalman_filter_ensemble(
+        psidp, lengths, scalers, pcov, rcov, dr, -0.054, -6.155, 2.3688,
+        0.2734, 2.5, kdp)
+
+    f = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1],
+                  [2 * dr, 0, 0, 1]], dtype=float)
+    h_plus = np.array(
+        [[-2 * dr, 1, 0, 1], [2 * dr, 1, 1, 0], [0, -1, 0, 0]], dtype=float)
+    shift = kdp_proc.SHIFT
+    for i, n in enumerate(lengths):
+        for j, sc in enumerate(scalers):
+            kdp_ref, _, _ = kdp_proc._kdp_estimation_forward_fixed(
+                psidp[i, :n], rcov, pcov * sc, f, f.T, h_plus, -0.054,
+                -6.155, 2.3688, 0.2734, 2.5)
+            assert np.allclose(
+                kdp[i, j, shift:n - 1], kdp_ref[:n - 1 - shift])
+            assert np.all(kdp[i, j, n - 1:] == 0)
+
+    return
+
+
+def _make_linear_psidp_radar(slope=0.002, nrays=1):
     """
     Create single-ray radar with linear differential phase profile with
     specified slope.
@@ -42,6 +206,8 @@ def _make_linear_psidp_radar(slope=0.002):
     slope : float, optional
         Slope of differential phase profile in deg/m. Radar range gates cover
         0-1000 m, inclusive, with 10 m gate spacings.
+    nrays : int, optional
+        Number of rays, all with the same profile.
 
     Returns
     -------
@@ -49,9 +215,10 @@ def _make_linear_psidp_radar(slope=0.002):
         Radar with linear differential phase profile in deg.
 
     """
-    radar = sample_objects.make_empty_ppi_radar(101, 1, 1)
+    radar = sample_objects.make_empty_ppi_radar(101, nrays, 1)
     psidp_dict = {
-        'data': np.atleast_2d(np.linspace(0.0, slope * 1000.0, radar.ngates))
+        'data': np.ma.array(np.tile(
+            np.linspace(0.0, slope * 1000.0, radar.ngates), (nrays, 1)))
         }
     radar.add_field(get_field_name('differential_phase'), psidp_dict)
 
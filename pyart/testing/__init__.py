@@ -16,6 +16,7 @@ from .sample_files import NEXRAD_LEVEL3_MSG19, NEXRAD_LEVEL3_MSG163
 from .sample_files import NEXRAD_LEVEL3_MSG176
 from .sample_objects import make_empty_ppi_radar, make_target_radar
 from .sample_objects import make_single_ray_radar, make_velocity_aliased_radar
+from .sample_objects import make_synthetic_polarimetric_radar
 from .sample_objects import make_empty_grid
 from .sample_objects import make_target_grid, make_storm_grid
 from .sample_objects import make_empty_rhi_radar
@@ -24,5 +25,6 @@ from .sample_objects import make_empty_spectra_radar
 from. sample_objects import make_target_spectra_radar
 from .tmpdirs import InTemporaryDirectory
 from .sample_objects import make_normal_storm
+from .sample_objects import make_nexrad_archive_chunks
 
 __all__ = [s for s in dir() if not s.startswith('_')]
@@ -3,13 +3,17 @@ Functions for creating sample Radar and Grid objects.
 
 """
 
+import bz2
+import struct
+
 import numpy as np
 import scipy
 
-from .sample_files import _EXAMPLE_RAYS_FILE
+from .sample_files import _EXAMPLE_RAYS_FILE, NEXRAD_ARCHIVE_MSG31_FILE
 from ..config import get_metadata
 from ..core.radar import Radar
 from ..core.grid import Grid
+from ..io.nexrad_level2 import _scan_records
 
 try:
     import xarray as xr
@@ -226,6 +230,58 @@ def make_single_ray_radar():
     return radar
 
 
+def make_synthetic_polarimetric_radar(nrays=360, ngates=1000, seed=0):
+    """
+    Return a C-band PPI radar with noisy synthetic polarimetric fields.
+
+    The differential phase is the integral of a smoothly varying specific
+    differential phase with added noise, the reflectivity and differential
+    phase fields contain randomly masked gates. A temperature field which
+    decreases with range is included. Useful for benchmarking.
+
+    Parameters
+    ----------
+    nrays, ngates : int, optional
+        Number of rays and number of gates per ray, the gates are spaced
+        250 m apart.
+    seed : int, optional
+        Seed of the random number generator used to create the fields.
+
+    Returns
+    -------
+    radar : Radar
+        Radar with reflectivity, differential_phase,
+        differential_reflectivity and temperature fields.
+
+    """
+    radar = make_empty_ppi_radar(ngates, nrays, 1)
+    radar.range['data'] = np.arange(ngates, dtype='float32') * 250.
+    radar.instrument_parameters = {'frequency': {'data': np.array([5.6e9])}}
+    rng = np.random.RandomState(seed)
+    ranges = radar.range['data'] / 1000.
+
+    refl = np.ma.masked_array(10. + 40. * rng.rand(nrays, ngates))
+    refl[rng.rand(nrays, ngates) < 0.3] = np.ma.masked
+    kdp = np.clip(3. * np.sin(ranges / 10. + 3. * rng.rand(nrays, 1)), 0,
+                  None)
+    phidp = np.ma.masked_array(
+        20. + np.cumsum(kdp, axis=1) * 2. * 0.25 +
+        3. * rng.randn(nrays, ngates))
+    phidp[rng.rand(nrays, ngates) < 0.05] = np.ma.masked
+    zdr = np.ma.masked_array(rng.randn(nrays, ngates))
+    temp = np.ma.masked_array(
+        np.tile(np.linspace(20., -20., ngates), (nrays, 1)) +
+        rng.randn(nrays, 1) * 15.)
+
+    for name, data in [('reflectivity', refl), ('differential_phase', phidp),
+                       ('differential_reflectivity', zdr)]:
+        field = get_metadata(name)
+        field['data'] = data
+        radar.add_field(name, field)
+    radar.add_field('temperature', {'data': temp})
+    return radar
+
+
 def make_empty_grid(grid_shape, grid_limits):
     """
     Make an empty grid object without any fields or metadata.
@@ -462,3 +518,35 @@ def make_target_spectra_radar():
     fdata[:, :, :] = 10*np.log10(scipy.signal.gaussian(50, std=7) * max_value)
     radar.ds['spectra'].values = fdata
     return radar
+
+
+def make_nexrad_archive_chunks(nradials_per_chunk=120):
+    """
+    Return the sample NEXRAD Level II file split into real-time chunks.
+
+    Parameters
+    ----------
+    nradials_per_chunk : int, optional
+        Number of radials in each chunk.
+
+    Returns
+    -------
+    chunks : list of bytes
+        Chunks of bzip2 compressed radials, each preceded by the size of
+        the compressed data. The first chunk also contains the volume
+        header. Joined together the chunks form a compressed NEXRAD Level II
+        file.
+
+    """
+    fh = bz2.BZ2File(NEXRAD_ARCHIVE_MSG31_FILE, 'rb')
+    raw = fh.read()
+    fh.close()
+    records = raw[24:]
+    positions, _ = _scan_records(records[12:])
+    bounds = list(positions[::nradials_per_chunk]) + [len(records)]
+    chunks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        chunk = bz2.compress(records[start:end])
+        chunks.append(struct.pack('>i', len(chunk)) + chunk)
+    chunks[0] = raw[:24] + chunks[0]
+    return chunks